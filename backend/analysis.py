@@ -0,0 +1,330 @@
+"""
+Blocking analysis routines
+
+These functions do the CPU-heavy work behind the API endpoints (decoding,
+inference, JPEG encoding). They are plain synchronous functions so they can
+run on a thread or in a separate worker process, never on the event loop.
+"""
+import logging
+
+import metrics
+from lazy_modules import cv2, np
+from temporal import AdaptiveSampler, TemporalSmoother, build_segments
+
+logger = logging.getLogger(__name__)
+
+
+class ImageDecodeError(ValueError):
+    """Raised for uploaded image bytes that are not a decodable image"""
+
+
+def analyze_video_file(model_handler, video_processor, video_path, batch_size=16,
+                       target_fps=None, max_frames=None, thumbnail_width=None,
+                       thumbnail_quality=80, smoothing="none", adaptive_sampling=False,
+                       adaptive_batch_size=4, adaptive_max_stride=4, motion_threshold=None,
+                       person_roi=False, content_hash=None):
+    """
+    Analyze every sampled frame of a video file
+    
+    Args:
+        model_handler: YogaModelHandler used for inference
+        video_processor: VideoProcessor used for decoding
+        video_path: Path to video file
+        batch_size: Number of frames per forward pass
+        target_fps: Optional frames to analyze per second of video
+        max_frames: Optional upper bound on analyzed frames
+        thumbnail_width: If set, attach a JPEG thumbnail of this width to each
+            result under "jpeg" (raw bytes); no images are encoded otherwise
+        thumbnail_quality: JPEG quality (0-100) of the thumbnails
+        smoothing: Temporal smoothing of predictions: "ema", "majority" or "none"
+            (see temporal.TemporalSmoother)
+        adaptive_sampling: Analyze fewer frames while the pose is held and more
+            during transitions (see temporal.AdaptiveSampler)
+        adaptive_batch_size: Frames per forward pass with adaptive sampling
+            (smaller batches let the sampler react sooner)
+        adaptive_max_stride: Largest adaptive step as a multiple of the fixed step
+        motion_threshold: If set, frames whose mean pixel difference (0-1) from
+            the last inferred frame is at most this reuse its prediction instead
+            of running the model; such results have "inference_skipped": True
+        person_roi: Crop frames to the practitioner, found by background
+            subtraction once per video (see VideoProcessor.person_region),
+            before resizing them to the model's input size
+        content_hash: Hash of the video's contents, the key for what the
+            video processor caches per video (see VideoProcessor.frame_index);
+            None keys it by path, size and modification time
+        
+    Returns:
+        List of per-frame result dictionaries
+    """
+    results = list(iter_video_results(
+        model_handler, video_processor, video_path,
+        batch_size=batch_size,
+        target_fps=target_fps,
+        max_frames=max_frames,
+        thumbnail_width=thumbnail_width,
+        thumbnail_quality=thumbnail_quality,
+        smoothing=smoothing,
+        adaptive_sampling=adaptive_sampling,
+        adaptive_batch_size=adaptive_batch_size,
+        adaptive_max_stride=adaptive_max_stride,
+        motion_threshold=motion_threshold,
+        person_roi=person_roi,
+        content_hash=content_hash
+    ))
+    skipped = sum(1 for r in results if r.get("inference_skipped"))
+    logger.info(f"Analyzed {len(results)} frames ({skipped} reused a near-identical frame's prediction)")
+    return results
+
+
+def stream_video_results(model_handler, video_processor, video_path, progress, **options):
+    """
+    Analyze a video on a pool worker, handing each frame's result over as it is done
+    
+    Args:
+        model_handler: YogaModelHandler used for inference
+        video_processor: VideoProcessor that decodes the video
+        video_path: Path to video file
+        progress: Queue from InferencePool.progress_queue() that receives each result
+        **options: Same keyword arguments as analyze_video_file
+        
+    Returns:
+        Number of frames analyzed
+    """
+    count = 0
+    for result in iter_video_results(model_handler, video_processor, video_path, **options):
+        progress.put(result)
+        count += 1
+    return count
+
+
+def iter_video_results(model_handler, video_processor, video_path, batch_size=16,
+                       target_fps=None, max_frames=None, thumbnail_width=None,
+                       thumbnail_quality=80, smoothing="none", adaptive_sampling=False,
+                       adaptive_batch_size=4, adaptive_max_stride=4, motion_threshold=None,
+                       person_roi=False, content_hash=None):
+    """
+    Analyze a video and yield each frame's result as soon as its batch is done
+    
+    Takes the same arguments as analyze_video_file.
+    
+    Yields:
+        Per-frame result dictionaries
+    """
+    model_handler.ensure_loaded()
+    
+    smoother = TemporalSmoother(smoothing) if smoothing != "none" else None
+    sampler = AdaptiveSampler(max_stride=adaptive_max_stride) if adaptive_sampling else None
+    motion_gate = video_processor.motion_gate(motion_threshold) if motion_threshold else None
+    frame_options = {
+        "sample_rate": 10,
+        "target_size": model_handler.input_size,
+        "target_fps": target_fps,
+        "max_frames": max_frames,
+        "preview_width": thumbnail_width,
+        "roi": video_processor.person_region(video_path, content_hash) if person_roi else None
+    }
+    
+    if sampler is not None:
+        # Decoded on demand so each batch's results steer where the next batch is taken
+        frame_batches = _batches(
+            video_processor.iter_adaptive_frames(video_path, sampler, **frame_options),
+            min(adaptive_batch_size, batch_size)
+        )
+    else:
+        # Decode frames in the background and analyze them batch by batch
+        frame_batches = _fixed_rate_batches(
+            video_processor.iter_frame_batches(video_path, batch_size=batch_size, **frame_options),
+            with_previews=bool(thumbnail_width)
+        )
+    
+    frame_number = 0
+    previous_index = None
+    last_prediction = None
+    encode_params = [cv2.IMWRITE_JPEG_QUALITY, int(thumbnail_quality)]
+    for batch in frame_batches:
+        frames = [frame for _, _, frame, _ in batch]
+        
+        # Only frames that moved since the last inferred one go through the model
+        if motion_gate is not None:
+            skipped = [motion_gate.is_duplicate(frame) for frame in frames]
+        else:
+            skipped = [False] * len(frames)
+        inferred = iter(model_handler.predict_batch(
+            [frame for frame, skip in zip(frames, skipped) if not skip],
+            batch_size=batch_size
+        ))
+        
+        for (frame_index, timestamp, _, preview), skip in zip(batch, skipped):
+            # A skipped frame is a near-duplicate of the last inferred frame before it
+            prediction = last_prediction if skip else next(inferred)
+            last_prediction = prediction
+            
+            result = {
+                "frame_number": frame_number,
+                "pose_detected": prediction["pose_class"],
+                "confidence": prediction["confidence"],
+                "is_correct": prediction["is_correct"],
+                "feedback": prediction["feedback"]
+            }
+            if skip:
+                result["inference_skipped"] = True
+            if frame_index is not None:
+                result["video_frame"] = frame_index
+                result["timestamp"] = timestamp
+            
+            pose, confidence = prediction["pose_class"], prediction["confidence"]
+            if smoother is not None and "all_probabilities" in prediction:
+                # Frames further apart than the fixed step weigh the history less
+                steps = 1
+                if sampler is not None and previous_index is not None:
+                    steps = (frame_index - previous_index) / sampler.base_step
+                pose, confidence = smoother.update(prediction["all_probabilities"], steps=steps)
+                
+                # Feedback follows the smoothed prediction so it does not flip frame to frame
+                result["smoothed_pose"] = pose
+                result["smoothed_confidence"] = round(confidence, 4)
+                result["is_correct"], result["feedback"] = model_handler.assess(pose, confidence)
+            
+            if sampler is not None:
+                sampler.update(pose, confidence)
+                previous_index = frame_index
+            
+            # Thumbnail for frontend display
+            if preview is not None:
+                with metrics.stage("encode"):
+                    _, buffer = cv2.imencode('.jpg', preview, encode_params)
+                result["jpeg"] = buffer.tobytes()
+            
+            frame_number += 1
+            yield result
+
+
+def _fixed_rate_batches(frame_batches, with_previews):
+    """Shape iter_frame_batches output like iter_adaptive_frames items (without frame index or timestamp)"""
+    for batch in frame_batches:
+        if with_previews:
+            yield [(None, None, frame, preview) for frame, preview in batch]
+        else:
+            yield [(None, None, frame, None) for frame in batch]
+
+
+def _batches(items, batch_size):
+    """Group an iterator into lists of up to batch_size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_overall_result(results, video_name, expected_pose=None, min_hold_frames=3,
+                         with_segments=False):
+    """
+    Summarize per-frame results into the /analyze-pose response
+    
+    Args:
+        results: Non-empty list of per-frame result dictionaries
+        video_name: Uploaded file name
+        expected_pose: The expected yoga asana name, if given
+        min_hold_frames: Consecutive frames of one pose that count as a hold
+        with_segments: Add pose segments and the longest hold to the feedback (requested
+            with smoothing or adaptive sampling; raw per-frame predictions flip too often)
+        
+    Returns:
+        Dictionary with overall statistics, feedback, the frame results and (with_segments)
+        pose segments
+    """
+    if expected_pose:
+        # Check if detected pose matches expected pose (smoothed, when available)
+        correct_count = sum(1 for r in results 
+                          if r.get("smoothed_pose", r["pose_detected"]) == expected_pose
+                          and r.get("smoothed_confidence", r["confidence"]) > 0.7)
+    else:
+        correct_count = sum(1 for r in results if r["is_correct"])
+    
+    avg_confidence = sum(r["confidence"] for r in results) / len(results)
+    skipped_count = sum(1 for r in results if r.get("inference_skipped"))
+    segments = build_segments(results, min_hold_frames=min_hold_frames) if with_segments else None
+    
+    overall = {
+        "video_name": video_name,
+        "expected_pose": expected_pose,
+        "total_frames_analyzed": len(results),
+        "frames_skipped": skipped_count,
+        "correct_frames": correct_count,
+        "incorrect_frames": len(results) - correct_count,
+        "accuracy_percentage": round((correct_count / len(results)) * 100, 2),
+        "average_confidence": round(avg_confidence, 2),
+        "frame_results": results,
+        "overall_feedback": _generate_overall_feedback(results, expected_pose, segments)
+    }
+    if with_segments:
+        overall["segments"] = segments
+    return overall
+
+
+def _generate_overall_feedback(results, expected_pose=None, segments=None):
+    """Generate human-readable overall feedback"""
+    correct_count = sum(1 for r in results if r["is_correct"])
+    accuracy = (correct_count / len(results)) * 100
+    
+    feedback = ""
+    if expected_pose:
+        feedback = f"Expected: {expected_pose}. "
+    
+    if accuracy >= 90:
+        feedback += "Excellent! Your form is nearly perfect. Keep it up!"
+    elif accuracy >= 70:
+        feedback += "Good job! Minor adjustments needed in some frames."
+    elif accuracy >= 50:
+        feedback += "Decent attempt. Focus on maintaining proper form throughout."
+    else:
+        feedback += "Needs improvement. Review the pose guidelines and try again."
+    
+    # Point at the longest held pose
+    holds = [segment for segment in segments or [] if segment["is_hold"]]
+    if holds:
+        longest = max(holds, key=lambda segment: segment["frames"])
+        if "start_time" in longest:
+            feedback += f" Longest hold: {longest['pose']} for {longest['end_time'] - longest['start_time']:.1f}s."
+        else:
+            feedback += f" Longest hold: {longest['pose']} over {longest['frames']} frames."
+    
+    return feedback
+
+
+def analyze_image_batch(model_handler, video_processor, contents_list):
+    """
+    Decode several encoded images and analyze them in one forward pass
+    
+    Args:
+        model_handler: YogaModelHandler used for inference
+        video_processor: VideoProcessor (unused, keeps the worker call signature uniform)
+        contents_list: List of raw encoded image bytes
+        
+    Returns:
+        List with one prediction dictionary per image, or an ImageDecodeError
+        for images that could not be decoded
+    """
+    model_handler.ensure_loaded()
+    
+    results = [None] * len(contents_list)
+    images = []
+    positions = []
+    for idx, contents in enumerate(contents_list):
+        img = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            results[idx] = ImageDecodeError("Could not decode image")
+        else:
+            images.append(img)
+            positions.append(idx)
+    
+    if images:
+        predictions = model_handler.predict_batch(images, batch_size=len(images))
+        for idx, prediction in zip(positions, predictions):
+            results[idx] = prediction
+    
+    return results
@@ -0,0 +1,484 @@
+"""
+Offline batch grading of recorded class videos
+
+    python -m backend.batch recordings/ --output grades.jsonl
+    python -m backend.batch "recordings/**/*.mp4" --expected-pose-from-dir --workers 8
+    python -m backend.batch recordings/ --format parquet --output grades/
+
+Videos are analyzed in parallel on an InferencePool. With the default
+"process" pool every worker process decodes its own videos and runs batched
+inference on its own copy of the model. With "shm", decoding runs on threads
+and the forward passes of all videos share the inference processes (see
+inference_workers.py).
+
+Each video is written out as soon as it is graded: one JSON line per video,
+or with --format parquet a directory of Parquet files of --rows-per-file
+videos each (requires pyarrow). Graded videos are recorded in a manifest
+(JSON lines, next to the output by default). Running the same command again
+skips them and continues with the rest; a video is graded again if its file
+or the analysis settings changed, or if it failed.
+
+Throughput is reported in videos/min.
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+if BACKEND_DIR not in sys.path:
+    # Run as `python -m backend.batch`: the backend modules import each other by bare name
+    sys.path.insert(0, BACKEND_DIR)
+
+import analysis
+import config
+from inference_pool import InferencePool
+from inference_workers import InferenceWorkers, handler_factory as shm_handler_factory
+from model_handler import DEFAULT_LABELS_PATH
+from model_registry import ModelRegistry, load_manifest, single_model_manifest
+from temporal import SMOOTHING_MODES
+from video_processor import VideoProcessor
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+SAVED_MODEL_PATH = os.path.join(BACKEND_DIR, "..", "model_prep", "yoga_savedmodel")
+
+
+def find_videos(patterns):
+    """
+    Expand directories (searched recursively) and glob patterns into video files
+    
+    Returns:
+        Sorted list of absolute paths, without duplicates
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                paths.update(os.path.join(root, name) for name in files)
+        else:
+            paths.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(os.path.abspath(path) for path in paths if path.lower().endswith(VIDEO_EXTENSIONS))
+
+
+def settings_key(options, model_version, expected_pose=None):
+    """Short hash of everything besides the file that changes a video's grade"""
+    encoded = json.dumps(
+        {"options": options, "model": model_version, "expected_pose": expected_pose},
+        sort_keys=True
+    )
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:12]
+
+
+class ProgressManifest:
+    """Append-only record of graded (and failed) videos, used to resume a run"""
+    
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}  # path -> last entry recorded for it
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Last line cut short by an interrupted run
+                    self._entries[entry["path"]] = entry
+        self._file = open(path, "a", encoding="utf-8")
+    
+    def is_done(self, path, settings):
+        """Whether path was graded with these settings and has not changed since"""
+        entry = self._entries.get(path)
+        if entry is None or entry["status"] != "done" or entry["settings"] != settings:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime
+    
+    def record(self, path, status, settings, **extra):
+        """Append an entry for path ("done" or "failed") and flush it to disk"""
+        entry = {"path": path, "status": status, "settings": settings}
+        try:
+            stat = os.stat(path)
+            entry.update(size=stat.st_size, mtime=stat.st_mtime)
+        except OSError:
+            pass  # Deleted or unreadable meanwhile: recorded without them, so never skipped
+        entry.update(extra)
+        self._entries[path] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def close(self):
+        self._file.close()
+
+
+class JsonLinesWriter:
+    """Appends one JSON line per graded video"""
+    
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+    
+    def write(self, row):
+        """
+        Write one video's row
+        
+        Returns:
+            Rows that are now safely on disk (here: this one)
+        """
+        self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return [row]
+    
+    def close(self):
+        """Close the file; returns the rows written by closing (none)"""
+        self._file.close()
+        return []
+
+
+class ParquetWriter:
+    """
+    Writes graded videos as Parquet files in a directory, rows_per_file videos each
+    
+    Every file is complete as soon as it is written, so the directory can be
+    read as one dataset (e.g. pandas.read_parquet(directory)) at any time,
+    including after an interrupted run. Resumed runs add new files.
+    """
+    
+    def __init__(self, directory, rows_per_file=256):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("--format parquet requires pyarrow (pip install pyarrow)")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._schema = _parquet_schema(pyarrow)
+        self.directory = directory
+        self.rows_per_file = rows_per_file
+        self._prefix = time.strftime("part-%Y%m%d-%H%M%S")
+        self._files = 0
+        self._rows = []
+        os.makedirs(directory, exist_ok=True)
+    
+    def write(self, row):
+        """
+        Buffer one video's row, writing a file once rows_per_file are buffered
+        
+        Returns:
+            Rows that are now safely on disk (empty until a file is written)
+        """
+        self._rows.append(row)
+        if len(self._rows) >= self.rows_per_file:
+            return self._flush()
+        return []
+    
+    def close(self):
+        """Write the remaining rows; returns them"""
+        return self._flush()
+    
+    def _flush(self):
+        if not self._rows:
+            return []
+        rows, self._rows = self._rows, []
+        table = self._pa.Table.from_pylist(rows, schema=self._schema)
+        path = os.path.join(self.directory, f"{self._prefix}-{self._files:05d}.parquet")
+        # Renamed into place so readers never see a half-written file
+        self._pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._files += 1
+        return rows
+
+
+def _parquet_schema(pa):
+    """Columns of --format parquet: one row per video, segments and frames as nested lists"""
+    segment = pa.struct([
+        ("pose", pa.string()),
+        ("start_frame", pa.int32()),
+        ("end_frame", pa.int32()),
+        ("start_time", pa.float64()),
+        ("end_time", pa.float64()),
+        ("frames", pa.int32()),
+        ("average_confidence", pa.float64()),
+        ("is_hold", pa.bool_())
+    ])
+    frame = pa.struct([
+        ("frame_number", pa.int32()),
+        ("video_frame", pa.int64()),
+        ("timestamp", pa.float64()),
+        ("pose_detected", pa.string()),
+        ("confidence", pa.float64()),
+        ("smoothed_pose", pa.string()),
+        ("smoothed_confidence", pa.float64()),
+        ("is_correct", pa.bool_()),
+        ("inference_skipped", pa.bool_()),
+        ("feedback", pa.string())
+    ])
+    return pa.schema([
+        ("video_path", pa.string()),
+        ("video_name", pa.string()),
+        ("expected_pose", pa.string()),
+        ("model_version", pa.string()),
+        ("total_frames_analyzed", pa.int32()),
+        ("frames_skipped", pa.int32()),
+        ("correct_frames", pa.int32()),
+        ("incorrect_frames", pa.int32()),
+        ("accuracy_percentage", pa.float64()),
+        ("average_confidence", pa.float64()),
+        ("overall_feedback", pa.string()),
+        ("analysis_seconds", pa.float64()),
+        ("segments", pa.list_(segment)),
+        ("frame_results", pa.list_(frame))
+    ])
+
+
+def create_pool(args):
+    """
+    Model registry, inference processes (shm only) and the pool that grades videos
+    
+    Returns:
+        (InferencePool, InferenceWorkers or None)
+    """
+    cores = os.cpu_count() or 1
+    num_threads = args.num_threads or config.MODEL_NUM_THREADS or None
+    if args.pool == "process" and num_threads is None:
+        # Every worker process runs its own model; share the cores between them
+        num_threads = max(1, cores // args.workers)
+    if args.model_manifest:
+        manifest = load_manifest(args.model_manifest, num_threads=num_threads)
+    else:
+        model_path = config.TFLITE_MODEL_PATH if args.backend == "tflite" else SAVED_MODEL_PATH
+        manifest = single_model_manifest(model_path, args.backend, DEFAULT_LABELS_PATH, num_threads)
+    model_registry = ModelRegistry(manifest, idle_unload_seconds=0)
+    
+    inference_workers = None
+    if args.pool == "shm":
+        inference_workers = InferenceWorkers(
+            processes=args.inference_processes or config.INFERENCE_PROCESSES or None,
+            batch_size=config.INFERENCE_BATCH_SIZE,
+            num_threads=num_threads
+        )
+        model_registry.handler_factory = shm_handler_factory(inference_workers)
+    
+    pool = InferencePool(
+        model_registry,
+        VideoProcessor(),
+        kind=args.pool,
+        workers=args.workers,
+        queue_size=0,
+        warmup_batch_sizes=[config.INFERENCE_BATCH_SIZE]
+    )
+    return pool, inference_workers
+
+
+def analysis_options(args):
+    """Keyword arguments for analysis.analyze_video_file"""
+    return {
+        "batch_size": config.INFERENCE_BATCH_SIZE,
+        "target_fps": args.target_fps,
+        "max_frames": args.max_frames,
+        "smoothing": args.smoothing,
+        "adaptive_sampling": args.adaptive_sampling,
+        "adaptive_batch_size": config.ADAPTIVE_BATCH_SIZE,
+        "adaptive_max_stride": config.ADAPTIVE_MAX_STRIDE,
+        "motion_threshold": args.motion_threshold,
+        "person_roi": args.person_roi
+    }
+
+
+def expected_pose_for(path, args):
+    """Pose the video should show: --expected-pose, or its directory name with --expected-pose-from-dir"""
+    if args.expected_pose_from_dir:
+        return os.path.basename(os.path.dirname(path))
+    return args.expected_pose
+
+
+def video_row(path, results, expected_pose, model_version, seconds, include_frames,
+              with_segments=False):
+    """Output row for a graded video"""
+    overall = analysis.build_overall_result(
+        results, os.path.basename(path), expected_pose, min_hold_frames=config.HOLD_MIN_FRAMES,
+        with_segments=with_segments
+    )
+    frame_results = overall.pop("frame_results")
+    return {
+        "video_path": path,
+        **overall,
+        "model_version": model_version,
+        "analysis_seconds": round(seconds, 3),
+        "frame_results": frame_results if include_frames else []
+    }
+
+
+async def grade_videos(pool, videos, writer, manifest, args):
+    """
+    Grade videos on the pool, writing each row and recording it in the manifest
+    
+    Returns:
+        Summary dictionary (counts, elapsed time, videos/min, frames/sec)
+    """
+    options = analysis_options(args)
+    semaphore = asyncio.Semaphore(pool.workers)
+    pending = {}  # path -> manifest fields, until the writer has the row on disk
+    summary = {"graded": 0, "failed": 0, "frames": 0}
+    
+    def record_written(rows):
+        for row in rows:
+            manifest.record(row["video_path"], "done", **pending.pop(row["video_path"]))
+    
+    async def grade(path, model):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                results = await pool.run(analysis.analyze_video_file, path, model=model, **options)
+                if not results:
+                    raise ValueError("No frames could be decoded from the video")
+                return path, model, results, None, time.perf_counter() - started
+            except Exception as e:
+                return path, model, None, str(e), time.perf_counter() - started
+    
+    tasks = []
+    for path in videos:
+        model = pool.model_registry.route(path)
+        tasks.append(grade(path, model))
+    
+    start = time.perf_counter()
+    try:
+        for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+            path, model, results, error, seconds = await task
+            expected_pose = expected_pose_for(path, args)
+            settings = settings_key(options, model["version"], expected_pose)
+            if error is not None:
+                summary["failed"] += 1
+                manifest.record(path, "failed", settings, error=error)
+                logger.error(f"[{done}/{len(videos)}] {path}: {error}")
+                continue
+            
+            row = video_row(path, results, expected_pose, model["version"], seconds,
+                            include_frames=not args.no_frames,
+                            with_segments=args.smoothing != "none" or args.adaptive_sampling)
+            pending[path] = {"settings": settings, "seconds": round(seconds, 3)}
+            record_written(writer.write(row))
+            summary["graded"] += 1
+            summary["frames"] += len(results)
+            
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"[{done}/{len(videos)}] {row['video_name']}: {row['accuracy_percentage']}% correct, "
+                f"{len(results)} frames in {seconds:.1f}s ({summary['graded'] / elapsed * 60:.1f} videos/min)"
+            )
+    finally:
+        record_written(writer.close())
+    
+    elapsed = time.perf_counter() - start
+    summary["seconds"] = round(elapsed, 1)
+    summary["videos_per_min"] = round(summary["graded"] / elapsed * 60, 1) if elapsed else 0.0
+    summary["frames_per_sec"] = round(summary["frames"] / elapsed, 1) if elapsed else 0.0
+    return summary
+
+
+async def run(args):
+    """Find the videos, skip those already graded and grade the rest"""
+    videos = find_videos(args.inputs)
+    if not videos:
+        raise SystemExit(f"No videos ({', '.join(VIDEO_EXTENSIONS)}) found in {' '.join(args.inputs)}")
+    
+    pool, inference_workers = create_pool(args)
+    manifest = ProgressManifest(args.manifest)
+    try:
+        options = analysis_options(args)
+        todo = [
+            path for path in videos
+            if not manifest.is_done(path, settings_key(
+                options, pool.model_registry.route(path)["version"], expected_pose_for(path, args)
+            ))
+        ]
+        logger.info(f"{len(videos)} videos found, {len(videos) - len(todo)} already graded, {len(todo)} to grade")
+        
+        writer = ParquetWriter(args.output, args.rows_per_file) if args.format == "parquet" \
+            else JsonLinesWriter(args.output)
+        if todo:
+            started = time.perf_counter()
+            await pool.warm_up()
+            logger.info(f"{args.workers} {args.pool} workers ready in {time.perf_counter() - started:.1f}s")
+        
+        summary = await grade_videos(pool, todo, writer, manifest, args)
+        return {"videos": len(videos), "skipped": len(videos) - len(todo), **summary}
+    finally:
+        manifest.close()
+        pool.shutdown()
+        pool.model_registry.close()
+        if inference_workers is not None:
+            inference_workers.shutdown()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.batch",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("inputs", nargs="+", help="Video files, directories (searched recursively) or glob patterns")
+    parser.add_argument("--output", help="JSON Lines file, or directory for --format parquet "
+                                         "(default: batch_results.jsonl or batch_results/)")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--rows-per-file", type=int, default=256, help="Videos per Parquet file")
+    parser.add_argument("--manifest", help="Progress manifest (default: <output>.manifest.jsonl)")
+    parser.add_argument("--no-frames", action="store_true", help="Leave per-frame results out of the output")
+    
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Videos graded at once")
+    parser.add_argument("--pool", choices=["process", "shm", "thread"], default="process",
+                        help="process: a model per worker process; shm: decode threads sharing "
+                             "inference processes; thread: one shared model")
+    parser.add_argument("--inference-processes", type=int, help="Inference processes with --pool shm")
+    parser.add_argument("--num-threads", type=int, help="CPU threads per forward pass")
+    parser.add_argument("--backend", default=config.MODEL_BACKEND, help="Model backend without --model-manifest")
+    parser.add_argument("--model-manifest", default=config.MODEL_MANIFEST,
+                        help="Model manifest (see model_registry.py); an A/B split is applied per video")
+    
+    parser.add_argument("--expected-pose", help="Pose every video should show")
+    parser.add_argument("--expected-pose-from-dir", action="store_true",
+                        help="Use each video's directory name as its expected pose")
+    parser.add_argument("--target-fps", type=float, help="Frames analyzed per second of video")
+    parser.add_argument("--max-frames", type=int, help="Most frames analyzed per video")
+    parser.add_argument("--smoothing", choices=SMOOTHING_MODES, default=config.TEMPORAL_SMOOTHING)
+    parser.add_argument("--adaptive-sampling", action="store_true", default=config.ADAPTIVE_SAMPLING)
+    parser.add_argument("--motion-threshold", type=float, default=config.MOTION_THRESHOLD)
+    parser.add_argument("--person-roi", action="store_true", default=config.PERSON_ROI,
+                        help="Crop frames to the practitioner before classifying them")
+    args = parser.parse_args(argv)
+    
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.output is None:
+        args.output = "batch_results/" if args.format == "parquet" else "batch_results.jsonl"
+    if args.manifest is None:
+        args.manifest = args.output.rstrip("/\\") + ".manifest.jsonl"
+    return args
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args = parse_args(argv)
+    summary = asyncio.run(run(args))
+    logger.info(
+        f"Graded {summary['graded']} videos ({summary['failed']} failed, {summary['skipped']} already graded)"
+        + (f" in {summary['seconds']}s: {summary['videos_per_min']} videos/min, "
+           f"{summary['frames_per_sec']} frames/sec" if summary["graded"] else "")
+    )
+    print(json.dumps(summary))
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Compact encodings of analysis results, chosen by the client's Accept header
+
+Plain JSON repeats the class names as keys of every frame's
+"all_probabilities" and spells out every feedback sentence. Clients on slow
+links can ask for a columnar layout instead:
+
+    Accept: application/vnd.yoga.columnar+json    columnar JSON
+    Accept: application/msgpack                    the same layout as MessagePack
+
+A columnar response has one label table and one feedback table. Frames are
+stored column by column: poses are indexes into "labels", feedback is an
+index into "feedback_table" (a template in which "{pose}" stands for the
+frame's pose), and float columns are packed little-endian buffers
+({"dtype", "data"}, base64 in JSON, raw bytes in MessagePack). In
+MessagePack, thumbnails are raw JPEG bytes; in JSON they are base64 without
+the data URI prefix.
+
+Media type parameters:
+    dtype=float16|float32    precision of packed floats (default float16)
+    packing=base64|list      JSON only: plain lists of rounded numbers instead of buffers
+    tables=<id>              "tables" value of an earlier response; if the tables
+                             are unchanged, "labels" and "feedback_table" are left out
+
+/analyze-pose:
+
+    {
+        "format": "yoga-columnar/1",
+        "tables": "5d41402a",
+        "labels": ["Anantasana", ...],
+        "feedback_table": ["Perfect {pose}! Excellent form.", ...],
+        "summary": {...the JSON response without "frame_results"...},
+        "frames": {
+            "count": 30,
+            "frame_number": [0, 1, ...],
+            "pose": [7, 7, ...],
+            "confidence": {"dtype": "float16", "data": "..."},
+            "is_correct": [true, ...],
+            "feedback": [1, 1, ...],
+            ...and, when present: smoothed_pose, smoothed_confidence,
+            inference_skipped, video_frame, timestamp, probabilities
+            ({"dtype", "shape", "data"}, rows in label order), image or image_url
+        }
+    }
+
+/analyze-webcam-frame returns one row: "format", "tables", "labels",
+"feedback_table", "pose", "confidence", "is_correct", "feedback",
+"probabilities" (in label order) and "model_version". Streaming clients
+should send tables=<id> so that each frame carries only its own values.
+
+Responses are serialized with orjson (falling back to json) and video
+results are streamed column by column. MessagePack is only offered when the
+msgpack package is installed.
+"""
+import base64
+import hashlib
+import json
+
+from lazy_modules import np
+from model_handler import FEEDBACK_TEMPLATES
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMAT = "yoga-columnar/1"
+COLUMNAR_JSON = "application/vnd.yoga.columnar+json"
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+PLAIN_JSON_TYPES = ("application/json", "application/*", "*/*")
+
+# Thumbnails serialized per chunk of a streamed response
+IMAGE_CHUNK_ROWS = 32
+
+# Decimals kept by packing=list for each dtype
+_LIST_DECIMALS = {"float16": 4, "float32": 6}
+
+
+class Encoding:
+    """A compact encoding negotiated from an Accept header"""
+    
+    def __init__(self, media_type, dtype="float16", packing="base64", tables=None):
+        self.media_type = media_type
+        self.dtype = dtype
+        self.packing = packing
+        self.tables = tables  # ID of the tables the client already has
+    
+    @property
+    def msgpack(self):
+        return self.media_type in MSGPACK_TYPES
+
+
+def negotiate(accept):
+    """
+    Pick the response encoding for an Accept header
+    
+    Args:
+        accept: Accept header value (None = none sent)
+    
+    Returns:
+        Encoding, or None for plain JSON
+    """
+    offers = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        options = {}
+        for param in params:
+            name, _, value = param.partition("=")
+            options[name.strip().lower()] = value.strip().strip('"').lower()
+        try:
+            quality = float(options.pop("q", 1))
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            offers.append((-quality, position, media_type.lower(), options))
+    
+    for _, _, media_type, options in sorted(offers):
+        if media_type in PLAIN_JSON_TYPES:
+            return None
+        if media_type == COLUMNAR_JSON or (media_type in MSGPACK_TYPES and msgpack is not None):
+            dtype = options.get("dtype", "float16")
+            packing = options.get("packing", "base64")
+            return Encoding(
+                media_type,
+                dtype=dtype if dtype in _LIST_DECIMALS else "float16",
+                packing=packing if packing in ("base64", "list") else "base64",
+                tables=options.get("tables")
+            )
+    return None
+
+
+def dumps_json(content):
+    """Serialize a plain JSON response body"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class _Tables:
+    """Label and feedback tables of one response, grown as unseen values turn up"""
+    
+    def __init__(self, labels):
+        self.labels = list(labels)
+        self._label_codes = {label: i for i, label in enumerate(self.labels)}
+        self.feedback = list(FEEDBACK_TEMPLATES.values())
+        self._feedback_codes = {}
+    
+    def label(self, name):
+        """Index of a pose name (e.g. "Unknown" is added on first use)"""
+        code = self._label_codes.get(name)
+        if code is None:
+            code = self._label_codes[name] = len(self.labels)
+            self.labels.append(name)
+        return code
+    
+    def feedback_code(self, text, poses):
+        """Index of the template that produces text for one of poses, or of text itself"""
+        code = self._feedback_codes.get((text, None))
+        if code is not None:
+            return code
+        for pose in poses:
+            code = self._feedback_codes.get((text, pose))
+            if code is not None:
+                return code
+            for code, template in enumerate(self.feedback[:len(FEEDBACK_TEMPLATES)]):
+                if template.format(pose=pose) == text:
+                    self._feedback_codes[(text, pose)] = code
+                    return code
+        # Not templated (e.g. an error message): stored once, verbatim
+        code = self._feedback_codes[(text, None)] = len(self.feedback)
+        self.feedback.append(text)
+        return code
+    
+    def fields(self, encoding):
+        """Top-level fields carrying the tables (only their ID if the client has them)"""
+        tables_id = hashlib.sha256(
+            json.dumps([self.labels, self.feedback]).encode("utf-8")
+        ).hexdigest()[:8]
+        if encoding.tables == tables_id:
+            return [("tables", tables_id)]
+        return [("tables", tables_id), ("labels", self.labels), ("feedback_table", self.feedback)]
+
+
+def _floats(values, encoding, shape=None):
+    """A float column: a packed buffer, or a list of rounded numbers (JSON packing=list)"""
+    if encoding.packing == "list" and not encoding.msgpack:
+        decimals = _LIST_DECIMALS[encoding.dtype]
+        if shape is not None:
+            return [[round(float(v), decimals) for v in row] for row in values]
+        return [round(float(v), decimals) for v in values]
+    data = np.asarray(values, dtype="<f2" if encoding.dtype == "float16" else "<f4").tobytes()
+    packed = {"dtype": encoding.dtype}
+    if shape is not None:
+        packed["shape"] = list(shape)
+    packed["data"] = data if encoding.msgpack else base64.b64encode(data).decode("ascii")
+    return packed
+
+
+def _probabilities(all_probabilities, tables):
+    """Probabilities of a prediction in label-table order"""
+    for label in all_probabilities:
+        tables.label(label)
+    return [all_probabilities.get(label, 0.0) for label in tables.labels]
+
+
+def _poses(result, pose_key):
+    """Pose names a result's feedback may have been written for"""
+    return [result.get("smoothed_pose", result[pose_key]), result[pose_key]]
+
+
+def _image(uri, encoding):
+    """A thumbnail as raw JPEG bytes (MessagePack) or base64 without the data URI prefix"""
+    data = uri.split(",", 1)[1]
+    return base64.b64decode(data) if encoding.msgpack else data
+
+
+def stream_video_result(result, labels, encoding):
+    """
+    Encode an /analyze-pose result, yielding the body in chunks
+    
+    Args:
+        result: Dictionary from analysis.build_overall_result (with "model_version")
+        labels: Label map of the model that produced it
+        encoding: Encoding from negotiate()
+    
+    Yields:
+        Chunks of the response body
+    """
+    tables = _Tables(labels)
+    frames = result["frame_results"]
+    summary = {key: value for key, value in result.items() if key != "frame_results"}
+    
+    # Code columns first, so the tables are complete before anything is sent
+    columns = [
+        ("count", len(frames)),
+        ("frame_number", [r["frame_number"] for r in frames]),
+        ("pose", [tables.label(r["pose_detected"]) for r in frames]),
+        ("confidence", _floats([r["confidence"] for r in frames], encoding)),
+        ("is_correct", [r["is_correct"] for r in frames]),
+        ("feedback", [tables.feedback_code(r["feedback"], _poses(r, "pose_detected")) for r in frames])
+    ]
+    if frames and all("smoothed_pose" in r for r in frames):
+        columns.append(("smoothed_pose", [tables.label(r["smoothed_pose"]) for r in frames]))
+        columns.append(("smoothed_confidence", _floats([r["smoothed_confidence"] for r in frames], encoding)))
+    if any(r.get("inference_skipped") for r in frames):
+        columns.append(("inference_skipped", [bool(r.get("inference_skipped")) for r in frames]))
+    if frames and all("video_frame" in r for r in frames):
+        columns.append(("video_frame", [r["video_frame"] for r in frames]))
+        columns.append(("timestamp", [r["timestamp"] for r in frames]))
+    if frames and all("all_probabilities" in r for r in frames):
+        rows = [_probabilities(r["all_probabilities"], tables) for r in frames]
+        # Labels may have grown while the rows were built
+        rows = [row + [0.0] * (len(tables.labels) - len(row)) for row in rows]
+        columns.append(("probabilities", _floats(rows, encoding, shape=(len(rows), len(tables.labels)))))
+    
+    images = None
+    if frames and all("image" in r for r in frames):
+        images = ("image", [r["image"] for r in frames], lambda uri: _image(uri, encoding))
+    elif frames and all("image_url" in r for r in frames):
+        columns.append(("image_url", [r["image_url"] for r in frames]))
+    
+    fields = [("format", FORMAT), *tables.fields(encoding), ("summary", summary)]
+    if encoding.msgpack:
+        yield from _msgpack_chunks(fields, columns, images)
+    else:
+        yield from _json_chunks(fields, columns, images)
+
+
+def encode_prediction(prediction, labels, encoding):
+    """
+    Encode an /analyze-webcam-frame prediction
+    
+    Args:
+        prediction: Prediction dictionary (with "model_version")
+        labels: Label map of the model that produced it
+        encoding: Encoding from negotiate()
+    
+    Returns:
+        Response body
+    """
+    tables = _Tables(labels)
+    pose = tables.label(prediction["pose_class"])
+    feedback = tables.feedback_code(prediction["feedback"], [prediction["pose_class"]])
+    probabilities = None
+    if "all_probabilities" in prediction:
+        probabilities = _probabilities(prediction["all_probabilities"], tables)
+    
+    fields = [
+        ("format", FORMAT),
+        *tables.fields(encoding),
+        ("pose", pose),
+        ("confidence", prediction["confidence"]),
+        ("is_correct", prediction["is_correct"]),
+        ("feedback", feedback)
+    ]
+    if probabilities is not None:
+        fields.append(("probabilities", _floats(probabilities, encoding)))
+    fields.append(("model_version", prediction.get("model_version")))
+    
+    if encoding.msgpack:
+        return b"".join(_msgpack_chunks(fields, None, None))
+    return b"".join(_json_chunks(fields, None, None))
+
+
+def _json_chunks(fields, columns, images):
+    """
+    Serialize a columnar document as JSON, piece by piece
+    
+    Args:
+        fields: Top-level (key, value) pairs
+        columns: (key, value) pairs of the "frames" object (None = no "frames")
+        images: (key, values, convert) of a column serialized IMAGE_CHUNK_ROWS values at a time, or None
+    """
+    yield b"{" + b",".join(dumps_json(key) + b":" + dumps_json(value) for key, value in fields)
+    if columns is not None:
+        yield b',"frames":{' + b",".join(dumps_json(key) + b":" + dumps_json(value) for key, value in columns)
+        if images is not None:
+            key, values, convert = images
+            yield b"," + dumps_json(key) + b":["
+            for start in range(0, len(values), IMAGE_CHUNK_ROWS):
+                chunk = b",".join(dumps_json(convert(value)) for value in values[start:start + IMAGE_CHUNK_ROWS])
+                yield (b"," if start else b"") + chunk
+            yield b"]"
+        yield b"}"
+    yield b"}"
+
+
+def _msgpack_chunks(fields, columns, images):
+    """Serialize a columnar document as MessagePack, piece by piece (arguments as for _json_chunks)"""
+    packer = msgpack.Packer()
+    yield packer.pack_map_header(len(fields) + (columns is not None)) + b"".join(
+        packer.pack(key) + packer.pack(value) for key, value in fields
+    )
+    if columns is not None:
+        yield packer.pack("frames") + packer.pack_map_header(len(columns) + (images is not None)) + b"".join(
+            packer.pack(key) + packer.pack(value) for key, value in columns
+        )
+        if images is not None:
+            key, values, convert = images
+            yield packer.pack(key) + packer.pack_array_header(len(values))
+            for start in range(0, len(values), IMAGE_CHUNK_ROWS):
+                yield b"".join(packer.pack(convert(value)) for value in values[start:start + IMAGE_CHUNK_ROWS])
@@ -0,0 +1,164 @@
+"""
+Backend configuration
+
+Every setting can be overridden with an environment variable of the same
+name, which is how the Azure App Service deployment configures the app.
+"""
+import os
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name, default):
+    """Read an on/off setting from the environment ("1", "true", "yes" or "on" enable it)"""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int_list(name, default):
+    """Read a comma-separated list of integers from the environment"""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _env_float(name, default):
+    """Read a decimal setting from the environment"""
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_str(name, default):
+    """Read a string setting from the environment"""
+    value = os.getenv(name)
+    return value if value not in (None, "") else default
+
+
+# Number of sampled frames sent to the model per forward pass
+INFERENCE_BATCH_SIZE = _env_int("INFERENCE_BATCH_SIZE", 16)
+
+# Executor that runs decoding and inference off the event loop: "thread", "process", or
+# "shm" (decoding on threads, forward passes in INFERENCE_PROCESSES via shared memory)
+WORKER_POOL_KIND = _env_str("WORKER_POOL_KIND", "thread")
+
+# Number of requests analyzed concurrently
+WORKER_POOL_SIZE = _env_int("WORKER_POOL_SIZE", 2)
+
+# Requests allowed to wait for a free worker before new ones are rejected with 503
+WORKER_QUEUE_SIZE = _env_int("WORKER_QUEUE_SIZE", 8)
+
+# Workers reserved for webcam batches, on top of WORKER_POOL_SIZE, so video analysis
+# cannot starve them (0 = webcam batches share the video workers)
+WEBCAM_WORKERS = _env_int("WEBCAM_WORKERS", 1)
+
+# Seconds clients are asked to wait (Retry-After header) when the server is overloaded
+RETRY_AFTER_SECONDS = _env_int("RETRY_AFTER_SECONDS", 2)
+
+# Inference processes for WORKER_POOL_KIND=shm (0 = one per two CPU cores)
+INFERENCE_PROCESSES = _env_int("INFERENCE_PROCESSES", 0)
+
+# Batches in flight at once per model for WORKER_POOL_KIND=shm (0 = two per inference process)
+SHM_RING_SLOTS = _env_int("SHM_RING_SLOTS", 0)
+
+# Webcam micro-batching: largest batch, longest wait for more frames, and pending-frame bound
+WEBCAM_BATCH_SIZE = _env_int("WEBCAM_BATCH_SIZE", 8)
+WEBCAM_BATCH_WAIT_MS = _env_int("WEBCAM_BATCH_WAIT_MS", 5)
+WEBCAM_BATCH_QUEUE_SIZE = _env_int("WEBCAM_BATCH_QUEUE_SIZE", 64)
+
+# Inference backend: "savedmodel" (TensorFlow) or "tflite" (fp16 or INT8 .tflite file)
+MODEL_BACKEND = _env_str("MODEL_BACKEND", "savedmodel")
+
+# Model file used by the "tflite" backend
+TFLITE_MODEL_PATH = _env_str(
+    "TFLITE_MODEL_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "model_prep", "yoga_model_fp16.tflite")
+)
+
+# CPU threads used by the model for one forward pass (0 = library default)
+MODEL_NUM_THREADS = _env_int("MODEL_NUM_THREADS", 0)
+
+# JSON manifest listing the served models, their label maps and the A/B split
+# (empty = serve one model chosen by MODEL_BACKEND, labelled by model_prep/labels.txt)
+MODEL_MANIFEST = _env_str("MODEL_MANIFEST", None)
+
+# How often the manifest is checked for changes, which are then hot-swapped (0 = never)
+MODEL_MANIFEST_POLL_SECONDS = _env_int("MODEL_MANIFEST_POLL_SECONDS", 10)
+
+# Unload a model other than the active one after this many seconds without requests (0 = never)
+MODEL_IDLE_UNLOAD_SECONDS = _env_int("MODEL_IDLE_UNLOAD_SECONDS", 600)
+
+# Temporal smoothing of per-frame video predictions: "ema", "majority" or "none"
+# (smoothing changes per-frame is_correct/feedback and the accuracy, so it is opt-in)
+TEMPORAL_SMOOTHING = _env_str("TEMPORAL_SMOOTHING", "none")
+
+# Analyze fewer frames while a pose is held and more during transitions
+ADAPTIVE_SAMPLING = _env_bool("ADAPTIVE_SAMPLING", False)
+
+# Adaptive sampling: frames per forward pass, and largest step as a multiple of the fixed step
+ADAPTIVE_BATCH_SIZE = _env_int("ADAPTIVE_BATCH_SIZE", 4)
+ADAPTIVE_MAX_STRIDE = _env_int("ADAPTIVE_MAX_STRIDE", 4)
+
+# Frames whose mean pixel difference (0-1) from the last inferred frame is at most
+# this reuse its prediction instead of running the model (0 = infer every frame)
+MOTION_THRESHOLD = _env_float("MOTION_THRESHOLD", 0.0)
+
+# Crop video frames to the practitioner (found by background subtraction) before resizing them
+PERSON_ROI = _env_bool("PERSON_ROI", False)
+
+# Consecutive frames of the same (smoothed) pose reported as a hold segment
+HOLD_MIN_FRAMES = _env_int("HOLD_MIN_FRAMES", 3)
+
+# Record stage/endpoint timings and serve them at /metrics (0 turns instrumentation off)
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+
+# Add a Server-Timing header with each request's stage timings (visible in browser dev tools)
+SERVER_TIMING = _env_bool("SERVER_TIMING", False)
+
+# Load and warm up the model at startup instead of on the first request
+# (/health/ready answers 503 until it is done)
+MODEL_EAGER_LOAD = _env_bool("MODEL_EAGER_LOAD", False)
+
+# Batch sizes pushed through the model once during warm-up
+MODEL_WARMUP_BATCH_SIZES = _env_int_list(
+    "MODEL_WARMUP_BATCH_SIZES",
+    sorted({1, WEBCAM_BATCH_SIZE, INFERENCE_BATCH_SIZE})
+)
+
+# Read the model in the gunicorn master (run with --preload) so forked workers share it copy-on-write
+MODEL_PRELOAD = _env_bool("MODEL_PRELOAD", False)
+
+# Directory for uploads that must be copied to a named file (empty = system temp dir;
+# point it at a tmpfs such as /dev/shm to keep uploads off disk)
+UPLOAD_TMP_DIR = _env_str("UPLOAD_TMP_DIR", None)
+
+# Default frame image mode for /analyze-pose: "full" (frames at original size),
+# "thumbnail", "ref" or "none"
+IMAGE_MODE = _env_str("IMAGE_MODE", "full")
+
+# Default width (pixels, aspect ratio preserved) and JPEG quality of frame thumbnails
+THUMBNAIL_WIDTH = _env_int("THUMBNAIL_WIDTH", 320)
+THUMBNAIL_JPEG_QUALITY = _env_int("THUMBNAIL_JPEG_QUALITY", 75)
+
+# How long and how many bytes of thumbnails are kept for /frames/{job_id}/{n}
+FRAME_CACHE_TTL_SECONDS = _env_int("FRAME_CACHE_TTL_SECONDS", 300)
+FRAME_CACHE_MAX_MB = _env_int("FRAME_CACHE_MAX_MB", 256)
+
+# Result cache: most results and megabytes kept in memory, and how long results stay valid
+RESULT_CACHE_ENTRIES = _env_int("RESULT_CACHE_ENTRIES", 256)
+RESULT_CACHE_MAX_MB = _env_int("RESULT_CACHE_MAX_MB", 128)
+RESULT_CACHE_TTL_SECONDS = _env_int("RESULT_CACHE_TTL_SECONDS", 3600)
+
+# SQLite file for a result cache tier that survives restarts (empty = memory only)
+RESULT_CACHE_DB = _env_str("RESULT_CACHE_DB", None)
+
+# Background jobs (POST /jobs): concurrent jobs, waiting jobs, and how long finished jobs are kept
+JOB_WORKERS = _env_int("JOB_WORKERS", 1)
+JOB_QUEUE_SIZE = _env_int("JOB_QUEUE_SIZE", 16)
+JOB_TTL_SECONDS = _env_int("JOB_TTL_SECONDS", 3600)
@@ -0,0 +1,73 @@
+"""
+Short-lived cache of frame thumbnails
+
+With image_mode="ref", /analyze-pose stores each frame's JPEG thumbnail here
+under a random job ID and returns only its URL; clients fetch the images they
+actually show from /frames/{job_id}/{n}. Entries expire after a TTL and the
+cache is bounded by total bytes, evicting the oldest jobs first.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class FrameCache:
+    """Thread-safe TTL + size bounded store of per-job JPEG frames"""
+    
+    def __init__(self, ttl_seconds=300, max_bytes=256 * 1024 * 1024):
+        """
+        Args:
+            ttl_seconds: How long a job's frames stay available
+            max_bytes: Upper bound on the total size of stored JPEGs
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._jobs = OrderedDict()  # job_id -> (expires_at, frames, size)
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def put(self, frames):
+        """
+        Store one job's frames
+        
+        Args:
+            frames: List of JPEG-encoded frames (bytes)
+            
+        Returns:
+            The job ID the frames are stored under
+        """
+        job_id = uuid.uuid4().hex
+        size = sum(len(frame) for frame in frames)
+        with self._lock:
+            self._evict_expired()
+            self._jobs[job_id] = (time.monotonic() + self.ttl_seconds, list(frames), size)
+            self._size += size
+            
+            # Oldest jobs go first; the new job is kept even if it alone exceeds the bound
+            while self._size > self.max_bytes and len(self._jobs) > 1:
+                _, (_, _, evicted_size) = self._jobs.popitem(last=False)
+                self._size -= evicted_size
+        return job_id
+    
+    def get(self, job_id, frame_number):
+        """Return a stored JPEG frame, or None if unknown or expired"""
+        with self._lock:
+            self._evict_expired()
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return None
+            frames = entry[1]
+            if not 0 <= frame_number < len(frames):
+                return None
+            return frames[frame_number]
+    
+    def _evict_expired(self):
+        """Drop jobs past their TTL (caller holds the lock)"""
+        now = time.monotonic()
+        while self._jobs:
+            job_id, (expires_at, _, size) = next(iter(self._jobs.items()))
+            if expires_at > now:
+                break
+            del self._jobs[job_id]
+            self._size -= size
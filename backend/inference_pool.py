@@ -0,0 +1,306 @@
+"""
+Bounded executor for blocking analysis work
+
+Requests hand their CPU-heavy work to an InferencePool instead of running it
+on the asyncio event loop. The pool admits at most workers + queue_size jobs
+at a time; anything beyond that is rejected immediately with
+PoolOverloadedError so the API can shed load with a 503 instead of letting
+latency pile up.
+
+Latency-sensitive jobs (webcam batches) can be given workers of their own
+with priority_workers: run(..., priority=True) jobs go to those workers, so
+long video jobs occupying the regular ones never hold them up.
+
+Jobs that report progress while they run (background video jobs) take a
+queue from progress_queue(); for process pools it is a manager queue, so the
+worker process can hand results back before the job returns.
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+from model_registry import ModelRegistry, routed_models
+
+logger = logging.getLogger(__name__)
+
+# Model handler and video processor owned by a worker process (process pools only)
+_worker_state = {}
+
+
+class PoolOverloadedError(Exception):
+    """Raised when the pool's admission queue is full"""
+
+
+def _init_worker_process(manifest, warmup_batch_sizes, started, metrics_enabled, idle_unload_seconds):
+    """Load (and optionally warm up) a private copy of the active model in a freshly started worker process"""
+    from video_processor import VideoProcessor
+    
+    metrics.configure(metrics_enabled)
+    model_registry = ModelRegistry(manifest, idle_unload_seconds=idle_unload_seconds)
+    # Model load time is handed to the parent with the first job's observations
+    with metrics.collecting() as observations:
+        if warmup_batch_sizes:
+            for spec in routed_models(manifest):
+                model_registry.handler(spec).warm_up(warmup_batch_sizes)
+        else:
+            model_registry.handler().load_model()
+    _worker_state["observations"] = observations
+    _worker_state["model_registry"] = model_registry
+    _worker_state["video_processor"] = VideoProcessor()
+    started.release()
+
+
+def _sync_worker_manifest(manifest):
+    """Adopt the parent's manifest if it changed since this worker's last job"""
+    model_registry = _worker_state["model_registry"]
+    if model_registry.manifest["revision"] != manifest["revision"]:
+        model_registry.set_manifest(manifest)
+    return model_registry
+
+
+def _call_in_worker_process(fn, manifest, spec, args, kwargs):
+    """
+    Run an analysis function against the worker process's own copy of spec's model
+    
+    Returns:
+        (result, metrics observations made while computing it)
+    """
+    model_registry = _sync_worker_manifest(manifest)
+    with metrics.collecting() as observations:
+        with model_registry.lease(spec) as model_handler:
+            result = fn(model_handler, _worker_state["video_processor"], *args, **kwargs)
+    pending = _worker_state.pop("observations", None)
+    if pending:
+        observations = pending + observations
+    # Retired and long-idle models are released between jobs
+    model_registry.unload_idle()
+    return result, observations
+
+
+def _warm_up_worker_process(manifest, batch_sizes):
+    """Load and warm up the models routed by a new manifest in this worker process"""
+    _worker_state["model_registry"].prepare(manifest, batch_sizes)
+    return os.getpid()
+
+
+def _call_with_handler(model_registry, spec, fn, video_processor, args, kwargs):
+    """Run an analysis function on a worker thread with spec's (shared) model handler"""
+    return fn(model_registry.handler(spec), video_processor, *args, **kwargs)
+
+
+def _call_collecting(call):
+    """Run call() on a worker thread, returning (result, metrics observations)"""
+    with metrics.collecting() as observations:
+        result = call()
+    return result, observations
+
+
+def _worker_process_pid():
+    """No-op job used to make the executor start its worker processes"""
+    return os.getpid()
+
+
+class InferencePool:
+    """Runs analysis functions on a thread or process pool with bounded admission"""
+    
+    def __init__(self, model_registry, video_processor, kind="thread", workers=2, queue_size=8,
+                 warmup_batch_sizes=(), priority_workers=0):
+        """
+        Args:
+            model_registry: ModelRegistry routing jobs to models (thread workers share its handlers)
+            video_processor: VideoProcessor used by thread workers
+            kind: "thread" (shares the registry's models), "process" (models loaded per process)
+                or "shm" (threads whose handlers send forward passes to InferenceWorkers)
+            workers: Number of jobs executed concurrently
+            queue_size: Number of jobs allowed to wait for a free worker
+            warmup_batch_sizes: Batch sizes run through the model by warm_up()
+                (and by every worker process when it starts)
+            priority_workers: Extra workers that only run priority jobs (0 = priority
+                jobs share the regular workers). Priority jobs are not counted
+                against the admission queue; their callers bound them.
+        """
+        if kind not in ("thread", "process", "shm"):
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        if priority_workers < 0:
+            raise ValueError(f"priority_workers must not be negative, got {priority_workers}")
+        
+        self.model_registry = model_registry
+        self.video_processor = video_processor
+        self.kind = kind
+        self.workers = workers
+        self.capacity = workers + max(0, queue_size)
+        self.warmup_batch_sizes = tuple(warmup_batch_sizes)
+        self.priority_workers = priority_workers
+        
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._manager = None  # Serves progress queues to worker processes (started on first use)
+        
+        if kind == "process":
+            # Released by each worker process once its model is loaded
+            self._workers_started = multiprocessing.get_context("spawn").Semaphore(0)
+        self._executor = self._create_executor(workers, "inference")
+        self._priority_executor = self._create_executor(priority_workers, "inference-priority") \
+            if priority_workers else None
+        
+        logger.info(
+            f"Inference pool ready: {workers} {kind} workers, {self.capacity - workers} queue slots"
+            + (f", {priority_workers} priority workers" if priority_workers else "")
+        )
+    
+    def _create_executor(self, workers, name):
+        """Thread or process executor with the given number of workers"""
+        if self.kind != "process":
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker_process,
+            initargs=(
+                self.model_registry.manifest,
+                self.warmup_batch_sizes,
+                self._workers_started,
+                metrics.enabled,
+                self.model_registry.idle_unload_seconds
+            )
+        )
+    
+    def _executors(self):
+        """(executor, number of workers) for the regular and the priority workers"""
+        executors = [(self._executor, self.workers)]
+        if self._priority_executor is not None:
+            executors.append((self._priority_executor, self.priority_workers))
+        return executors
+    
+    @property
+    def in_flight(self):
+        """Number of admitted jobs that are running or waiting"""
+        return self._in_flight
+    
+    async def run(self, fn, *args, model=None, priority=False, **kwargs):
+        """
+        Run fn(model_handler, video_processor, *args, **kwargs) on the pool
+        
+        Args:
+            fn: Module-level analysis function (must be picklable for process pools)
+            model: Model spec from ModelRegistry.route() (None = route at random)
+            priority: Run on the priority workers, if the pool has any
+        
+        Returns:
+            Whatever fn returns
+        
+        Raises:
+            PoolOverloadedError: If the admission queue is full
+        """
+        executor = self._priority_executor if priority else None
+        if executor is None:
+            executor = self._executor
+            with self._lock:
+                if self._in_flight >= self.capacity:
+                    raise PoolOverloadedError(f"{self._in_flight} jobs already admitted")
+                self._in_flight += 1
+        
+        spec = model or self.model_registry.route()
+        # Keeps the model loaded until the job is done, even if it is swapped out meanwhile
+        self.model_registry.acquire(spec)
+        try:
+            loop = asyncio.get_running_loop()
+            if self.kind == "process":
+                call = functools.partial(
+                    _call_in_worker_process, fn, self.model_registry.manifest, spec, args, kwargs
+                )
+            else:
+                call = functools.partial(
+                    _call_with_handler, self.model_registry, spec, fn, self.video_processor, args, kwargs
+                )
+                if not metrics.enabled:
+                    return await loop.run_in_executor(executor, call)
+                call = functools.partial(_call_collecting, call)
+            
+            # Stage timings measured on the worker are recorded here, in the request's context
+            result, observations = await loop.run_in_executor(executor, call)
+            metrics.replay(observations)
+            return result
+        finally:
+            self.model_registry.release(spec)
+            if executor is self._executor:
+                with self._lock:
+                    self._in_flight -= 1
+    
+    def progress_queue(self):
+        """Queue a job run on this pool can put() results on while the caller get()s them"""
+        if self.kind != "process":
+            return queue.Queue()
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+            return self._manager.Queue()
+    
+    async def warm_up(self, manifest=None, batch_sizes=None):
+        """
+        Load and warm up models before traffic arrives
+        
+        At startup (no manifest), thread pools warm the shared handlers of
+        the routed models once, and process pools start every worker
+        process, each of which loads and warms its own copies in its
+        initializer.
+        
+        Before a hot-swap, pass the new manifest: its routed models are
+        loaded and warmed while the current ones keep serving. Process pools
+        send one warm-up job per worker; a worker that happens to take none
+        loads the new model on its first request.
+        
+        Args:
+            manifest: Manifest about to be swapped in (None = the current one, at startup)
+            batch_sizes: Batch sizes to warm (default: warmup_batch_sizes, or 1)
+        """
+        loop = asyncio.get_running_loop()
+        batch_sizes = batch_sizes or self.warmup_batch_sizes or (1,)
+        if manifest is not None:
+            if self.kind == "process":
+                await asyncio.gather(*[
+                    loop.run_in_executor(executor, _warm_up_worker_process, manifest, batch_sizes)
+                    for executor, workers in self._executors()
+                    for _ in range(workers)
+                ])
+            else:
+                # On a separate thread, so the pool's workers keep serving the current models
+                await asyncio.to_thread(self.model_registry.prepare, manifest, batch_sizes)
+            return
+        
+        if self.kind == "process":
+            # Processes are started on demand: one per job submitted while none is idle
+            pending = [
+                loop.run_in_executor(executor, _worker_process_pid)
+                for executor, workers in self._executors()
+                for _ in range(workers)
+            ]
+            for _ in pending:
+                while not await asyncio.to_thread(self._workers_started.acquire, True, 1.0):
+                    # A failing initializer breaks the pool instead of releasing the semaphore
+                    for future in pending:
+                        if future.done() and future.exception() is not None:
+                            raise future.exception()
+            await asyncio.gather(*pending)
+            logger.info(f"{len(pending)} worker processes ready")
+        else:
+            for spec in routed_models(self.model_registry.manifest):
+                await loop.run_in_executor(
+                    self._executor,
+                    functools.partial(self.model_registry.handler(spec).warm_up, batch_sizes)
+                )
+    
+    def shutdown(self):
+        """Stop accepting work and wait for running jobs to finish"""
+        for executor, _ in self._executors():
+            executor.shutdown(wait=True)
+        if self._manager is not None:
+            self._manager.shutdown()
@@ -0,0 +1,414 @@
+"""
+Inference processes fed through shared-memory ring buffers (WORKER_POOL_KIND=shm)
+
+In the "process" pool every worker process decodes its own video and runs
+the model. In "shm" mode the work is split instead:
+
+- Decoding, resizing and the rest of the Python-level work stay in the API
+  process, on the InferencePool's threads (OpenCV releases the GIL).
+- N inference processes each hold their own copy of the model and only run
+  forward passes.
+- Frames travel through a FrameRing: a block of shared memory divided into
+  slots of one batch each. A front thread resizes frames straight into a
+  free slot, sends the slot number to the least busy inference process, and
+  reads the class probabilities back from the same slot. Only small control
+  tuples are pickled; pixel data is never copied between processes.
+
+SharedMemoryModelHandler is the YogaModelHandler used in this mode, so the
+analysis code runs unchanged.
+"""
+import functools
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import metrics
+from lazy_modules import np
+from model_handler import YogaModelHandler
+
+logger = logging.getLogger(__name__)
+
+# Widest model output a ring slot can hold
+MAX_CLASSES = 256
+
+
+class FrameRing:
+    """Fixed set of shared-memory batch slots, handed out to one thread at a time"""
+    
+    def __init__(self, slots, batch_size, height, width, name=None):
+        """
+        Args:
+            slots: Number of batches that can be in flight at once
+            batch_size: Frames per slot
+            height, width: Model input size
+            name: Attach to an existing ring (inference processes) instead of creating one
+        """
+        self.geometry = (slots, batch_size, height, width)
+        input_bytes = slots * batch_size * height * width * 3
+        output_bytes = slots * batch_size * MAX_CLASSES * 4
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=input_bytes + output_bytes)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        self.inputs = np.ndarray((slots, batch_size, height, width, 3), dtype=np.uint8, buffer=self._shm.buf)
+        self.outputs = np.ndarray(
+            (slots, batch_size, MAX_CLASSES), dtype=np.float32, buffer=self._shm.buf, offset=input_bytes
+        )
+        self._free = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+    
+    def acquire(self):
+        """Take a free slot, waiting for one if every slot is in use"""
+        return self._free.get()
+    
+    def release(self, slot):
+        """Hand a slot back"""
+        self._free.put(slot)
+    
+    def close(self, unlink=False):
+        """Unmap the ring (and remove it, from the process that created it)"""
+        self.inputs = self.outputs = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+def _worker_main(index, tasks, results, metrics_enabled, num_threads, initializer):
+    """
+    Loop of one inference process: run tasks from the API process until told to stop
+    
+    Tasks are (kind, request_id, *args) tuples; every task is answered on
+    results with (request_id, ok, payload, metrics observations).
+    """
+    if initializer is not None:
+        initializer()
+    metrics.configure(metrics_enabled)
+    handlers = {}  # model version -> YogaModelHandler
+    rings = {}  # shared memory name -> FrameRing
+    
+    def handler_for(spec):
+        handler = handlers.get(spec["version"])
+        if handler is None:
+            handler = handlers[spec["version"]] = YogaModelHandler(
+                spec["path"],
+                backend=spec["backend"],
+                num_threads=spec["num_threads"] or num_threads,
+                pose_classes=spec["labels"],
+                model_id=spec["id"]
+            )
+        return handler
+    
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        kind, request_id, args = task[0], task[1], task[2:]
+        try:
+            with metrics.collecting() as observations:
+                if kind == "infer":
+                    spec, ring_name, geometry, slot, count = args
+                    ring = rings.get(ring_name)
+                    if ring is None:
+                        ring = rings[ring_name] = FrameRing(*geometry, name=ring_name)
+                    handler = handler_for(spec)
+                    handler.ensure_loaded()
+                    output = handler._run_inference(ring.inputs[slot, :count])
+                    ring.outputs[slot, :count, :output.shape[1]] = output
+                    payload = output.shape[1]
+                elif kind == "load":
+                    handler = handler_for(args[0])
+                    handler.ensure_loaded()
+                    payload = (handler.input_size, handler.max_batch_size, handler.num_classes)
+                elif kind == "warm_up":
+                    spec, batch_sizes = args
+                    handler = handler_for(spec)
+                    handler.warm_up(batch_sizes)
+                    payload = (handler.input_size, handler.max_batch_size, handler.num_classes)
+                elif kind == "unload":
+                    spec, ring_name = args
+                    handler = handlers.pop(spec["version"], None)
+                    if handler is not None:
+                        handler.unload()
+                    ring = rings.pop(ring_name, None)
+                    if ring is not None:
+                        ring.close()
+                    payload = None
+                else:
+                    raise ValueError(f"Unknown task: {kind}")
+            results.put((request_id, True, payload, observations))
+        except Exception as e:
+            logger.error(f"Inference process {index}: {kind} failed: {str(e)}")
+            results.put((request_id, False, str(e), []))
+    
+    for ring in rings.values():
+        ring.close()
+
+
+class InferenceWorkers:
+    """Inference processes, each with its own task queue, and the results they send back"""
+    
+    def __init__(self, processes=None, ring_slots=None, batch_size=16, num_threads=None, initializer=None):
+        """
+        Args:
+            processes: Number of inference processes (None = one per two CPU cores)
+            ring_slots: Batches in flight at once, per model (None = two per process)
+            batch_size: Largest batch a ring slot holds
+            num_threads: CPU threads per forward pass in each process
+                (None = the cores divided evenly between the processes)
+            initializer: Picklable function each process runs first (e.g. to register a backend)
+        """
+        cores = os.cpu_count() or 1
+        self.processes = processes or max(1, cores // 2)
+        self.ring_slots = ring_slots or 2 * self.processes
+        self.batch_size = batch_size
+        self.num_threads = num_threads or max(1, cores // self.processes)
+        self._initializer = initializer
+        
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self._workers = [None] * self.processes  # (Process, task queue)
+        self._outstanding = [0] * self.processes
+        self._pending = {}  # request_id -> (Future, process index)
+        self._request_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        
+        for index in range(self.processes):
+            self._start(index)
+        self._collector = threading.Thread(target=self._collect_results, name="inference-results", daemon=True)
+        self._collector.start()
+        logger.info(
+            f"Started {self.processes} inference processes, {self.num_threads} threads each, "
+            f"{self.ring_slots} ring slots of {batch_size} frames"
+        )
+    
+    def _start(self, index):
+        """(Re)start inference process index"""
+        tasks = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, tasks, self._results, metrics.enabled, self.num_threads, self._initializer),
+            name=f"inference-{index}",
+            daemon=True
+        )
+        process.start()
+        self._workers[index] = (process, tasks)
+    
+    def submit(self, index, kind, *args):
+        """
+        Send a task to one inference process
+        
+        Returns:
+            Future resolved with the task's payload
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Inference processes are shut down")
+            request_id = next(self._request_ids)
+            self._pending[request_id] = (future, index)
+            self._outstanding[index] += 1
+            tasks = self._workers[index][1]
+        tasks.put((kind, request_id) + args)
+        return future
+    
+    def call(self, kind, *args):
+        """Run a task on the least busy process and wait for its payload"""
+        with self._lock:
+            index = min(range(self.processes), key=self._outstanding.__getitem__)
+        return self._result(self.submit(index, kind, *args))
+    
+    def broadcast(self, kind, *args):
+        """Run a task on every process and wait for all payloads"""
+        futures = [self.submit(index, kind, *args) for index in range(self.processes)]
+        return [self._result(future) for future in futures]
+    
+    def _result(self, future):
+        """Wait for a task and record the metrics observations made while running it"""
+        payload, observations = future.result()
+        # Into the calling thread's collector, if any, like observations made here
+        for metric, value, labels in observations:
+            metrics.observe(metric, value, **labels)
+        return payload
+    
+    def _collect_results(self):
+        """Resolve futures as results arrive; fail and restart processes that died"""
+        while True:
+            try:
+                request_id, ok, payload, observations = self._results.get(timeout=1.0)
+            except queue.Empty:
+                self._check_processes()
+                continue
+            except (EOFError, OSError):
+                return
+            if request_id is None:
+                return
+            
+            with self._lock:
+                future, index = self._pending.pop(request_id, (None, None))
+                if future is None:
+                    continue
+                self._outstanding[index] -= 1
+            if ok:
+                future.set_result((payload, observations))
+            else:
+                future.set_exception(RuntimeError(payload))
+    
+    def _check_processes(self):
+        """Fail the tasks of any process that exited and start a replacement"""
+        with self._lock:
+            if self._closed:
+                return
+            for index, (process, _) in enumerate(self._workers):
+                if process.is_alive():
+                    continue
+                logger.error(f"Inference process {index} exited with code {process.exitcode}, restarting it")
+                lost = [request_id for request_id, (_, owner) in self._pending.items() if owner == index]
+                for request_id in lost:
+                    future, _ = self._pending.pop(request_id)
+                    future.set_exception(RuntimeError(f"Inference process {index} exited"))
+                self._outstanding[index] = 0
+                # Models are loaded again on the replacement's first task
+                self._start(index)
+    
+    def stats(self):
+        """Process count and tasks queued or running on each process"""
+        with self._lock:
+            return {
+                "processes": self.processes,
+                "threads_per_process": self.num_threads,
+                "ring_slots": self.ring_slots,
+                "outstanding": list(self._outstanding)
+            }
+    
+    def shutdown(self):
+        """Stop every inference process after the tasks already sent to it"""
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+        for _, tasks in workers:
+            tasks.put(None)
+        for process, _ in workers:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._results.put((None, True, None, []))
+        self._collector.join(timeout=5)
+
+
+class SharedMemoryModelHandler(YogaModelHandler):
+    """
+    YogaModelHandler that runs its forward passes in InferenceWorkers processes
+    
+    Preprocessing writes each batch straight into a FrameRing slot, which is
+    then sent to an inference process; everything else (labels, feedback,
+    prediction dictionaries) happens in this process as usual.
+    """
+    
+    def __init__(self, model_path, backend="savedmodel", num_threads=None, pose_classes=None, model_id=None,
+                 workers=None):
+        """
+        Args:
+            workers: InferenceWorkers that run the model; other arguments as for YogaModelHandler
+        """
+        super().__init__(model_path, backend=backend, num_threads=num_threads,
+                         pose_classes=pose_classes, model_id=model_id)
+        self.workers = workers
+        # What the inference processes need to build the real handler
+        self.spec = {
+            "id": model_id,
+            "backend": backend,
+            "path": model_path,
+            "labels": self.pose_classes,
+            "num_threads": num_threads,
+            "version": self.model_version
+        }
+        self._slots = threading.local()  # .held: (ring, slot) filled by this thread, not yet sent
+    
+    def load_model(self):
+        """Load the model in every inference process and allocate this model's ring"""
+        logger.info(f"Loading {self.backend} model from {self.model_path} in {self.workers.processes} processes")
+        self._attach(self.workers.broadcast("load", self.spec)[0])
+    
+    def warm_up(self, batch_sizes=(1,)):
+        """Load and warm up the model in every inference process"""
+        sizes = sorted({min(size, self.workers.batch_size) for size in batch_sizes})
+        shapes = self.workers.broadcast("warm_up", self.spec, sizes)
+        if self.model is None:
+            with self._load_lock:
+                if self.model is None:
+                    self._attach(shapes[0])
+    
+    def _attach(self, shape):
+        """Adopt the model's input size and output width and create the ring sized for it"""
+        (width, height), model_max_batch_size, num_classes = shape
+        self.input_size = (width, height)
+        self._check_labels(num_classes)
+        batch_size = min(self.workers.batch_size, model_max_batch_size or self.workers.batch_size)
+        self.max_batch_size = batch_size
+        self.model = FrameRing(self.workers.ring_slots, batch_size, height, width)
+        logger.info(f"{self.backend} model loaded in {self.workers.processes} inference processes")
+    
+    def preload(self):
+        """Nothing to share: the inference processes are started fresh, not forked"""
+    
+    def unload(self):
+        """Unload the model in every inference process and free its ring"""
+        with self._load_lock:
+            ring, self.model = self.model, None
+        if ring is None:
+            return
+        try:
+            self.workers.broadcast("unload", self.spec, ring.name)
+        finally:
+            ring.close(unlink=True)
+        logger.info(f"Unloaded {self.backend} model {self.model_version}")
+    
+    def _batch_buffer(self, size):
+        """This thread's ring slot (taken on first use), viewed as a (size, height, width, 3) batch"""
+        ring = self.model
+        held = getattr(self._slots, "held", None)
+        if held is None or held[0] is not ring:
+            held = self._slots.held = (ring, ring.acquire())
+        return ring.inputs[held[1], :size]
+    
+    def _run_inference(self, input_batch):
+        """
+        Run a batch in the least busy inference process
+        
+        Args:
+            input_batch: uint8 BGR array of shape (N, height, width, 3), normally
+                the ring slot view returned by preprocess_batch
+        
+        Returns:
+            Numpy array of class probabilities with shape (N, num_classes)
+        """
+        ring = self.model
+        count = len(input_batch)
+        held = getattr(self._slots, "held", None)
+        self._slots.held = None
+        if held is not None and held[0] is ring and np.shares_memory(input_batch, ring.inputs[held[1]]):
+            slot = held[1]
+        else:
+            if held is not None and held[0] is ring:
+                ring.release(held[1])
+            # Not prepared by preprocess_batch (e.g. a warm-up batch): copy it into a slot
+            slot = ring.acquire()
+            ring.inputs[slot, :count] = input_batch
+        try:
+            num_classes = self.workers.call("infer", self.spec, ring.name, ring.geometry, slot, count)
+            return ring.outputs[slot, :count, :num_classes].copy()
+        finally:
+            ring.release(slot)
+
+
+def handler_factory(workers):
+    """ModelRegistry handler factory that creates SharedMemoryModelHandlers on workers"""
+    return functools.partial(SharedMemoryModelHandler, workers=workers)
@@ -0,0 +1,216 @@
+"""
+Background analysis jobs
+
+Long videos can outlive proxy and Azure request timeouts, so POST /jobs
+returns a job ID immediately and the analysis runs on a bounded background
+thread pool. Clients poll GET /jobs/{id} or subscribe to
+GET /jobs/{id}/events, a Server-Sent Events stream that emits each frame's
+result as soon as it is computed, then the final summary.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from inference_pool import PoolOverloadedError
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    """State of one background analysis, updated from a worker thread"""
+    
+    def __init__(self, job_id, loop):
+        self.id = job_id
+        self.status = QUEUED
+        self.frames = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._listeners = set()
+    
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+    
+    def start(self):
+        """Mark the job as running (worker thread)"""
+        self.status = RUNNING
+        self._notify()
+    
+    def add_frame(self, frame_result):
+        """Publish one frame's result (worker thread)"""
+        with self._lock:
+            self.frames.append(frame_result)
+        self._notify()
+    
+    def schedule(self, coro):
+        """
+        Start a coroutine on the event loop the job was created from (worker thread)
+        
+        Returns:
+            concurrent.futures.Future with the coroutine's result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+    
+    def finish(self, result):
+        """Publish the final result (worker thread)"""
+        self.result = result
+        self.finished_at = time.time()
+        self.status = DONE
+        self._notify()
+    
+    def fail(self, message):
+        """Mark the job as failed (worker thread)"""
+        self.error = message
+        self.finished_at = time.time()
+        self.status = FAILED
+        self._notify()
+    
+    def to_dict(self):
+        """Status document returned by GET /jobs/{id}"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "frames_analyzed": len(self.frames),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "result": self.result
+        }
+    
+    async def events(self):
+        """
+        Yield ("frame", result) for every frame, from the first one, then
+        ("done", summary) or ("error", detail) once the job ends
+        """
+        update = asyncio.Event()
+        self._listeners.add(update)
+        try:
+            sent = 0
+            while True:
+                # Clear before reading so an update racing with us re-triggers the wait
+                update.clear()
+                finished = self.finished
+                with self._lock:
+                    pending = self.frames[sent:]
+                for frame_result in pending:
+                    yield "frame", frame_result
+                sent += len(pending)
+                
+                if finished:
+                    if self.status == DONE:
+                        summary = {k: v for k, v in self.result.items() if k != "frame_results"}
+                        yield "done", summary
+                    else:
+                        yield "error", {"detail": self.error}
+                    return
+                
+                await update.wait()
+        finally:
+            self._listeners.discard(update)
+    
+    def _notify(self):
+        """Wake every events() listener on the event loop"""
+        for update in list(self._listeners):
+            self._loop.call_soon_threadsafe(update.set)
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool and keeps finished jobs for a while"""
+    
+    def __init__(self, workers=1, queue_size=16, ttl_seconds=3600):
+        """
+        Args:
+            workers: Jobs processed concurrently
+            queue_size: Jobs allowed to wait before submit() rejects new ones
+            ttl_seconds: How long finished jobs stay retrievable
+        """
+        self.workers = workers
+        self.capacity = workers + max(0, queue_size)
+        self.ttl_seconds = ttl_seconds
+        
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+    
+    @property
+    def active(self):
+        """Number of jobs queued or running"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+    
+    def submit(self, run_fn, *args, **kwargs):
+        """
+        Create a job and schedule run_fn(job, *args, **kwargs) on the pool
+        
+        run_fn reports progress with job.add_frame() and must end the job with
+        job.finish() or job.fail(); uncaught exceptions fail the job.
+        
+        Raises:
+            PoolOverloadedError: If too many jobs are queued or running
+        """
+        with self._lock:
+            self._purge_expired()
+            active = sum(1 for job in self._jobs.values() if not job.finished)
+            if active >= self.capacity:
+                raise PoolOverloadedError(f"{active} jobs already queued or running")
+            job = Job(uuid.uuid4().hex, asyncio.get_running_loop())
+            self._jobs[job.id] = job
+        
+        self._executor.submit(self._run, job, run_fn, args, kwargs)
+        return job
+    
+    def completed(self, result):
+        """Register a job that is already done (e.g. answered from the result cache)"""
+        with self._lock:
+            self._purge_expired()
+            job = Job(uuid.uuid4().hex, asyncio.get_running_loop())
+            job.frames = list(result["frame_results"])
+            job.finish(result)
+            self._jobs[job.id] = job
+        return job
+    
+    def get(self, job_id):
+        """Return a job, or None if unknown or expired"""
+        with self._lock:
+            self._purge_expired()
+            return self._jobs.get(job_id)
+    
+    def shutdown(self):
+        """Wait for running jobs; queued jobs are cancelled"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+    
+    def _run(self, job, run_fn, args, kwargs):
+        """Execute one job on a worker thread"""
+        job.start()
+        try:
+            run_fn(job, *args, **kwargs)
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            job.fail(str(e))
+        else:
+            if not job.finished:
+                job.fail("Job ended without a result")
+    
+    def _purge_expired(self):
+        """Forget finished jobs past their TTL (caller holds the lock)"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
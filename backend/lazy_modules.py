@@ -0,0 +1,73 @@
+"""
+Deferred imports of heavy libraries
+
+Importing OpenCV and NumPy adds a noticeable share of the API's import time,
+and TensorFlow takes seconds and hundreds of MB. None of them is needed to
+answer a health check, so a freshly started (or scaled-from-zero) worker
+should not pay for them until a request actually decodes a video or runs
+the model.
+
+Modules use the stand-ins defined here instead of importing directly:
+
+    from lazy_modules import cv2, np
+
+The real module is imported on first attribute access. TensorFlow and
+tflite_runtime are imported inside the model backends' load() for the same
+reason.
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Libraries whose import cost is worth reporting
+HEAVY_MODULES = ("tensorflow", "tflite_runtime", "cv2", "numpy")
+
+# Seconds spent importing each module on first use
+import_seconds = {}
+
+
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access"""
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+    
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._load()
+        value = getattr(module, attr)
+        # Cache on the instance so later lookups skip __getattr__ entirely
+        setattr(self, attr, value)
+        return value
+    
+    def _load(self):
+        """Import the real module (once)"""
+        with self._lock:
+            if self._module is None:
+                already_loaded = self._name in sys.modules
+                start = time.perf_counter()
+                self._module = importlib.import_module(self._name)
+                if not already_loaded:
+                    import_seconds[self._name] = time.perf_counter() - start
+                    logger.info(f"Imported {self._name} in {import_seconds[self._name] * 1000:.0f} ms")
+        return self._module
+    
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded yet"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+cv2 = LazyModule("cv2")
+np = LazyModule("numpy")
+
+
+def loaded_heavy_modules():
+    """Names from HEAVY_MODULES that have been imported in this process"""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
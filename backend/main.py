@@ -1,15 +1,36 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+import time
+
+# Import cost of this module is reported at startup and in /stats
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import shutil
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import os
-from pathlib import Path
+import asyncio
 import logging
 import base64
-import cv2
+import json
+import queue
+import uuid
 
-from model_handler import YogaModelHandler
+import analysis
+import compact_encoding
+import config
+import metrics
+from frame_cache import FrameCache
+from inference_pool import InferencePool, PoolOverloadedError
+from inference_workers import InferenceWorkers, handler_factory as shm_handler_factory
+from jobs import JobManager
+from lazy_modules import import_seconds as deferred_import_seconds, loaded_heavy_modules
+from micro_batcher import MicroBatcher
+from model_handler import DEFAULT_LABELS_PATH
+from model_registry import ModelRegistry, load_manifest, single_model_manifest
+from result_cache import ResultCache, hash_bytes, hash_file, make_key
+from temporal import SMOOTHING_MODES
+from upload_storage import local_video_path, remove_upload, save_upload
 from video_processor import VideoProcessor
+from webcam_stream import serve_webcam_stream
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +38,10 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Yoga Pose Correction API")
 
+# Per-endpoint latency for /metrics, plus an optional Server-Timing header with stage timings
+metrics.configure(config.METRICS_ENABLED)
+app.add_middleware(metrics.MetricsMiddleware, server_timing=config.SERVER_TIMING)
+
 # Enable CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -32,20 +57,246 @@ video_processor = VideoProcessor()
 # Model will be loaded lazily
 # Use relative path that works both locally and on Azure
 SAVED_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "model_prep", "yoga_savedmodel")
-model_handler = None
 
-# Create temp directory for uploads
-UPLOAD_DIR = Path("temp_uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Served models, their label maps and the A/B split (see model_registry.py)
+model_registry = None
+
+# Startup state reported by /health/ready: "starting", "ready" or "failed"
+model_status = "starting"
+model_warmup_task = None
+
+# Hot-swaps manifest changes and unloads idle models
+model_watch_task = None
+_failed_manifest_revision = None
+
+# Runs decoding and inference off the event loop
+inference_pool = None
+
+# Inference processes fed through shared memory (WORKER_POOL_KIND=shm)
+inference_workers = None
+
+# Groups concurrent webcam frames into batched forward passes
+webcam_batcher = None
+
+# Thumbnails served by /frames/{job_id}/{n} when image_mode="ref"
+frame_cache = FrameCache(
+    ttl_seconds=config.FRAME_CACHE_TTL_SECONDS,
+    max_bytes=config.FRAME_CACHE_MAX_MB * 1024 * 1024
+)
+
+IMAGE_MODES = ("full", "thumbnail", "ref", "none")
+
+# image_mode="full": every frame at its original size (no video is this wide; previews never
+# upscale) and OpenCV's default JPEG quality, as the endpoint has always returned them
+FULL_SIZE_WIDTH = 1 << 30
+FULL_SIZE_JPEG_QUALITY = 95
+
+# Background analysis of long videos (POST /jobs)
+JOB_ADMISSION_RETRY_SECONDS = 0.5  # Wait between attempts while the worker pool is full
+JOB_PROGRESS_POLL_SECONDS = 0.2  # How often a job checks whether its analysis has ended
+job_manager = JobManager(
+    workers=config.JOB_WORKERS,
+    queue_size=config.JOB_QUEUE_SIZE,
+    ttl_seconds=config.JOB_TTL_SECONDS
+)
+
+# Answers repeated uploads of the same video or frame without re-analyzing
+result_cache = ResultCache(
+    max_entries=config.RESULT_CACHE_ENTRIES,
+    max_bytes=config.RESULT_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=config.RESULT_CACHE_TTL_SECONDS,
+    db_path=config.RESULT_CACHE_DB
+)
+
+# Queue depths, read when /metrics is scraped
+metrics.register_gauge(
+    "yoga_worker_pool_in_flight",
+    "Analysis jobs running or waiting on the worker pool",
+    lambda: inference_pool.in_flight if inference_pool is not None else 0
+)
+metrics.register_gauge(
+    "yoga_worker_pool_capacity",
+    "Jobs the worker pool admits before answering 503",
+    lambda: inference_pool.capacity if inference_pool is not None else 0
+)
+metrics.register_gauge(
+    "yoga_webcam_queue_depth",
+    "Webcam frames waiting to be batched",
+    lambda: webcam_batcher.stats()["queued"] if webcam_batcher is not None else 0
+)
+metrics.register_gauge(
+    "yoga_background_jobs_active",
+    "Background jobs queued or running",
+    lambda: job_manager.active
+)
+metrics.register_gauge(
+    "yoga_import_seconds",
+    "Time taken to import the API module",
+    lambda: round(import_seconds, 4)
+)
+metrics.register_gauge(
+    "yoga_models_loaded",
+    "Models loaded in the API process (worker processes load their own)",
+    lambda: model_registry.loaded_count() if model_registry is not None else 0
+)
+metrics.register_gauge(
+    "yoga_result_cache_entries",
+    "Results held in the in-memory result cache",
+    lambda: result_cache.stats()["entries"]
+)
+
+
+def _create_model_registry():
+    """Build the registry from MODEL_MANIFEST, or for the configured backend's model (loads nothing)"""
+    num_threads = config.MODEL_NUM_THREADS or None
+    if config.MODEL_MANIFEST:
+        manifest = load_manifest(config.MODEL_MANIFEST, num_threads=num_threads)
+    else:
+        model_path = config.TFLITE_MODEL_PATH if config.MODEL_BACKEND == "tflite" else SAVED_MODEL_PATH
+        manifest = single_model_manifest(model_path, config.MODEL_BACKEND, DEFAULT_LABELS_PATH, num_threads)
+    return ModelRegistry(manifest, idle_unload_seconds=config.MODEL_IDLE_UNLOAD_SECONDS)
+
+
+# gunicorn --preload imports this module once in the master process before
+# forking workers; whatever is prepared here is shared by them copy-on-write
+# (shm inference processes are spawned, not forked, so they have nothing to share)
+if config.MODEL_PRELOAD and config.WORKER_POOL_KIND != "shm":
+    model_registry = _create_model_registry()
+    model_registry.handler().preload()
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize on startup"""
-    global model_handler
+    global model_registry, inference_pool, inference_workers, webcam_batcher
+    global model_status, model_warmup_task, model_watch_task
     logger.info("Server starting up...")
-    model_handler = YogaModelHandler(SAVED_MODEL_PATH)
-    logger.info("Model handler initialized (model will load on first request)")
+    logger.info(
+        f"main imported in {import_seconds * 1000:.0f} ms, "
+        f"heavy modules loaded: {', '.join(loaded_heavy_modules()) or 'none'}"
+    )
+    if model_registry is None:
+        model_registry = _create_model_registry()
+    logger.info(f"Serving model {model_registry.active['version']}")
+    if config.WORKER_POOL_KIND == "shm":
+        inference_workers = InferenceWorkers(
+            processes=config.INFERENCE_PROCESSES or None,
+            ring_slots=config.SHM_RING_SLOTS or None,
+            batch_size=max(
+                config.INFERENCE_BATCH_SIZE,
+                config.WEBCAM_BATCH_SIZE,
+                config.ADAPTIVE_BATCH_SIZE,
+                *config.MODEL_WARMUP_BATCH_SIZES
+            ),
+            num_threads=config.MODEL_NUM_THREADS or None
+        )
+        model_registry.handler_factory = shm_handler_factory(inference_workers)
+    inference_pool = InferencePool(
+        model_registry,
+        video_processor,
+        kind=config.WORKER_POOL_KIND,
+        workers=config.WORKER_POOL_SIZE,
+        queue_size=config.WORKER_QUEUE_SIZE,
+        warmup_batch_sizes=config.MODEL_WARMUP_BATCH_SIZES if config.MODEL_EAGER_LOAD else (),
+        priority_workers=config.WEBCAM_WORKERS
+    )
+    # Webcam batches run on their own workers so long video jobs cannot starve them
+    webcam_batcher = MicroBatcher(
+        inference_pool,
+        analysis.analyze_image_batch,
+        max_batch_size=config.WEBCAM_BATCH_SIZE,
+        max_wait_ms=config.WEBCAM_BATCH_WAIT_MS,
+        max_queue_size=config.WEBCAM_BATCH_QUEUE_SIZE,
+        priority=True
+    )
+    webcam_batcher.start()
+    
+    if config.MODEL_EAGER_LOAD:
+        # Warm up in the background so /health/live answers while the model loads
+        model_warmup_task = asyncio.create_task(_warm_up_model())
+    else:
+        model_status = "ready"
+        logger.info("Model handler initialized (model will load on first request)")
+    
+    if config.MODEL_MANIFEST_POLL_SECONDS > 0:
+        model_watch_task = asyncio.create_task(_watch_models())
+
+
+async def _warm_up_model():
+    """Load and warm up the model, then mark the server ready"""
+    global model_status
+    start = time.perf_counter()
+    try:
+        await inference_pool.warm_up()
+    except Exception as e:
+        model_status = "failed"
+        logger.error(f"Model warm-up failed: {str(e)}")
+        return
+    model_status = "ready"
+    logger.info(f"Model loaded and warmed up in {time.perf_counter() - start:.1f}s")
+
+
+async def _watch_models():
+    """Every MODEL_MANIFEST_POLL_SECONDS, hot-swap manifest changes and unload idle models"""
+    last_error = None
+    while True:
+        await asyncio.sleep(config.MODEL_MANIFEST_POLL_SECONDS)
+        try:
+            if config.MODEL_MANIFEST:
+                await _reload_models()
+            last_error = None
+        except Exception as e:
+            # Logged once, not on every poll, until the manifest is fixed
+            if str(e) != last_error:
+                logger.error(f"Model manifest reload failed, still serving the current models: {str(e)}")
+            last_error = str(e)
+        await asyncio.to_thread(model_registry.unload_idle)
+
+
+async def _reload_models():
+    """
+    Swap in a changed manifest once its models are loaded and warmed up
+    
+    Requests keep being served by the current models until the swap. A
+    manifest whose models fail to load is not retried until it changes again.
+    
+    Returns:
+        True if the models were swapped
+    """
+    global _failed_manifest_revision
+    manifest = await asyncio.to_thread(load_manifest, config.MODEL_MANIFEST, config.MODEL_NUM_THREADS or None)
+    if manifest["revision"] in (model_registry.manifest["revision"], _failed_manifest_revision):
+        return False
+    
+    logger.info(f"Model manifest changed (revision {manifest['revision']}), warming up its models")
+    start = time.perf_counter()
+    try:
+        await inference_pool.warm_up(manifest, config.MODEL_WARMUP_BATCH_SIZES)
+    except Exception:
+        _failed_manifest_revision = manifest["revision"]
+        raise
+    model_registry.set_manifest(manifest)
+    logger.info(f"Models hot-swapped after {time.perf_counter() - start:.1f}s of warm-up")
+    return True
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release worker threads/processes on shutdown"""
+    for task in (model_warmup_task, model_watch_task):
+        if task is not None and not task.done():
+            task.cancel()
+    if webcam_batcher is not None:
+        await webcam_batcher.stop()
+    # Running jobs need the event loop to finish their pool calls
+    await asyncio.to_thread(job_manager.shutdown)
+    if inference_pool is not None:
+        inference_pool.shutdown()
+    if model_registry is not None:
+        model_registry.close()
+    if inference_workers is not None:
+        inference_workers.shutdown()
+    result_cache.close()
 
 
 @app.get("/")
@@ -54,10 +305,76 @@ async def root():
     return {"status": "ok", "message": "Yoga Pose Correction API is running"}
 
 
+@app.get("/health/live")
+async def health_live():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness probe: 503 until the model is loaded and warmed up (MODEL_EAGER_LOAD)"""
+    body = {
+        "status": model_status,
+        "model_version": model_registry.active["version"] if model_registry is not None else None
+    }
+    return JSONResponse(content=body, status_code=200 if model_status == "ready" else 503)
+
+
+@app.get("/models")
+async def models():
+    """Served models: the active one, the A/B candidate and its traffic share, load state and request counts"""
+    return model_registry.stats()
+
+
+@app.get("/stats")
+async def stats():
+    """Worker pool, webcam micro-batching, result cache and startup metrics"""
+    worker_pool = {
+        "kind": inference_pool.kind,
+        "workers": inference_pool.workers,
+        "webcam_workers": inference_pool.priority_workers,
+        "in_flight": inference_pool.in_flight,
+        "capacity": inference_pool.capacity
+    }
+    if inference_workers is not None:
+        worker_pool["inference_processes"] = inference_workers.stats()
+    return {
+        "worker_pool": worker_pool,
+        "webcam_batcher": webcam_batcher.stats(),
+        "result_cache": result_cache.stats(),
+        "startup": {
+            "import_ms": round(import_seconds * 1000, 1),
+            "heavy_modules_loaded": loaded_heavy_modules(),
+            "deferred_import_ms": {
+                name: round(seconds * 1000, 1) for name, seconds in deferred_import_seconds.items()
+            }
+        }
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage, endpoint and batch size histograms plus queue depths, in Prometheus text format"""
+    if not metrics.enabled:
+        raise HTTPException(404, "Metrics are disabled (METRICS_ENABLED=0)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/analyze-pose")
 async def analyze_pose(
+    request: Request,
     video: UploadFile = File(...),
-    expected_pose: str = Form(None)
+    expected_pose: str = Form(None),
+    target_fps: float = Form(None),
+    max_frames: int = Form(None),
+    image_mode: str = Form(None),
+    thumbnail_width: int = Form(None),
+    thumbnail_quality: int = Form(None),
+    smoothing: str = Form(None),
+    adaptive_sampling: bool = Form(None),
+    motion_threshold: float = Form(None),
+    person_roi: bool = Form(None)
 ):
     """
     Analyze yoga pose from uploaded video
@@ -65,149 +382,456 @@ async def analyze_pose(
     Args:
         video: Video file (mp4, avi, mov)
         expected_pose: The expected yoga asana name
-        
+        target_fps: Optional frames to analyze per second of video (overrides every 10th frame)
+        max_frames: Optional upper bound on analyzed frames
+        image_mode: "full" (inline base64 JPEG of each full-size frame, the default),
+            "thumbnail" (downscaled), "ref" (URL into /frames/{job_id}/{n}) or "none" (scores only)
+        thumbnail_width: Thumbnail width in pixels (aspect ratio preserved)
+        thumbnail_quality: Thumbnail JPEG quality (1-100)
+        smoothing: Temporal smoothing of per-frame predictions: "ema", "majority" or "none"
+        adaptive_sampling: Analyze fewer frames while a pose is held, more during transitions
+        motion_threshold: Mean pixel difference (0-1) below which a frame reuses the
+            previous prediction instead of running the model (0 = infer every frame)
+        person_roi: Crop frames to the practitioner before classifying them
+    
     Returns:
         JSON with pose analysis results
     """
-    global model_handler
+    options = _video_options(
+        video, expected_pose, target_fps, max_frames,
+        image_mode, thumbnail_width, thumbnail_quality,
+        smoothing, adaptive_sampling, motion_threshold, person_roi
+    )
     
     try:
-        # Load model on first request if not loaded
-        if model_handler.model is None:
-            logger.info("Loading TensorFlow model on first request...")
-            model_handler.load_model()
-            logger.info("Model loaded successfully!")
-        
-        # Validate file type (check content type or file extension)
-        valid_video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm']
-        is_video_content = video.content_type and video.content_type.startswith('video/')
-        is_video_extension = any(video.filename.lower().endswith(ext) for ext in valid_video_extensions)
-        
-        if not is_video_content and not is_video_extension:
-            logger.error(f"Invalid file type: {video.content_type}, filename: {video.filename}")
-            raise HTTPException(400, "File must be a video (mp4, avi, mov, mkv, or webm)")
-        
-        # Save uploaded video temporarily
-        video_path = UPLOAD_DIR / f"temp_{video.filename}"
-        with open(video_path, "wb") as buffer:
-            shutil.copyfileobj(video.file, buffer)
-        
         logger.info(f"Processing video: {video.filename}")
         
-        # Extract frames from video
-        frames = video_processor.extract_frames(str(video_path), sample_rate=10)
-        logger.info(f"Extracted {len(frames)} frames")
+        # Same bytes + same options + same model = same answer
+        with metrics.stage("hash"):
+            content_hash = await asyncio.to_thread(hash_file, video.file)
+        # The same video always goes to the same side of an A/B split
+        model = model_registry.route(content_hash)
+        cache_key = _video_cache_key(content_hash, options, model)
+        if _cacheable(options):
+            cached = await asyncio.to_thread(result_cache.get, cache_key)
+            if cached is not None:
+                logger.info(f"Result cache hit for {video.filename}")
+                return _video_response(request, {**cached, "video_name": video.filename}, model)
         
-        # Analyze each frame
-        results = []
-        for idx, frame in enumerate(frames):
-            prediction = model_handler.predict(frame)
-            
-            # Convert frame to base64 for frontend display
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame_base64 = base64.b64encode(buffer).decode('utf-8')
-            
-            results.append({
-                "frame_number": idx,
-                "pose_detected": prediction["pose_class"],
-                "confidence": prediction["confidence"],
-                "is_correct": prediction["is_correct"],
-                "feedback": prediction["feedback"],
-                "image": f"data:image/jpeg;base64,{frame_base64}"
-            })
+        # Decode and analyze on the worker pool (loads the model on first use)
+        with local_video_path(
+            video.file,
+            video.filename,
+            shareable=inference_pool.kind == "process",
+            tmp_dir=config.UPLOAD_TMP_DIR
+        ) as video_path:
+            results = await inference_pool.run(
+                analysis.analyze_video_file,
+                video_path,
+                model=model,
+                **_analysis_kwargs(options, content_hash)
+            )
         
-        # Calculate overall statistics
-        if expected_pose:
-            # Check if detected pose matches expected pose
-            correct_count = sum(1 for r in results 
-                              if r["pose_detected"] == expected_pose and r["confidence"] > 0.7)
-        else:
-            correct_count = sum(1 for r in results if r["is_correct"])
+        if not results:
+            raise HTTPException(400, "No frames could be decoded from the video")
         
-        avg_confidence = sum(r["confidence"] for r in results) / len(results)
+        _attach_frame_images(results, options["image_mode"])
         
-        overall_result = {
-            "video_name": video.filename,
-            "expected_pose": expected_pose,
-            "total_frames_analyzed": len(frames),
-            "correct_frames": correct_count,
-            "incorrect_frames": len(frames) - correct_count,
-            "accuracy_percentage": round((correct_count / len(frames)) * 100, 2),
-            "average_confidence": round(avg_confidence, 2),
-            "frame_results": results,
-            "overall_feedback": _generate_overall_feedback(results, expected_pose)
-        }
-        
-        # Cleanup
-        os.remove(video_path)
+        # Calculate overall statistics
+        overall_result = analysis.build_overall_result(
+            results, video.filename, expected_pose, min_hold_frames=config.HOLD_MIN_FRAMES,
+            with_segments=_wants_segments(options)
+        )
+        overall_result["model_version"] = model["version"]
         
-        return JSONResponse(content=overall_result)
+        if _cacheable(options):
+            await asyncio.to_thread(result_cache.put, cache_key, overall_result)
         
+        return _video_response(request, overall_result, model)
+    
+    except PoolOverloadedError:
+        logger.warning("Worker pool full, rejecting video upload")
+        raise _overloaded_response()
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing video: {str(e)}")
-        # Cleanup on error
-        if video_path.exists():
-            os.remove(video_path)
         raise HTTPException(500, f"Error processing video: {str(e)}")
 
 
+@app.post("/jobs", status_code=202)
+async def create_job(
+    video: UploadFile = File(...),
+    expected_pose: str = Form(None),
+    target_fps: float = Form(None),
+    max_frames: int = Form(None),
+    image_mode: str = Form(None),
+    thumbnail_width: int = Form(None),
+    thumbnail_quality: int = Form(None),
+    smoothing: str = Form(None),
+    adaptive_sampling: bool = Form(None),
+    motion_threshold: float = Form(None),
+    person_roi: bool = Form(None)
+):
+    """
+    Start analyzing an uploaded video in the background
+    
+    Takes the same fields as /analyze-pose (image_mode "full", "thumbnail" or "none").
+    
+    Returns:
+        JSON with the job ID and the URLs for its status and progress stream
+    """
+    options = _video_options(
+        video, expected_pose, target_fps, max_frames,
+        image_mode, thumbnail_width, thumbnail_quality,
+        smoothing, adaptive_sampling, motion_threshold, person_roi
+    )
+    if options["image_mode"] == "ref":
+        raise HTTPException(400, "image_mode 'ref' is not supported for jobs")
+    
+    with metrics.stage("hash"):
+        content_hash = await asyncio.to_thread(hash_file, video.file)
+    model = model_registry.route(content_hash)
+    cache_key = _video_cache_key(content_hash, options, model)
+    
+    cached = await asyncio.to_thread(result_cache.get, cache_key) if _cacheable(options) else None
+    if cached is not None:
+        logger.info(f"Result cache hit for job upload {video.filename}")
+        job = job_manager.completed({**cached, "video_name": video.filename})
+    else:
+        # The upload is closed when this request returns, so the job keeps its own copy
+        video_path = await asyncio.to_thread(
+            save_upload, video.file, video.filename, config.UPLOAD_TMP_DIR
+        )
+        try:
+            job = job_manager.submit(
+                _run_video_job, video_path, video.filename, options, cache_key, model, content_hash
+            )
+        except PoolOverloadedError:
+            remove_upload(video_path)
+            logger.warning("Job queue full, rejecting video upload")
+            raise _overloaded_response()
+        logger.info(f"Queued job {job.id} for {video.filename}")
+    
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status of a background job, with the full /analyze-pose result once done
+    
+    Args:
+        job_id: ID returned by POST /jobs
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found or expired")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-Sent Events stream of a job's progress
+    
+    Emits a "frame" event per analyzed frame (replaying frames already done),
+    then a "done" event with the summary or an "error" event.
+    
+    Args:
+        job_id: ID returned by POST /jobs
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found or expired")
+    
+    async def event_stream():
+        async for event, data in job.events():
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/frames/{job_id}/{frame_number}")
+async def get_frame(job_id: str, frame_number: int):
+    """
+    Fetch a frame thumbnail from an /analyze-pose call made with image_mode="ref"
+    
+    Args:
+        job_id: Job ID from the frame's image_url
+        frame_number: Frame number within the job
+    
+    Returns:
+        JPEG image
+    """
+    jpeg = frame_cache.get(job_id, frame_number)
+    if jpeg is None:
+        raise HTTPException(404, "Frame not found or expired")
+    return Response(content=jpeg, media_type="image/jpeg")
+
+
 @app.post("/analyze-webcam-frame")
-async def analyze_webcam_frame(frame: UploadFile = File(...)):
+async def analyze_webcam_frame(request: Request, frame: UploadFile = File(...)):
     """
     Analyze single frame from webcam
     
     Args:
         frame: Image file (jpg, png)
-        
+    
     Returns:
         JSON with pose analysis result
     """
-    global model_handler
-    
     try:
-        # Load model on first request if not loaded
-        if model_handler.model is None:
-            logger.info("Loading TensorFlow model on first request...")
-            model_handler.load_model()
-            logger.info("Model loaded successfully!")
-        
-        import cv2
-        import numpy as np
-        
         # Read image file
         contents = await frame.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
-        # Analyze frame
-        prediction = model_handler.predict(img)
+        # Keep each client on one side of an A/B split
+        model = model_registry.route(request.client.host if request.client else None)
+        cache_key = make_key(hash_bytes(contents), endpoint="webcam-frame", model=model["version"])
+        prediction = await asyncio.to_thread(result_cache.get, cache_key)
         
-        return JSONResponse(content=prediction)
+        if prediction is None:
+            # Batched with other concurrent frames and analyzed on the worker pool
+            prediction = await webcam_batcher.submit(contents, model=model)
+            
+            # Failed predictions carry no probabilities and are not worth keeping
+            if "all_probabilities" in prediction:
+                await asyncio.to_thread(result_cache.put, cache_key, prediction)
         
+        prediction = {**prediction, "model_version": model["version"]}
+        encoding = compact_encoding.negotiate(request.headers.get("accept"))
+        if encoding is None:
+            return _json_response(prediction)
+        return Response(
+            compact_encoding.encode_prediction(prediction, model["labels"], encoding),
+            media_type=encoding.media_type,
+            headers={"Vary": "Accept"}
+        )
+    
+    except PoolOverloadedError:
+        logger.warning("Worker pool full, rejecting webcam frame")
+        raise _overloaded_response()
+    except analysis.ImageDecodeError as e:
+        raise HTTPException(400, f"Invalid image: {str(e)}")
     except Exception as e:
         logger.error(f"Error processing frame: {str(e)}")
         raise HTTPException(500, f"Error processing frame: {str(e)}")
 
 
-def _generate_overall_feedback(results, expected_pose=None):
-    """Generate human-readable overall feedback"""
-    correct_count = sum(1 for r in results if r["is_correct"])
-    accuracy = (correct_count / len(results)) * 100
+@app.websocket("/ws/webcam")
+async def webcam_stream(websocket: WebSocket):
+    """
+    Stream webcam frames for live analysis
+    
+    The client sends binary JPEG/PNG frames; the server replies with one JSON
+    prediction per analyzed frame. Frames that arrive while a newer one is
+    waiting are dropped, so feedback always refers to a recent frame.
+    """
+    await websocket.accept()
+    # Every frame of a stream goes to the same side of an A/B split
+    session_key = uuid.uuid4().hex
+    await serve_webcam_stream(
+        websocket,
+        webcam_batcher,
+        config.RETRY_AFTER_SECONDS,
+        choose_model=lambda: model_registry.route(session_key)
+    )
+
+
+def _video_options(video, expected_pose, target_fps, max_frames,
+                   image_mode, thumbnail_width, thumbnail_quality,
+                   smoothing=None, adaptive_sampling=None, motion_threshold=None, person_roi=None):
+    """Validate a video upload and its form fields, filling in configured defaults"""
+    image_mode = image_mode or config.IMAGE_MODE
+    thumbnail_width = thumbnail_width or config.THUMBNAIL_WIDTH
+    thumbnail_quality = thumbnail_quality or config.THUMBNAIL_JPEG_QUALITY
+    smoothing = smoothing or config.TEMPORAL_SMOOTHING
+    if adaptive_sampling is None:
+        adaptive_sampling = config.ADAPTIVE_SAMPLING
+    if motion_threshold is None:
+        motion_threshold = config.MOTION_THRESHOLD
+    if person_roi is None:
+        person_roi = config.PERSON_ROI
     
-    feedback = ""
-    if expected_pose:
-        feedback = f"Expected: {expected_pose}. "
+    if image_mode not in IMAGE_MODES:
+        raise HTTPException(400, f"image_mode must be one of: {', '.join(IMAGE_MODES)}")
+    if thumbnail_width < 1:
+        raise HTTPException(400, "thumbnail_width must be at least 1")
+    if not 1 <= thumbnail_quality <= 100:
+        raise HTTPException(400, "thumbnail_quality must be between 1 and 100")
+    if smoothing not in SMOOTHING_MODES:
+        raise HTTPException(400, f"smoothing must be one of: {', '.join(SMOOTHING_MODES)}")
+    if not 0 <= motion_threshold <= 1:
+        raise HTTPException(400, "motion_threshold must be between 0 and 1")
+    if target_fps is not None and target_fps <= 0:
+        raise HTTPException(400, "target_fps must be positive")
+    if max_frames is not None and max_frames < 1:
+        raise HTTPException(400, "max_frames must be at least 1")
     
-    if accuracy >= 90:
-        feedback += "Excellent! Your form is nearly perfect. Keep it up!"
-    elif accuracy >= 70:
-        feedback += "Good job! Minor adjustments needed in some frames."
-    elif accuracy >= 50:
-        feedback += "Decent attempt. Focus on maintaining proper form throughout."
-    else:
-        feedback += "Needs improvement. Review the pose guidelines and try again."
+    # Validate file type (check content type or file extension)
+    valid_video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm']
+    is_video_content = video.content_type and video.content_type.startswith('video/')
+    is_video_extension = any(video.filename.lower().endswith(ext) for ext in valid_video_extensions)
+    
+    if not is_video_content and not is_video_extension:
+        logger.error(f"Invalid file type: {video.content_type}, filename: {video.filename}")
+        raise HTTPException(400, "File must be a video (mp4, avi, mov, mkv, or webm)")
     
-    return feedback
+    return {
+        "expected_pose": expected_pose,
+        "target_fps": target_fps,
+        "max_frames": max_frames,
+        "image_mode": image_mode,
+        "thumbnail_width": thumbnail_width,
+        "thumbnail_quality": thumbnail_quality,
+        "smoothing": smoothing,
+        "adaptive_sampling": adaptive_sampling,
+        "motion_threshold": motion_threshold,
+        "person_roi": person_roi
+    }
+
+
+def _video_cache_key(content_hash, options, model):
+    """Result cache key for a video analyzed with the given options by the given model"""
+    return make_key(content_hash, endpoint="analyze-pose", model=model["version"], **options)
+
+
+def _analysis_kwargs(options, content_hash=None):
+    """Keyword arguments for analysis.analyze_video_file / iter_video_results"""
+    thumbnail_width, thumbnail_quality = options["thumbnail_width"], options["thumbnail_quality"]
+    if options["image_mode"] == "full":
+        thumbnail_width, thumbnail_quality = FULL_SIZE_WIDTH, FULL_SIZE_JPEG_QUALITY
+    elif options["image_mode"] == "none":
+        thumbnail_width = None
+    return {
+        "batch_size": config.INFERENCE_BATCH_SIZE,
+        "target_fps": options["target_fps"],
+        "max_frames": options["max_frames"],
+        "thumbnail_width": thumbnail_width,
+        "thumbnail_quality": thumbnail_quality,
+        "smoothing": options["smoothing"],
+        "adaptive_sampling": options["adaptive_sampling"],
+        "adaptive_batch_size": config.ADAPTIVE_BATCH_SIZE,
+        "adaptive_max_stride": config.ADAPTIVE_MAX_STRIDE,
+        "motion_threshold": options["motion_threshold"],
+        "person_roi": options["person_roi"],
+        "content_hash": content_hash
+    }
+
+
+async def _run_when_admitted(fn, *args, **kwargs):
+    """inference_pool.run() for background jobs: waits for a free slot instead of failing"""
+    while True:
+        try:
+            return await inference_pool.run(fn, *args, **kwargs)
+        except PoolOverloadedError:
+            await asyncio.sleep(JOB_ADMISSION_RETRY_SECONDS)
+
+
+def _cacheable(options):
+    """
+    Whether a video result goes in the result cache
+    
+    Ref-mode results point into the short-lived frame cache, and full-size
+    images would make every entry several megabytes.
+    """
+    return options["image_mode"] in ("thumbnail", "none")
+
+
+def _wants_segments(options):
+    """Pose segments are reported only with the temporal engine turned on"""
+    return options["smoothing"] != "none" or options["adaptive_sampling"]
+
+
+def _run_video_job(job, video_path, video_name, options, cache_key, model, content_hash=None):
+    """Analyze a saved upload for a background job, publishing each frame as it is done"""
+    try:
+        # The analysis runs on the inference pool (so the model stays in its workers and the
+        # job counts against its capacity) and streams results back through a progress queue
+        progress = inference_pool.progress_queue()
+        done = job.schedule(_run_when_admitted(
+            analysis.stream_video_results, video_path, progress,
+            model=model, **_analysis_kwargs(options, content_hash)
+        ))
+        
+        results = []
+        while True:
+            try:
+                result = progress.get(timeout=JOB_PROGRESS_POLL_SECONDS)
+            except queue.Empty:
+                if done.done():
+                    break
+                continue
+            _attach_frame_images([result], options["image_mode"])
+            results.append(result)
+            job.add_frame(result)
+        done.result()  # Raises the analysis error, if any
+        
+        if not results:
+            raise ValueError("No frames could be decoded from the video")
+        
+        overall_result = analysis.build_overall_result(
+            results, video_name, options["expected_pose"], min_hold_frames=config.HOLD_MIN_FRAMES,
+            with_segments=_wants_segments(options)
+        )
+        overall_result["model_version"] = model["version"]
+        if _cacheable(options):
+            result_cache.put(cache_key, overall_result)
+        job.finish(overall_result)
+    finally:
+        remove_upload(video_path)
+
+
+def _attach_frame_images(results, image_mode):
+    """Replace each result's raw JPEG image with an inline data URI or a cache URL"""
+    if image_mode == "ref":
+        job_id = frame_cache.put([r.pop("jpeg") for r in results])
+        for r in results:
+            r["image_url"] = f"/frames/{job_id}/{r['frame_number']}"
+    elif image_mode in ("full", "thumbnail"):
+        with metrics.stage("base64"):
+            for r in results:
+                frame_base64 = base64.b64encode(r.pop("jpeg")).decode('utf-8')
+                r["image"] = f"data:image/jpeg;base64,{frame_base64}"
+
+
+def _json_response(content):
+    """JSON response serialized with orjson (when installed)"""
+    return Response(compact_encoding.dumps_json(content), media_type="application/json", headers={"Vary": "Accept"})
+
+
+def _video_response(request, result, model):
+    """An /analyze-pose result as JSON, or streamed in the compact encoding named in Accept"""
+    encoding = compact_encoding.negotiate(request.headers.get("accept"))
+    if encoding is None:
+        return _json_response(result)
+    return StreamingResponse(
+        compact_encoding.stream_video_result(result, model["labels"], encoding),
+        media_type=encoding.media_type,
+        headers={"Vary": "Accept"}
+    )
+
+
+def _overloaded_response():
+    """503 telling the client to retry once the worker pool has drained"""
+    return HTTPException(
+        503,
+        "Server is busy, please retry shortly",
+        headers={"Retry-After": str(config.RETRY_AFTER_SECONDS)}
+    )
+
+
+# Everything above ran when the module was imported (TensorFlow, OpenCV and NumPy are deferred)
+import_seconds = time.perf_counter() - _import_started
 
 
 if __name__ == "__main__":
@@ -0,0 +1,292 @@
+"""
+Lightweight instrumentation: stage timings, histograms and /metrics
+
+Code on the request path marks its stages with
+
+    with metrics.stage("decode"):
+        ...
+
+or records values with metrics.observe(). Observations go straight into the
+process-wide registry, unless the current thread is inside collecting(): then
+they are buffered and handed back to the caller, which replays them in its
+own process. That is how timings measured in worker threads and worker
+processes reach the API process (see InferencePool.run) and its Server-Timing
+header.
+
+Everything is a no-op while metrics are disabled: stage() returns a shared
+null context and observe() returns after one attribute check.
+
+The registry renders the Prometheus text exposition format itself, so no
+client library is needed.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+_NULL_CONTEXT = nullcontext()
+
+_local = threading.local()  # .collector: observation list while inside collecting()
+
+# Stage seconds of the request being handled, for its Server-Timing header
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+enabled = True
+
+
+def configure(enable):
+    """Turn metrics collection on or off for this process"""
+    global enabled
+    enabled = bool(enable)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, safe to update from many threads"""
+    
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+    
+    def observe(self, value, labels):
+        """Add one observation for the given label values (a tuple in label_names order)"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+    
+    def render(self):
+        """Prometheus text format lines"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + "," if label_text else ""
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-1]}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_sum{suffix} {values[-2]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {values[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback when /metrics is scraped"""
+    
+    def __init__(self, name, documentation, read):
+        """
+        Args:
+            read: Callable returning the current number
+        """
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+    
+    def render(self):
+        """Prometheus text format lines"""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.read()}"
+        ]
+
+
+_histograms = {
+    "stage_seconds": Histogram(
+        "yoga_stage_seconds",
+        "Time spent in each processing stage",
+        ["stage"],
+        LATENCY_BUCKETS
+    ),
+    "request_seconds": Histogram(
+        "yoga_request_seconds",
+        "HTTP request latency by endpoint",
+        ["method", "endpoint", "status"],
+        LATENCY_BUCKETS
+    ),
+    "batch_size": Histogram(
+        "yoga_inference_batch_size",
+        "Frames per model forward pass",
+        [],
+        BATCH_SIZE_BUCKETS
+    ),
+}
+_gauges = []
+
+
+def register_gauge(name, documentation, read):
+    """Expose a value computed at scrape time (e.g. a queue depth)"""
+    _gauges.append(Gauge(name, documentation, read))
+
+
+def observe(metric, value, **labels):
+    """
+    Record one value
+    
+    Args:
+        metric: "stage_seconds", "request_seconds" or "batch_size"
+        value: Observed value (seconds for the latency metrics)
+        labels: Label values of the metric
+    """
+    if not enabled:
+        return
+    collector = getattr(_local, "collector", None)
+    if collector is not None:
+        collector.append((metric, value, labels))
+    else:
+        _record(metric, value, labels)
+
+
+def observe_stage(name, seconds):
+    """Record the duration of one stage"""
+    observe("stage_seconds", seconds, stage=name)
+
+
+def stage(name):
+    """Context manager timing the enclosed block as the given stage"""
+    if not enabled:
+        return _NULL_CONTEXT
+    return _StageTimer(name)
+
+
+class _StageTimer:
+    """Times a with-block and records it with observe_stage()"""
+    
+    __slots__ = ("name", "start")
+    
+    def __init__(self, name):
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        observe_stage(self.name, time.perf_counter() - self.start)
+        return False
+
+
+@contextmanager
+def collecting():
+    """
+    Buffer this thread's observations instead of recording them
+    
+    Yields:
+        List of (metric, value, labels) observations; pass it to replay()
+    """
+    previous = getattr(_local, "collector", None)
+    observations = []
+    _local.collector = observations
+    try:
+        yield observations
+    finally:
+        _local.collector = previous
+
+
+def propagate(fn):
+    """
+    Wrap fn so that it records into the calling thread's collector
+    
+    For helper threads started on behalf of collected work (e.g. the frame
+    decoder thread).
+    """
+    collector = getattr(_local, "collector", None)
+    if collector is None:
+        return fn
+    
+    def run(*args, **kwargs):
+        _local.collector = collector
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.collector = None
+    return run
+
+
+def replay(observations):
+    """Record observations buffered by collecting() (possibly in another process)"""
+    for metric, value, labels in observations:
+        _record(metric, value, labels)
+
+
+def _record(metric, value, labels):
+    """Update the registry and the current request's Server-Timing stages"""
+    histogram = _histograms[metric]
+    histogram.observe(value, tuple(str(labels[name]) for name in histogram.label_names))
+    if metric == "stage_seconds":
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[labels["stage"]] = timings.get(labels["stage"], 0.0) + value
+
+
+def render():
+    """The whole registry in Prometheus text exposition format"""
+    lines = []
+    for histogram in _histograms.values():
+        lines.extend(histogram.render())
+    for gauge in _gauges:
+        lines.extend(gauge.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-endpoint latency and, optionally, a Server-Timing header
+    
+    The header lists the stages recorded while handling the request (in this
+    process or replayed from workers) plus the total, e.g.
+    Server-Timing: decode;dur=812.4, inference;dur=1530.2, total;dur=2601.7
+    """
+    
+    def __init__(self, app, server_timing=False):
+        self.app = app
+        self.server_timing = server_timing
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = [500]
+        
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if self.server_timing:
+                    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+                    entries.append(f"total;dur={(time.perf_counter() - start) * 1000:.1f}")
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            # Route templates keep the label set small (/jobs/{job_id}, not every job ID)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            _histograms["request_seconds"].observe(
+                time.perf_counter() - start,
+                (scope["method"], endpoint, str(status[0]))
+            )
@@ -0,0 +1,208 @@
+"""
+Dynamic micro-batching for single-frame requests
+
+Concurrent webcam requests each carry one frame. Instead of running one
+batch-1 forward pass per request, the MicroBatcher collects frames that
+arrive within a short window (or until the batch is full), analyzes them
+with a single pool job and resolves every request's future with its own
+result. A batch only holds frames routed to the same model; frames for
+another model (during an A/B split) wait for the next batch.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from inference_pool import PoolOverloadedError
+
+logger = logging.getLogger(__name__)
+
+_ANY_MODEL = object()
+
+
+class MicroBatcher:
+    """Groups concurrent frame requests into batched inference calls"""
+    
+    def __init__(self, inference_pool, batch_fn, max_batch_size=8, max_wait_ms=5,
+                 max_queue_size=64, max_concurrent_batches=None, priority=False):
+        """
+        Args:
+            inference_pool: InferencePool the batches run on
+            batch_fn: Analysis function taking a list of items, returning one result per item
+                (a result that is an Exception is raised to that item's caller)
+            max_batch_size: Largest number of items per batch
+            max_wait_ms: How long to wait for more items after the first one arrives
+            max_queue_size: Items allowed to wait before submit() rejects new ones
+            max_concurrent_batches: Batches in flight at once (default: the workers
+                the batches run on)
+            priority: Run batches on the pool's priority workers (see InferencePool)
+        """
+        self.inference_pool = inference_pool
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.priority = priority
+        
+        self._queue = None
+        self._held = deque()  # Items taken from the queue that belong to another model's batch
+        self._slots = None
+        self._max_concurrent_batches = max_concurrent_batches or (
+            inference_pool.priority_workers if priority and inference_pool.priority_workers
+            else inference_pool.workers
+        )
+        self._collector = None
+        self._dispatches = set()
+        
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.batch_size_counts = {}
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+    
+    def start(self):
+        """Start the collector task (must be called from the running event loop)"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._slots = asyncio.Semaphore(self._max_concurrent_batches)
+        self._collector = asyncio.create_task(self._collect())
+        logger.info(
+            f"Micro-batcher started: up to {self.max_batch_size} items, "
+            f"{self.max_wait * 1000:.0f} ms window"
+        )
+    
+    async def stop(self):
+        """Cancel the collector and fail any requests still waiting"""
+        if self._collector is None:
+            return
+        self._collector.cancel()
+        try:
+            await self._collector
+        except asyncio.CancelledError:
+            pass
+        self._collector = None
+        
+        waiting = list(self._held)
+        self._held.clear()
+        while not self._queue.empty():
+            waiting.append(self._queue.get_nowait())
+        for _, future, _, _ in waiting:
+            if not future.done():
+                future.set_exception(RuntimeError("Server is shutting down"))
+    
+    async def submit(self, item, model=None):
+        """
+        Queue one item and wait for its result
+        
+        Args:
+            item: Item passed to batch_fn
+            model: Model spec from ModelRegistry.route() (None = let the pool route the batch)
+        
+        Raises:
+            PoolOverloadedError: If too many items are already waiting
+        """
+        # Held items were taken off the queue but are still waiting, so they count too
+        waiting = self._queue.qsize() + len(self._held)
+        if waiting >= self.max_queue_size:
+            raise PoolOverloadedError(f"{waiting} frames already queued")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future, time.perf_counter(), model))
+        return await future
+    
+    def stats(self):
+        """Batch size and queue wait metrics"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            "average_queue_wait_ms": round(self.total_queue_wait / self.items * 1000, 3) if self.items else 0.0,
+            "max_queue_wait_ms": round(self.max_queue_wait * 1000, 3),
+            "queued": (self._queue.qsize() if self._queue is not None else 0) + len(self._held)
+        }
+    
+    async def _collect(self):
+        """Form batches forever; one batch per free dispatch slot"""
+        loop = asyncio.get_running_loop()
+        while True:
+            # While every slot is busy, requests accumulate into the next batch
+            await self._slots.acquire()
+            try:
+                first = self._take_held() or await self._queue.get()
+                batch = [first]
+                group = _model_version(first)
+                deadline = loop.time() + self.max_wait
+                
+                while len(batch) < self.max_batch_size:
+                    entry = self._take_held(group)
+                    if entry is None:
+                        if not self._queue.empty():
+                            entry = self._queue.get_nowait()
+                        else:
+                            timeout = deadline - loop.time()
+                            if timeout <= 0:
+                                break
+                            try:
+                                entry = await asyncio.wait_for(self._queue.get(), timeout)
+                            except asyncio.TimeoutError:
+                                break
+                    if _model_version(entry) == group:
+                        batch.append(entry)
+                    else:
+                        self._held.append(entry)
+            except BaseException:
+                self._slots.release()
+                raise
+            
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+    
+    def _take_held(self, group=_ANY_MODEL):
+        """Remove and return the oldest held item (of the given model version, if one is given)"""
+        for i, entry in enumerate(self._held):
+            if group is _ANY_MODEL or _model_version(entry) == group:
+                del self._held[i]
+                return entry
+        return None
+    
+    async def _dispatch(self, batch):
+        """Run one batch on the pool and resolve each request's future"""
+        try:
+            dispatched_at = time.perf_counter()
+            self._record(batch, dispatched_at)
+            
+            items = [item for item, _, _, _ in batch]
+            try:
+                results = await self.inference_pool.run(
+                    self.batch_fn, items, model=batch[0][3], priority=self.priority
+                )
+            except Exception as e:
+                results = [e] * len(batch)
+            
+            for (_, future, _, _), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+    
+    def _record(self, batch, dispatched_at):
+        """Update batch size and queue wait metrics"""
+        size = len(batch)
+        self.batches += 1
+        self.items += size
+        self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+        for _, _, enqueued_at, _ in batch:
+            wait = dispatched_at - enqueued_at
+            self.total_queue_wait += wait
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+
+
+def _model_version(entry):
+    """Model version a queued (item, future, enqueued_at, model) entry was routed to"""
+    model = entry[3]
+    return model["version"] if model is not None else None
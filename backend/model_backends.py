@@ -0,0 +1,265 @@
+"""
+Inference backends for YogaModelHandler
+
+Each backend loads one model format and runs a resized uint8 BGR batch of
+shape (N, height, width, 3) through it, returning class probabilities (its
+num_classes is the output width, or None when the model leaves it open). The
+BGR-to-RGB swap and [0, 1] normalization happen inside the backend:
+
+- "savedmodel": the TensorFlow SavedModel in model_prep/yoga_savedmodel
+- "tflite": a .tflite file (fp16 or INT8 post-training quantized) run by the
+  TFLite interpreter with XNNPACK on num_threads CPU threads. Uses the small
+  tflite_runtime package when installed, otherwise tensorflow.lite.
+"""
+import logging
+import threading
+
+from lazy_modules import np
+
+logger = logging.getLogger(__name__)
+
+
+class SavedModelBackend:
+    """Runs a TensorFlow SavedModel through its serving signature"""
+    
+    name = "savedmodel"
+    
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.model = None
+        self.input_size = None  # (width, height) when the signature fixes it
+        self.max_batch_size = None  # Set when the signature has a fixed batch dimension
+        self.num_classes = None  # Output width, when the signature fixes it
+        
+        # Resolved once in load() so the hot path skips signature lookups
+        self.input_name = None
+        self.output_key = None
+        self.input_dtype = None
+        self.input_shape = None
+        self._infer_fn = None
+    
+    def preload(self):
+        """
+        Do the fork-safe part of loading ahead of a fork
+        
+        TensorFlow's runtime threads do not survive fork(), so only the
+        library is imported here; the SavedModel is loaded by load() in each
+        worker.
+        """
+        import tensorflow  # noqa: F401
+    
+    def load(self, default_input_size):
+        """
+        Load the SavedModel and compile the serving function
+        
+        Args:
+            default_input_size: (width, height) used when the signature leaves it open
+        """
+        import tensorflow as tf
+        
+        if self.num_threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(self.num_threads)
+            except RuntimeError:
+                logger.warning("TensorFlow already initialized, ignoring num_threads")
+        
+        self.model = tf.saved_model.load(self.model_path)
+        infer = self.model.signatures["serving_default"]
+        
+        # Input name, dtype and shape of the single image input
+        self.input_name, input_spec = next(iter(infer.structured_input_signature[1].items()))
+        self.input_dtype = input_spec.dtype
+        self.input_shape = tuple(input_spec.shape.as_list())
+        
+        # Trust the model's spatial size over the default when it is fixed
+        self.input_size = default_input_size
+        if len(self.input_shape) == 4 and self.input_shape[1] and self.input_shape[2]:
+            self.input_size = (self.input_shape[2], self.input_shape[1])
+        
+        self.output_key = next(iter(infer.structured_outputs))
+        output_shape = infer.structured_outputs[self.output_key].shape.as_list()
+        self.num_classes = output_shape[-1] if output_shape else None
+        
+        # Some exports pin the batch dimension (usually to 1)
+        if self.input_shape and self.input_shape[0]:
+            self.max_batch_size = self.input_shape[0]
+        
+        input_name = self.input_name
+        output_key = self.output_key
+        input_dtype = self.input_dtype
+        width, height = self.input_size
+        
+        # Only the batch dimension may vary, so the graph is traced once
+        @tf.function(input_signature=[tf.TensorSpec([self.max_batch_size, height, width, 3], tf.uint8)])
+        def serve(batch):
+            # BGR -> RGB and [0, 255] -> [0, 1] run inside the graph
+            rgb = tf.reverse(batch, axis=[-1])
+            normalized = tf.cast(rgb, tf.float32) * (1.0 / 255.0)
+            return infer(**{input_name: tf.cast(normalized, input_dtype)})[output_key]
+        
+        self._infer_fn = serve
+        logger.info(
+            f"Serving signature ready: input '{self.input_name}' "
+            f"{self.input_shape} {self.input_dtype.name}, output '{self.output_key}'"
+        )
+    
+    def run(self, input_batch):
+        """Return class probabilities with shape (N, num_classes)"""
+        return self._infer_fn(input_batch).numpy()
+
+
+class TFLiteBackend:
+    """Runs a .tflite model with the TFLite interpreter (XNNPACK on CPU)"""
+    
+    name = "tflite"
+    
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.interpreter = None
+        self.input_size = None
+        self.max_batch_size = None
+        self.num_classes = None
+        
+        self._input = None
+        self._output = None
+        self._batch_size = None
+        self._float_batch = None  # Reused normalization buffer
+        self._model_content = None  # Model bytes read by preload()
+        # The interpreter is not thread-safe; it parallelizes internally instead
+        self._lock = threading.Lock()
+    
+    def preload(self):
+        """
+        Read the model file into memory ahead of a fork
+        
+        Interpreters created after the fork are built from these bytes, so
+        the weights are shared copy-on-write by all forked workers instead of
+        being read once per worker.
+        """
+        _import_tflite_interpreter()
+        with open(self.model_path, "rb") as f:
+            self._model_content = f.read()
+        logger.info(f"Preloaded {len(self._model_content) / 1e6:.1f} MB from {self.model_path}")
+    
+    def load(self, default_input_size):
+        """
+        Create the interpreter and read the input/output tensor details
+        
+        Args:
+            default_input_size: (width, height) used when the model leaves it open
+        """
+        Interpreter = _import_tflite_interpreter()
+        if self._model_content is not None:
+            self.interpreter = Interpreter(model_content=self._model_content, num_threads=self.num_threads)
+        else:
+            self.interpreter = Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+        self.interpreter.allocate_tensors()
+        
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        
+        shape = list(self._input.get("shape_signature", self._input["shape"]))
+        self.input_size = default_input_size
+        if len(shape) == 4 and shape[1] > 0 and shape[2] > 0:
+            self.input_size = (int(shape[2]), int(shape[1]))
+        
+        # -1 means the batch dimension can be resized
+        if shape and shape[0] > 0:
+            self.max_batch_size = int(shape[0])
+        self._batch_size = int(self._input["shape"][0])
+        self.num_classes = int(self._output["shape"][-1]) or None
+        
+        logger.info(
+            f"TFLite interpreter ready: input {shape} {np.dtype(self._input['dtype']).name}, "
+            f"{self.num_threads or 'default'} threads"
+        )
+    
+    def run(self, input_batch):
+        """Return class probabilities with shape (N, num_classes)"""
+        with self._lock:
+            batch_size = len(input_batch)
+            if batch_size != self._batch_size:
+                width, height = self.input_size
+                self.interpreter.resize_tensor_input(self._input["index"], [batch_size, height, width, 3])
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = batch_size
+            
+            if self._float_batch is None or self._float_batch.shape != input_batch.shape:
+                self._float_batch = np.empty(input_batch.shape, dtype=np.float32)
+            normalized = normalize_batch(input_batch, out=self._float_batch)
+            
+            self.interpreter.set_tensor(self._input["index"], _quantize(normalized, self._input))
+            self.interpreter.invoke()
+            return _dequantize(self.interpreter.get_tensor(self._output["index"]), self._output)
+
+
+BACKENDS = {
+    SavedModelBackend.name: SavedModelBackend,
+    TFLiteBackend.name: TFLiteBackend,
+}
+
+
+def create_backend(name, model_path, num_threads=None):
+    """
+    Instantiate a backend by name
+    
+    Args:
+        name: "savedmodel" or "tflite"
+        model_path: SavedModel directory or .tflite file
+        num_threads: CPU threads for inference (None = library default)
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](model_path, num_threads=num_threads)
+
+
+def normalize_batch(batch, dtype=None, out=None):
+    """
+    Convert a uint8 BGR batch to RGB in [0, 1] with one vectorized pass
+    
+    Args:
+        batch: uint8 array of shape (N, height, width, 3), BGR
+        dtype: Output dtype when out is not given
+        out: Optional preallocated output array of the same shape
+        
+    Returns:
+        Normalized RGB array
+    """
+    if out is None:
+        out = np.empty(batch.shape, dtype=dtype)
+    # Reversed channel slice is a view, so the swap costs no extra copy
+    np.multiply(batch[..., ::-1], out.dtype.type(1.0 / 255.0), out=out, casting="unsafe")
+    return out
+
+
+def _import_tflite_interpreter():
+    """Prefer the lightweight tflite_runtime package over full TensorFlow"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def _quantize(batch, details):
+    """Convert a float batch to the tensor's dtype, applying INT8/UINT8 quantization"""
+    dtype = details["dtype"]
+    if np.issubdtype(dtype, np.integer):
+        scale, zero_point = details["quantization"]
+        info = np.iinfo(dtype)
+        batch = np.round(batch.astype(np.float32) / scale + zero_point)
+        return np.clip(batch, info.min, info.max).astype(dtype)
+    return batch.astype(dtype, copy=False)
+
+
+def _dequantize(output, details):
+    """Convert a quantized output tensor back to float32 probabilities"""
+    if np.issubdtype(output.dtype, np.integer):
+        scale, zero_point = details["quantization"]
+        return (output.astype(np.float32) - zero_point) * scale
+    return output.astype(np.float32, copy=False)
@@ -2,69 +2,231 @@ import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 
-import numpy as np
-import cv2
+import gc
+import hashlib
+import json
 import logging
+import threading
+import time
+
+import metrics
+from lazy_modules import cv2, np
+from model_backends import create_backend, normalize_batch
 
 logger = logging.getLogger(__name__)
 
+# Label map of the model in model_prep/yoga_savedmodel (and its TFLite conversions)
+DEFAULT_LABELS_PATH = os.path.join(os.path.dirname(__file__), "..", "model_prep", "labels.txt")
+
+# Feedback sentences by code; "{pose}" stands for the detected pose class
+FEEDBACK_TEMPLATES = {
+    "perfect": "Perfect {pose}! Excellent form.",
+    "good": "Good {pose}. Minor improvements possible.",
+    "unclear": "Unable to clearly identify pose. Try adjusting position.",
+    "adjust": "Detected {pose} but form needs adjustment. Check alignment and positioning."
+}
+
+
+def load_labels(path):
+    """
+    Read a label map: a JSON list, or a text file with one class name per line
+    
+    Args:
+        path: File listing the pose classes in model output order
+    
+    Returns:
+        List of pose class names
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            labels = json.load(f)
+        else:
+            # Blank lines and "#" comments are skipped
+            labels = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not isinstance(labels, list) or not labels or not all(isinstance(label, str) for label in labels):
+        raise ValueError(f"{path} must list at least one class name")
+    return labels
+
+
+def model_version(model_path, backend, pose_classes, model_id=None):
+    """
+    Identify a model (files and label map) for result cache keys and A/B reporting
+    
+    Returns:
+        "[model_id:]backend:name:mtime:labels-digest"
+    """
+    try:
+        modified = int(os.path.getmtime(model_path))
+    except OSError:
+        modified = 0
+    labels_digest = hashlib.sha256("\n".join(pose_classes).encode("utf-8")).hexdigest()[:8]
+    version = f"{backend}:{os.path.basename(os.path.normpath(model_path))}:{modified}:{labels_digest}"
+    return f"{model_id}:{version}" if model_id else version
+
 
 class YogaModelHandler:
     """Handles loading and inference of the yoga pose model"""
     
-    def __init__(self, model_path):
+    def __init__(self, model_path, backend="savedmodel", num_threads=None, pose_classes=None, model_id=None):
+        """
+        Args:
+            model_path: SavedModel directory or .tflite file
+            backend: Inference backend, "savedmodel" or "tflite" (see model_backends.py)
+            num_threads: CPU threads for inference (None = backend default)
+            pose_classes: Class names in model output order (None = read DEFAULT_LABELS_PATH)
+            model_id: Name of the model in the registry manifest, if any
+        """
         self.model_path = model_path
-        self.model = None
+        self.backend = backend
+        self.num_threads = num_threads
+        self.model_id = model_id
+        # Yoga pose classes, in the order of the model's outputs
+        self.pose_classes = list(pose_classes) if pose_classes is not None else load_labels(DEFAULT_LABELS_PATH)
+        self.model_version = model_version(model_path, backend, self.pose_classes, model_id)
+        self.model = None  # Loaded backend instance
         self.input_size = (224, 224)  # Standard size for EfficientNet
-        
-        # Yoga pose classes - actual trained poses
-        self.pose_classes = [
-            "Anantasana",
-            "Ardhakati Chakrasana",
-            "Bhujangasana",
-            "Kati Chakrasana",
-            "Marjariasana",
-            "Parvatasana",
-            "Sarvangasana",
-            "Tadasana",
-            "Vajrasana",
-            "Viparita Karani"
-        ]
+        self.max_batch_size = None  # Set when the model has a fixed batch dimension
+        self.num_classes = None  # Output width of the loaded model, when known
+        self._preloaded = None  # Backend instance prepared by preload()
+        self._load_lock = threading.Lock()
+        self._buffers = threading.local()  # Per-thread reusable preprocessing batch
     
     def load_model(self):
-        """Load TensorFlow SavedModel"""
+        """Load the model with the configured backend"""
         try:
-            import tensorflow as tf
-            logger.info(f"Loading SavedModel from {self.model_path}")
-            self.model = tf.saved_model.load(self.model_path)
-            logger.info("SavedModel loaded successfully")
+            logger.info(f"Loading {self.backend} model from {self.model_path}")
+            model = self._preloaded or create_backend(self.backend, self.model_path, num_threads=self.num_threads)
+            with metrics.stage("model_load"):
+                model.load(self.input_size)
+            self.input_size = model.input_size
+            self.max_batch_size = model.max_batch_size
+            self._check_labels(getattr(model, "num_classes", None))
+            self.model = model
+            logger.info(f"{self.backend} model loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load model: {str(e)}")
             raise
     
+    def preload(self):
+        """
+        Prepare the model before the server forks its workers (gunicorn --preload)
+        
+        Only does what is safe to share across fork(); load_model() still
+        runs in every worker, reusing what was prepared here.
+        """
+        model = create_backend(self.backend, self.model_path, num_threads=self.num_threads)
+        model.preload()
+        self._preloaded = model
+    
+    def warm_up(self, batch_sizes=(1,)):
+        """
+        Load the model and run one dummy batch of each size through it
+        
+        The first forward pass of a given shape pays for graph tracing,
+        kernel selection and buffer allocation; doing it here keeps that
+        cost out of the first real requests.
+        
+        Args:
+            batch_sizes: Batch sizes to run (capped at max_batch_size)
+        """
+        self.ensure_loaded()
+        if self.max_batch_size:
+            batch_sizes = [min(size, self.max_batch_size) for size in batch_sizes]
+        
+        width, height = self.input_size
+        output = None
+        for size in sorted(set(batch_sizes)):
+            start = time.perf_counter()
+            output = self._run_inference(np.zeros((size, height, width, 3), dtype=np.uint8))
+            logger.info(f"Warm-up batch of {size} took {(time.perf_counter() - start) * 1000:.0f} ms")
+        
+        if output is not None and self.num_classes is None:
+            self._check_labels(output.shape[-1])
+    
+    def _check_labels(self, num_classes):
+        """
+        Compare the model's output width with the label map
+        
+        Outputs the label map does not name are reported as "Pose N", so
+        predictions and all_probabilities still cover every class.
+        """
+        if not num_classes:
+            return
+        self.num_classes = int(num_classes)
+        if self.num_classes == len(self.pose_classes):
+            return
+        logger.warning(
+            f"{self.model_path} outputs {self.num_classes} classes but its label map has "
+            f"{len(self.pose_classes)}; check the labels in the model manifest"
+        )
+        if self.num_classes > len(self.pose_classes):
+            self.pose_classes = self.pose_classes + [
+                f"Pose {i}" for i in range(len(self.pose_classes), self.num_classes)
+            ]
+    
+    def unload(self):
+        """Drop the loaded model so its memory can be reclaimed (load_model() brings it back)"""
+        with self._load_lock:
+            if self.model is None:
+                return
+            self.model = None
+            self._preloaded = None
+            self._buffers = threading.local()
+        gc.collect()
+        logger.info(f"Unloaded {self.backend} model {self.model_version}")
+    
+    def ensure_loaded(self):
+        """Load the model if it has not been loaded yet (safe to call from many threads)"""
+        if self.model is not None:
+            return
+        with self._load_lock:
+            if self.model is None:
+                self.load_model()
+    
     def preprocess_image(self, image):
         """
         Preprocess image for model input
         
         Args:
             image: OpenCV image (BGR format)
-            
+        
         Returns:
-            Preprocessed tensor ready for model
+            Preprocessed tensor ready for model: float16 RGB in [0, 1], shape (1, height, width, 3)
         """
-        # Resize to model input size
-        img_resized = cv2.resize(image, self.input_size)
-        
-        # Convert BGR to RGB
-        img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
+        return normalize_batch(self.preprocess_batch([image]), dtype=np.float16)
+    
+    def preprocess_batch(self, frames):
+        """
+        Resize frames straight into a reusable uint8 batch buffer
         
-        # Normalize to [0, 1] - use float16 for FP16 model
-        img_normalized = img_rgb.astype(np.float16) / 255.0
+        Channel order and normalization are left to the backend, which folds
+        them into the graph (SavedModel) or does them in one vectorized pass
+        over the whole batch (TFLite).
         
-        # Add batch dimension
-        img_batch = np.expand_dims(img_normalized, axis=0)
+        Args:
+            frames: List of OpenCV images (BGR format)
         
-        return img_batch
+        Returns:
+            uint8 BGR array of shape (N, height, width, 3). It is a view of this
+            thread's buffer, overwritten by the next call on the same thread.
+        """
+        batch = self._batch_buffer(len(frames))
+        for i, frame in enumerate(frames):
+            if frame.shape == batch.shape[1:]:
+                # Already at model size (VideoProcessor downscales while decoding)
+                np.copyto(batch[i], frame)
+            else:
+                cv2.resize(frame, self.input_size, dst=batch[i])
+        return batch
+    
+    def _batch_buffer(self, size):
+        """This thread's preallocated (size, height, width, 3) uint8 buffer, grown on demand"""
+        width, height = self.input_size
+        buffer = getattr(self._buffers, "batch", None)
+        if buffer is None or buffer.shape[0] < size or buffer.shape[1:3] != (height, width):
+            buffer = np.empty((max(size, 1), height, width, 3), dtype=np.uint8)
+            self._buffers.batch = buffer
+        return buffer[:size]
     
     def predict(self, image):
         """
@@ -72,7 +234,7 @@ class YogaModelHandler:
         
         Args:
             image: OpenCV image (BGR format)
-            
+        
         Returns:
             Dictionary with prediction results
         """
@@ -80,67 +242,124 @@ class YogaModelHandler:
             raise RuntimeError("Model not loaded. Call load_model() first.")
         
         try:
-            import tensorflow as tf
-            
             # Preprocess image
-            input_tensor = self.preprocess_image(image)
+            with metrics.stage("preprocess"):
+                input_batch = self.preprocess_batch([image])
             
             # Run inference
-            infer = self.model.signatures["serving_default"]
-            
-            # Get input tensor name
-            input_name = list(infer.structured_input_signature[1].keys())[0]
-            predictions = infer(**{input_name: tf.constant(input_tensor)})
-            
-            # Get output
-            output_key = list(predictions.keys())[0]
-            output = predictions[output_key].numpy()[0]
-            
-            # Get predicted class and confidence
-            predicted_idx = np.argmax(output)
-            confidence = float(output[predicted_idx])
-            
-            # Get pose class name
-            pose_class = self.pose_classes[predicted_idx] if predicted_idx < len(self.pose_classes) else f"Pose {predicted_idx}"
-            
-            # Determine if pose is correct (confidence threshold)
-            is_correct = confidence > 0.75  # Adjust threshold as needed
-            
-            # Generate feedback
-            feedback = self._generate_feedback(pose_class, confidence, is_correct)
-            
-            return {
-                "pose_class": pose_class,
-                "confidence": float(confidence),
-                "is_correct": is_correct,
-                "all_probabilities": {
-                    self.pose_classes[i]: float(output[i]) 
-                    for i in range(min(len(output), len(self.pose_classes)))
-                },
-                "feedback": feedback
-            }
+            with metrics.stage("inference"):
+                output = self._run_inference(input_batch)[0]
+            metrics.observe("batch_size", 1)
             
+            return self._build_prediction(output)
+        
         except Exception as e:
             logger.error(f"Prediction error: {str(e)}")
-            return {
-                "pose_class": "Unknown",
-                "confidence": 0.0,
-                "is_correct": False,
-                "feedback": f"Error analyzing pose: {str(e)}"
-            }
+            return self._error_prediction(e)
+    
+    def predict_batch(self, frames, batch_size=16):
+        """
+        Run inference on a sequence of images, batch_size frames per forward pass
+        
+        Args:
+            frames: List of OpenCV images (BGR format)
+            batch_size: Maximum number of frames per model call
+        
+        Returns:
+            List of prediction dictionaries (same format as predict), one per frame
+        """
+        if self.model is None:
+            raise RuntimeError("Model not loaded. Call load_model() first.")
+        
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        
+        if self.max_batch_size:
+            batch_size = min(batch_size, self.max_batch_size)
+        
+        results = []
+        for start in range(0, len(frames), batch_size):
+            chunk = frames[start:start + batch_size]
+            try:
+                # Preprocess the whole chunk into the reusable batch buffer
+                with metrics.stage("preprocess"):
+                    input_batch = self.preprocess_batch(chunk)
+                
+                # One forward pass for the whole chunk
+                with metrics.stage("inference"):
+                    outputs = self._run_inference(input_batch)
+                metrics.observe("batch_size", len(chunk))
+                results.extend(self._build_prediction(output) for output in outputs)
+            
+            except Exception as e:
+                logger.error(f"Batch prediction error (frames {start}-{start + len(chunk) - 1}): {str(e)}")
+                results.extend(self._error_prediction(e) for _ in chunk)
+        
+        return results
+    
+    def _run_inference(self, input_batch):
+        """
+        Run the serving signature on a preprocessed batch
+        
+        Args:
+            input_batch: uint8 BGR array of shape (N, height, width, 3) from preprocess_batch
+        
+        Returns:
+            Numpy array of class probabilities with shape (N, num_classes)
+        """
+        return self.model.run(input_batch)
+    
+    def _build_prediction(self, output):
+        """Convert one row of class probabilities into a prediction dictionary"""
+        # Get predicted class and confidence
+        predicted_idx = np.argmax(output)
+        confidence = float(output[predicted_idx])
+        
+        # Get pose class name
+        pose_class = self.pose_classes[predicted_idx] if predicted_idx < len(self.pose_classes) else f"Pose {predicted_idx}"
+        
+        is_correct, feedback = self.assess(pose_class, confidence)
+        
+        return {
+            "pose_class": pose_class,
+            "confidence": float(confidence),
+            "is_correct": is_correct,
+            "all_probabilities": {
+                self.pose_classes[i]: float(output[i]) 
+                for i in range(min(len(output), len(self.pose_classes)))
+            },
+            "feedback": feedback
+        }
+    
+    def assess(self, pose_class, confidence):
+        """
+        Judge a (possibly smoothed) prediction
+        
+        Returns:
+            (is_correct, feedback) for the pose class at this confidence
+        """
+        # Determine if pose is correct (confidence threshold)
+        is_correct = confidence > 0.75  # Adjust threshold as needed
+        
+        # Generate feedback
+        return is_correct, self._generate_feedback(pose_class, confidence, is_correct)
+    
+    def _error_prediction(self, error):
+        """Prediction dictionary returned when inference fails"""
+        return {
+            "pose_class": "Unknown",
+            "confidence": 0.0,
+            "is_correct": False,
+            "feedback": f"Error analyzing pose: {str(error)}"
+        }
     
     def _generate_feedback(self, pose_class, confidence, is_correct):
         """Generate human-readable feedback"""
         if is_correct:
-            if confidence > 0.9:
-                return f"Perfect {pose_class}! Excellent form."
-            else:
-                return f"Good {pose_class}. Minor improvements possible."
+            code = "perfect" if confidence > 0.9 else "good"
         else:
-            if confidence < 0.5:
-                return f"Unable to clearly identify pose. Try adjusting position."
-            else:
-                return f"Detected {pose_class} but form needs adjustment. Check alignment and positioning."
+            code = "unclear" if confidence < 0.5 else "adjust"
+        return FEEDBACK_TEMPLATES[code].format(pose=pose_class)
 
 
 # For testing
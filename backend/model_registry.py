@@ -0,0 +1,346 @@
+"""
+Model registry: versioned models, label maps, hot-swap and A/B routing
+
+Which models are served is described by a JSON manifest (MODEL_MANIFEST):
+    
+    {
+        "active": "yoga-v2",
+        "candidate": "yoga-v3",
+        "candidate_percent": 10,
+        "models": {
+            "yoga-v2": {"backend": "savedmodel", "path": "yoga_savedmodel", "labels": "labels.txt"},
+            "yoga-v3": {"backend": "tflite", "path": "yoga_v3_fp16.tflite", "labels": "yoga_v3_labels.json"}
+        }
+    }
+
+Relative paths are resolved against the manifest's directory. "labels" is a
+label map file (see model_handler.load_labels) or an inline list of class
+names. "candidate" and "candidate_percent" are optional.
+
+Requests are routed to the active model, or to the candidate for
+candidate_percent of the traffic. A routing key (e.g. the upload's content
+hash) always lands on the same model while the split is unchanged.
+
+Replacing the manifest swaps models atomically: requests already running
+keep the model they were routed to, and a model that is no longer routed is
+unloaded as soon as its last request finishes. The active model stays
+loaded; the candidate is unloaded after MODEL_IDLE_UNLOAD_SECONDS without
+traffic.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from model_backends import BACKENDS
+from model_handler import YogaModelHandler, load_labels, model_version
+
+logger = logging.getLogger(__name__)
+
+
+def load_manifest(path, num_threads=None):
+    """
+    Read and validate a model manifest
+    
+    Args:
+        path: JSON manifest file
+        num_threads: CPU threads per model unless a model sets "num_threads"
+    
+    Returns:
+        Normalized manifest dictionary (see _normalize_manifest)
+    
+    Raises:
+        ValueError: If the manifest is malformed or refers to unknown models
+    """
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return _normalize_manifest(raw, os.path.dirname(os.path.abspath(path)), num_threads, source=path)
+
+
+def single_model_manifest(model_path, backend, labels_path, num_threads=None):
+    """Manifest serving one model, used when no MODEL_MANIFEST is configured"""
+    raw = {
+        "active": "default",
+        "models": {"default": {"backend": backend, "path": model_path, "labels": labels_path}}
+    }
+    return _normalize_manifest(raw, os.getcwd(), num_threads, source=None)
+
+
+def _normalize_manifest(raw, base_dir, num_threads, source):
+    """
+    Resolve paths, read label maps and compute model versions
+    
+    Returns:
+        {"source", "revision", "active", "candidate", "candidate_percent", "models"},
+        where models maps each ID to {"id", "backend", "path", "labels",
+        "num_threads", "version"}
+    """
+    if not isinstance(raw, dict) or not isinstance(raw.get("models"), dict) or not raw["models"]:
+        raise ValueError("Manifest must have a non-empty \"models\" object")
+    
+    models = {}
+    for model_id, entry in raw["models"].items():
+        backend = entry.get("backend", "savedmodel")
+        if backend not in BACKENDS:
+            raise ValueError(f"Model {model_id}: backend must be one of: {', '.join(sorted(BACKENDS))}")
+        if "path" not in entry:
+            raise ValueError(f"Model {model_id} has no \"path\"")
+        
+        model_path = os.path.normpath(os.path.join(base_dir, entry["path"]))
+        labels = entry.get("labels")
+        if isinstance(labels, str):
+            labels = load_labels(os.path.join(base_dir, labels))
+        if not isinstance(labels, list) or not labels:
+            raise ValueError(f"Model {model_id} needs \"labels\": a label file or a list of class names")
+        
+        models[model_id] = {
+            "id": model_id,
+            "backend": backend,
+            "path": model_path,
+            "labels": labels,
+            "num_threads": entry.get("num_threads", num_threads),
+            "version": model_version(model_path, backend, labels, model_id)
+        }
+    
+    active = raw.get("active")
+    if active not in models:
+        raise ValueError(f"Active model {active!r} is not listed in \"models\"")
+    candidate = raw.get("candidate")
+    if candidate is not None and candidate not in models:
+        raise ValueError(f"Candidate model {candidate!r} is not listed in \"models\"")
+    candidate_percent = float(raw.get("candidate_percent", 0)) if candidate else 0.0
+    if not 0 <= candidate_percent <= 100:
+        raise ValueError("candidate_percent must be between 0 and 100")
+    
+    manifest = {
+        "source": source,
+        "active": active,
+        "candidate": candidate if candidate != active else None,
+        "candidate_percent": candidate_percent,
+        "models": models
+    }
+    # Identifies this exact configuration (worker processes compare it to spot a swap)
+    manifest["revision"] = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return manifest
+
+
+def routed_models(manifest):
+    """Models that receive traffic under a manifest: the active one, then the candidate"""
+    models = [manifest["models"][manifest["active"]]]
+    if manifest["candidate"] and manifest["candidate_percent"] > 0:
+        models.append(manifest["models"][manifest["candidate"]])
+    return models
+
+
+class ModelRegistry:
+    """Routes requests to model versions and owns their YogaModelHandlers"""
+    
+    def __init__(self, manifest, idle_unload_seconds=600, handler_factory=YogaModelHandler):
+        """
+        Args:
+            manifest: Manifest from load_manifest or single_model_manifest
+            idle_unload_seconds: Unload a loaded model that is not the active one after
+                this long without requests (0 = only unload models no longer routed)
+            handler_factory: Class (or factory) creating the handler of a model version
+                with YogaModelHandler's arguments
+        """
+        self.manifest = manifest
+        self.idle_unload_seconds = idle_unload_seconds
+        self.handler_factory = handler_factory
+        self._handlers = {}  # version -> YogaModelHandler
+        self._in_flight = {}  # version -> requests running on it
+        self._last_used = {}  # version -> time.monotonic() of the last request
+        self._requests = {}  # version -> requests routed to it
+        self._prepared = set()  # Versions warmed up by prepare() for the next manifest
+        self._lock = threading.Lock()
+    
+    @property
+    def active(self):
+        """Spec of the active model"""
+        manifest = self.manifest
+        return manifest["models"][manifest["active"]]
+    
+    def route(self, routing_key=None):
+        """
+        Choose the model for one request
+        
+        Args:
+            routing_key: String that should always reach the same model (e.g. a
+                content hash or session ID); None picks at random
+        
+        Returns:
+            Spec of the chosen model
+        """
+        manifest = self.manifest  # One snapshot, even if a swap happens meanwhile
+        if manifest["candidate"] and manifest["candidate_percent"] > 0:
+            if routing_key is None:
+                bucket = random.random() * 100
+            else:
+                digest = hashlib.sha256(routing_key.encode("utf-8")).digest()
+                bucket = int.from_bytes(digest[:8], "big") % 10000 / 100
+            if bucket < manifest["candidate_percent"]:
+                return manifest["models"][manifest["candidate"]]
+        return manifest["models"][manifest["active"]]
+    
+    def handler(self, spec=None):
+        """
+        YogaModelHandler for a model spec (the active model by default)
+        
+        Handlers are created on first use; the model itself loads on the
+        handler's first prediction or warm-up.
+        """
+        spec = spec or self.active
+        version = spec["version"]
+        with self._lock:
+            handler = self._handlers.get(version)
+            if handler is None:
+                handler = self.handler_factory(
+                    spec["path"],
+                    backend=spec["backend"],
+                    num_threads=spec["num_threads"],
+                    pose_classes=spec["labels"],
+                    model_id=spec["id"]
+                )
+                self._handlers[version] = handler
+                self._last_used[version] = time.monotonic()
+            return handler
+    
+    def acquire(self, spec):
+        """Mark a request as running on spec's model so it is not unloaded meanwhile"""
+        version = spec["version"]
+        with self._lock:
+            self._in_flight[version] = self._in_flight.get(version, 0) + 1
+            self._requests[version] = self._requests.get(version, 0) + 1
+            self._last_used[version] = time.monotonic()
+    
+    def release(self, spec):
+        """Mark a request as finished; unloads a swapped-out model after its last request"""
+        version = spec["version"]
+        with self._lock:
+            self._in_flight[version] -= 1
+            self._last_used[version] = time.monotonic()
+            retire = self._in_flight[version] == 0 and version not in self._routed_versions()
+            handler = self._handlers.pop(version, None) if retire else None
+        if handler is not None:
+            handler.unload()
+    
+    @contextmanager
+    def lease(self, spec=None):
+        """
+        Run a request on a model
+        
+        Yields:
+            YogaModelHandler of spec's model (the active model by default)
+        """
+        spec = spec or self.active
+        self.acquire(spec)
+        try:
+            yield self.handler(spec)
+        finally:
+            self.release(spec)
+    
+    def prepare(self, manifest, batch_sizes=(1,)):
+        """
+        Load and warm up the models a manifest routes to, ahead of set_manifest()
+        
+        They are kept loaded (not treated as idle) until the swap.
+        """
+        specs = routed_models(manifest)
+        with self._lock:
+            self._prepared = {spec["version"] for spec in specs}
+        for spec in specs:
+            self.handler(spec).warm_up(batch_sizes)
+    
+    def set_manifest(self, manifest):
+        """
+        Switch to a new manifest atomically
+        
+        New requests are routed by the new manifest at once; requests in flight
+        finish on their model. Warm up the new models first (prepare(), or
+        InferencePool.warm_up for every worker) so the swap causes no cold start.
+        """
+        previous = self.manifest
+        with self._lock:
+            self.manifest = manifest
+            self._prepared = set()
+        logger.info(
+            f"Models swapped: active {previous['active']} -> {manifest['active']}, "
+            f"candidate {manifest['candidate'] or 'none'} ({manifest['candidate_percent']:g}%)"
+        )
+        self.unload_idle()
+    
+    def unload_idle(self):
+        """
+        Unload models without requests in flight that are no longer routed,
+        or that are not the active model and have been idle too long
+        
+        Returns:
+            Versions that were unloaded
+        """
+        now = time.monotonic()
+        unloaded = []
+        with self._lock:
+            routed = self._routed_versions()
+            active = self.active["version"]
+            for version in list(self._handlers):
+                if self._in_flight.get(version, 0) or version == active:
+                    continue
+                idle = now - self._last_used.get(version, now)
+                expired = self.idle_unload_seconds > 0 and idle >= self.idle_unload_seconds
+                # Removed under the lock: a request arriving meanwhile gets a fresh handler
+                # instead of one that is about to be unloaded
+                if version not in routed:
+                    unloaded.append(self._handlers.pop(version))
+                elif expired and self._handlers[version].model is not None:
+                    unloaded.append(self._handlers.pop(version))
+        for handler in unloaded:
+            handler.unload()
+        return [handler.model_version for handler in unloaded]
+    
+    def stats(self):
+        """Routing split and the state of every known model version"""
+        manifest = self.manifest
+        now = time.monotonic()
+        with self._lock:
+            models = []
+            versions = {spec["version"]: spec for spec in manifest["models"].values()}
+            for version in sorted(set(versions) | set(self._handlers)):
+                handler = self._handlers.get(version)
+                models.append({
+                    "id": versions[version]["id"] if version in versions else handler.model_id,
+                    "version": version,
+                    "backend": versions[version]["backend"] if version in versions else handler.backend,
+                    "loaded": handler is not None and handler.model is not None,
+                    "in_flight": self._in_flight.get(version, 0),
+                    "requests": self._requests.get(version, 0),
+                    "idle_seconds": round(now - self._last_used[version], 1) if version in self._last_used else None
+                })
+        return {
+            "manifest": manifest["source"],
+            "revision": manifest["revision"],
+            "active": manifest["active"],
+            "candidate": manifest["candidate"],
+            "candidate_percent": manifest["candidate_percent"],
+            "models": models
+        }
+    
+    def close(self):
+        """Unload every model (at shutdown)"""
+        with self._lock:
+            handlers = list(self._handlers.values())
+            self._handlers.clear()
+        for handler in handlers:
+            handler.unload()
+    
+    def loaded_count(self):
+        """Number of models currently loaded in this process"""
+        with self._lock:
+            return sum(1 for handler in self._handlers.values() if handler.model is not None)
+    
+    def _routed_versions(self):
+        """Versions that receive traffic under the current manifest, or will after the next swap"""
+        return {spec["version"] for spec in routed_models(self.manifest)} | self._prepared
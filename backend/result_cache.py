@@ -0,0 +1,177 @@
+"""
+Content-addressed cache of analysis results
+
+Results are keyed by a hash of the uploaded bytes together with every
+parameter that changes the answer (expected pose, sampling options, image
+options, model version), so a re-uploaded video or replayed webcam frame is
+answered without decoding or inference. The in-memory tier is an LRU bounded
+by entry count and total size with a TTL; an optional SQLite file adds a
+second tier that survives restarts and is shared by all workers on a host.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def hash_bytes(data):
+    """SHA-256 hex digest of an in-memory upload"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(fileobj, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file object's contents (leaves it rewound)"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def make_key(content_hash, **params):
+    """Combine a content hash with the parameters that affect the result"""
+    encoded = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{content_hash}:{encoded}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """LRU + TTL result cache with an optional SQLite tier"""
+    
+    def __init__(self, max_entries=256, max_bytes=128 * 1024 * 1024, ttl_seconds=3600,
+                 db_path=None, max_db_entries=10000):
+        """
+        Args:
+            max_entries: Most results kept in memory
+            max_bytes: Upper bound on the serialized size of results kept in memory
+            ttl_seconds: How long a result stays valid (both tiers)
+            db_path: SQLite file for the persistent tier (None disables it)
+            max_db_entries: Most results kept in the SQLite tier
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_db_entries = max_db_entries
+        
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._size = 0
+        self._lock = threading.Lock()
+        
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            logger.info(f"Result cache persisting to {db_path}")
+        
+        # Counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """Return a cached result, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                self._remove(key)
+        
+        value = self._db_get(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        
+        # Promote to the memory tier
+        self._memory_put(key, value, len(json.dumps(value)))
+        return value
+    
+    def put(self, key, value):
+        """Store a JSON-serializable result in both tiers"""
+        serialized = json.dumps(value)
+        self._memory_put(key, value, len(serialized))
+        self._db_put(key, serialized)
+    
+    def stats(self):
+        """Hit/miss counters and current size, for sizing the cache"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "persistent": self._db is not None
+            }
+    
+    def close(self):
+        """Close the SQLite tier"""
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+    
+    def _memory_put(self, key, value, size):
+        """Insert into the LRU, evicting least recently used entries past the bounds"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl_seconds, value, size)
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+    
+    def _remove(self, key):
+        """Drop one memory entry (caller holds the lock)"""
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+    
+    def _db_get(self, key, now):
+        """Look a key up in the SQLite tier"""
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value FROM results WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _db_put(self, key, serialized):
+        """Write to the SQLite tier and trim expired and excess rows"""
+        if self._db is None:
+            return
+        now = time.time()
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, serialized, now + self.ttl_seconds)
+            )
+            self._db.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM results WHERE key NOT IN "
+                "(SELECT key FROM results ORDER BY expires_at DESC LIMIT ?)",
+                (self.max_db_entries,)
+            )
@@ -0,0 +1,181 @@
+"""
+Temporal engine for per-frame predictions
+
+Frames sampled from a yoga video are strongly correlated: most of a video is
+a pose being held. This module turns the independent (and noisy) per-frame
+predictions into a stable stream:
+
+- TemporalSmoother smooths class probabilities across frames, either with an
+  exponential moving average ("ema") or a majority vote over a sliding
+  window ("majority").
+- AdaptiveSampler widens the gap between analyzed frames while the smoothed
+  pose is stable and narrows it again as soon as it changes.
+- build_segments merges consecutive frames with the same smoothed pose into
+  segments, marking the long enough ones as holds.
+"""
+from collections import Counter, deque
+
+SMOOTHING_MODES = ("ema", "majority", "none")
+
+
+class TemporalSmoother:
+    """Smooths a stream of class probability dictionaries"""
+    
+    def __init__(self, mode="ema", alpha=0.5, window=5):
+        """
+        Args:
+            mode: "ema", "majority" or "none"
+            alpha: Weight of the newest frame in the moving average (0-1]
+            window: Number of frames voting in "majority" mode
+        """
+        if mode not in SMOOTHING_MODES:
+            raise ValueError(f"Unknown smoothing mode: {mode}")
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1], got {alpha}")
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}")
+        
+        self.mode = mode
+        self.alpha = alpha
+        self._average = None  # Smoothed probabilities ("ema")
+        self._recent = deque(maxlen=window)  # Recent probability dictionaries ("majority")
+        self._pose = None  # Pose reported for the previous frame ("majority")
+    
+    def update(self, probabilities, steps=1):
+        """
+        Add one frame's class probabilities
+        
+        Args:
+            probabilities: Dictionary of pose class -> probability
+            steps: Sampling intervals since the previous frame; an older
+                average is trusted less when frames are further apart
+        
+        Returns:
+            (pose_class, confidence) after smoothing
+        """
+        if self.mode == "ema":
+            if self._average is None:
+                self._average = dict(probabilities)
+            else:
+                weight = 1 - (1 - self.alpha) ** max(steps, 1)
+                self._average = {
+                    pose: weight * probabilities.get(pose, 0.0) + (1 - weight) * self._average.get(pose, 0.0)
+                    for pose in probabilities
+                }
+            pose = max(self._average, key=self._average.get)
+            return pose, self._average[pose]
+        
+        if self.mode == "majority":
+            self._recent.append(probabilities)
+            labels = [max(p, key=p.get) for p in self._recent]
+            votes = Counter(labels)
+            top = max(votes.values())
+            # Ties keep the current pose, otherwise go to the pose voted for most recently
+            if votes.get(self._pose) == top:
+                pose = self._pose
+            else:
+                pose = next(label for label in reversed(labels) if votes[label] == top)
+            self._pose = pose
+            confidence = sum(p.get(pose, 0.0) for p in self._recent) / len(self._recent)
+            return pose, confidence
+        
+        pose = max(probabilities, key=probabilities.get)
+        return pose, probabilities[pose]
+
+
+class AdaptiveSampler:
+    """Chooses how many frames to advance before the next analyzed frame"""
+    
+    def __init__(self, max_stride=4, stable_frames=3, confidence_delta=0.1):
+        """
+        Args:
+            max_stride: Largest step, as a multiple of the base step
+            stable_frames: Agreeing frames needed before the step is doubled
+            confidence_delta: Largest confidence change still counted as stable
+        """
+        if max_stride < 1:
+            raise ValueError(f"max_stride must be at least 1, got {max_stride}")
+        
+        self.max_stride = max_stride
+        self.stable_frames = stable_frames
+        self.confidence_delta = confidence_delta
+        self.base_step = 1
+        self.step = 1
+        self._last = None
+        self._stable = 0
+    
+    def reset(self, base_step):
+        """
+        Start a new video
+        
+        Args:
+            base_step: Step used by fixed-rate sampling (sample_rate / target_fps)
+        """
+        self.base_step = max(1, base_step)
+        self.step = self.base_step
+        self._last = None
+        self._stable = 0
+    
+    def update(self, pose, confidence):
+        """
+        Record the smoothed prediction for the most recent frame
+        
+        Doubles the step (up to max_stride times the base step) once the pose
+        has been stable for stable_frames frames, and drops it to half the
+        base step as soon as the pose or its confidence changes.
+        """
+        if self._last is not None:
+            last_pose, last_confidence = self._last
+            if pose == last_pose and abs(confidence - last_confidence) <= self.confidence_delta:
+                self._stable += 1
+            else:
+                self._stable = 0
+                self.step = max(1, self.base_step // 2)
+        self._last = (pose, confidence)
+        
+        if self._stable >= self.stable_frames:
+            self.step = min(self.step * 2, self.base_step * self.max_stride)
+            self._stable = 0
+
+
+def build_segments(results, min_hold_frames=3):
+    """
+    Merge consecutive frames with the same (smoothed) pose into segments
+    
+    Args:
+        results: Per-frame result dictionaries in frame order
+        min_hold_frames: Frames a segment needs to count as a held pose
+    
+    Returns:
+        List of segment dictionaries
+    """
+    segments = []
+    for result in results:
+        pose = result.get("smoothed_pose", result["pose_detected"])
+        confidence = result.get("smoothed_confidence", result["confidence"])
+        
+        if not segments or segments[-1]["pose"] != pose:
+            segments.append({"pose": pose, "first": result, "frames": 0, "confidence_sum": 0.0})
+        segment = segments[-1]
+        segment["last"] = result
+        segment["frames"] += 1
+        segment["confidence_sum"] += confidence
+    
+    return [_segment_summary(segment, min_hold_frames) for segment in segments]
+
+
+def _segment_summary(segment, min_hold_frames):
+    """Public dictionary for one segment collected by build_segments"""
+    first, last = segment["first"], segment["last"]
+    summary = {
+        "pose": segment["pose"],
+        "start_frame": first["frame_number"],
+        "end_frame": last["frame_number"]
+    }
+    if first.get("timestamp") is not None and last.get("timestamp") is not None:
+        summary["start_time"] = first["timestamp"]
+        summary["end_time"] = last["timestamp"]
+    summary["frames"] = segment["frames"]
+    summary["average_confidence"] = round(segment["confidence_sum"] / segment["frames"], 4)
+    summary["is_hold"] = segment["frames"] >= min_hold_frames and segment["pose"] != "Unknown"
+    return summary
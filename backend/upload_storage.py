@@ -0,0 +1,94 @@
+"""
+Expose uploaded videos to OpenCV without copying them into temp_uploads
+
+OpenCV only opens videos by path. The multipart parser already spools every
+upload into an anonymous temporary file, so on Linux the decoder can open
+that same file through /proc/self/fd without another copy touching disk.
+Where that is not possible (Windows/macOS, or decoding in another process)
+the upload is copied to a uniquely named temporary file that is always
+removed afterwards.
+"""
+import io
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_PROC_FD_DIR = "/proc/self/fd"
+
+
+@contextmanager
+def local_video_path(upload_file, filename, shareable=False, tmp_dir=None):
+    """
+    Yield a path OpenCV can open for an uploaded file
+    
+    Args:
+        upload_file: File object of the upload (e.g. UploadFile.file)
+        filename: Client filename, only used for its extension
+        shareable: The path must be openable by other processes
+        tmp_dir: Directory for the fallback copy (default: system temp dir)
+        
+    Yields:
+        Path to the video, valid until the context exits
+    """
+    if not shareable:
+        fd = _reopenable_fd(upload_file)
+        if fd is not None:
+            yield f"{_PROC_FD_DIR}/{fd}"
+            return
+    
+    path = save_upload(upload_file, filename, tmp_dir=tmp_dir)
+    try:
+        yield path
+    finally:
+        remove_upload(path)
+
+
+def save_upload(upload_file, filename, tmp_dir=None):
+    """
+    Copy an upload to a uniquely named temporary file owned by the caller
+    
+    Args:
+        upload_file: File object of the upload (e.g. UploadFile.file)
+        filename: Client filename, only used for its extension
+        tmp_dir: Directory for the copy (default: system temp dir)
+        
+    Returns:
+        Path of the copy; release it with remove_upload()
+    """
+    # Unique name, so concurrent uploads of the same filename never collide
+    suffix = os.path.splitext(filename or "")[1].lower()
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=tmp_dir)
+    try:
+        upload_file.seek(0)
+        with metrics.stage("upload"), os.fdopen(fd, "wb") as buffer:
+            shutil.copyfileobj(upload_file, buffer, length=1024 * 1024)
+    except Exception:
+        remove_upload(path)
+        raise
+    return path
+
+
+def remove_upload(path):
+    """Delete a copy made by save_upload()"""
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f"Could not remove temporary upload {path}: {str(e)}")
+
+
+def _reopenable_fd(upload_file):
+    """File descriptor of the upload if it can be reopened through /proc, else None"""
+    if not os.path.isdir(_PROC_FD_DIR):
+        return None
+    try:
+        # Spooled uploads still held in memory are rolled over to their anonymous temp file
+        upload_file.flush()
+        return upload_file.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
@@ -1,126 +1,794 @@
-import cv2
-import numpy as np
+import bisect
 import logging
+import math
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from lazy_modules import cv2, np
 
 logger = logging.getLogger(__name__)
 
+# Marks the end of the decoded frame stream in iter_frame_batches
+_END_OF_STREAM = object()
+
+# A seek costs about as much as decoding this many frames, so shorter gaps are read through
+SEEK_MIN_FRAMES = 32
+
+# Person ROI: samples are compared with the background at this width, and pixels
+# differing by more than this (0-255 grayscale) count as foreground
+ROI_ANALYSIS_WIDTH = 160
+ROI_DIFF_THRESHOLD = 25
+
+# Foreground regions smaller than this fraction of the frame are noise; larger than
+# this, the whole scene changed (camera moved, lights switched) rather than a person
+ROI_MIN_AREA = 0.002
+ROI_MAX_AREA = 0.6
+
+# Crops covering more of the frame than this are not worth the distortion; the full frame is used
+ROI_FULL_FRAME_AREA = 0.8
+
+
+class MotionGate:
+    """
+    Detects frames that are near-identical to the last frame sent to the model
+    
+    Frames are compared through a tiny grayscale thumbnail (see
+    VideoProcessor.frame_signature): the mean absolute difference against the
+    reference frame, on a 0-1 scale, must stay within threshold. Comparing
+    against the last inferred frame rather than the previous frame keeps slow
+    movement from slipping through one small step at a time.
+    """
+    
+    def __init__(self, video_processor, threshold=0.02):
+        """
+        Args:
+            video_processor: VideoProcessor computing the frame signatures
+            threshold: Largest mean pixel difference (0-1) counted as a duplicate
+        """
+        self.video_processor = video_processor
+        self.threshold = threshold
+        self._reference = None
+    
+    def is_duplicate(self, frame):
+        """
+        Check a frame against the reference
+        
+        Returns:
+            True if the frame can reuse the reference frame's prediction;
+            otherwise False, and the frame becomes the new reference
+        """
+        signature = self.video_processor.frame_signature(frame)
+        if self._reference is not None and np.mean(np.abs(signature - self._reference)) <= self.threshold:
+            return True
+        self._reference = signature
+        return False
+
+
+class PersonRegion:
+    """
+    Where the practitioner is in a video, as one box for all of its frames
+    
+    The box is kept relative to the frame size (0-1) and is padded and fitted
+    to the model's aspect ratio when a frame is cropped, so the same region
+    serves any frame and input size.
+    """
+    
+    def __init__(self, box, margin=0.15):
+        """
+        Args:
+            box: (left, top, right, bottom) of the person, 0-1
+            margin: Padding on each side, as a fraction of the box size
+        """
+        self.box = box
+        self.margin = margin
+        self._crops = {}  # (frame size, aspect) -> (x, y, width, height)
+    
+    def crop_box(self, frame_size, aspect=None):
+        """
+        Crop box in pixels
+        
+        Args:
+            frame_size: (width, height) of the frame
+            aspect: Width / height the crop should have (None = the box's own)
+        
+        Returns:
+            (x, y, width, height); the whole frame when the box covers most of it
+        """
+        key = (frame_size, aspect)
+        crop = self._crops.get(key)
+        if crop is None:
+            crop = self._crops[key] = self._fit(frame_size, aspect)
+        return crop
+    
+    def crop(self, frame, target_size=None):
+        """
+        Cut the person's box out of a frame
+        
+        Args:
+            frame: OpenCV image (BGR format)
+            target_size: (width, height) the crop will be resized to; the crop
+                gets the same aspect ratio so the person is not stretched
+        
+        Returns:
+            View of the frame
+        """
+        height, width = frame.shape[:2]
+        aspect = target_size[0] / target_size[1] if target_size else None
+        x, y, crop_width, crop_height = self.crop_box((width, height), aspect)
+        return frame[y:y + crop_height, x:x + crop_width]
+    
+    def _fit(self, frame_size, aspect):
+        """Pad the box, widen it to the aspect ratio and clamp it to the frame"""
+        width, height = frame_size
+        left, top, right, bottom = self.box
+        box_width = (right - left) * width * (1 + 2 * self.margin)
+        box_height = (bottom - top) * height * (1 + 2 * self.margin)
+        if aspect:
+            if box_width < box_height * aspect:
+                box_width = box_height * aspect
+            else:
+                box_height = box_width / aspect
+        box_width = max(1, min(width, round(box_width)))
+        box_height = max(1, min(height, round(box_height)))
+        
+        if box_width * box_height > ROI_FULL_FRAME_AREA * width * height:
+            return 0, 0, width, height
+        
+        # Centered on the person, shifted inwards where it would cross the frame edge
+        x = round((left + right) / 2 * width - box_width / 2)
+        y = round((top + bottom) / 2 * height - box_height / 2)
+        x = min(max(x, 0), width - box_width)
+        y = min(max(y, 0), height - box_height)
+        return x, y, box_width, box_height
+
 
 class VideoProcessor:
     """Handles video frame extraction and processing"""
     
-    def __init__(self):
-        pass
+    def __init__(self, index_cache_size=64):
+        """
+        Args:
+            index_cache_size: Videos whose frame index (see frame_index) is kept
+        """
+        self.index_cache_size = index_cache_size
+        self._index_cache = OrderedDict()  # content hash (or path, size, mtime) -> frame index
+        self._index_lock = threading.Lock()
+    
+    def frame_signature(self, frame, size=32):
+        """
+        Cheap fingerprint of a frame for motion detection
+        
+        Args:
+            frame: OpenCV image (BGR format)
+            size: Side of the square grayscale thumbnail
+        
+        Returns:
+            float32 array of shape (size, size) with values in [0, 1]
+        """
+        small = cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return gray.astype(np.float32) * (1.0 / 255.0)
+    
+    def motion_gate(self, threshold):
+        """Create a MotionGate for one video"""
+        return MotionGate(self, threshold)
     
-    def extract_frames(self, video_path, sample_rate=10):
+    def extract_frames(self, video_path, sample_rate=10, target_fps=None, max_frames=None):
         """
         Extract frames from video
         
         Args:
             video_path: Path to video file
             sample_rate: Extract every Nth frame (default: 10)
-            
+            target_fps: Sample this many frames per second of video instead of every Nth
+            max_frames: Upper bound on the number of frames extracted
+        
         Returns:
             List of frames (numpy arrays)
         """
+        frames = list(self.iter_frames(video_path, sample_rate=sample_rate,
+                                       target_fps=target_fps, max_frames=max_frames))
+        logger.info(f"Extracted {len(frames)} frames")
+        return frames
+    
+    def iter_frames(self, video_path, sample_rate=10, target_size=None,
+                    target_fps=None, max_frames=None, preview_width=None, roi=None):
+        """
+        Decode a video and yield sampled frames one at a time
+        
+        Skipped frames are only grabbed: the codec still decodes them, but they are
+        not converted or copied out.
+        
+        Args:
+            video_path: Path to video file
+            sample_rate: Yield every Nth frame (default: 10)
+            target_size: Optional (width, height) to downscale each frame to
+            target_fps: Sample this many frames per second of video instead of every Nth
+            max_frames: Upper bound on the number of frames yielded
+            preview_width: If set, also yield a copy of each full frame downscaled
+                to this width with its aspect ratio preserved
+            roi: Optional PersonRegion (see person_region); frames are cropped
+                to the person before being downscaled, previews are not
+        
+        Yields:
+            Frames (numpy arrays, BGR format), or (frame, preview) tuples when
+            preview_width is set
+        """
+        cap = cv2.VideoCapture(video_path)
+        
         try:
-            cap = cv2.VideoCapture(video_path)
-            
             if not cap.isOpened():
                 raise ValueError(f"Could not open video: {video_path}")
             
-            frames = []
-            frame_count = 0
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = int(cap.get(cv2.CAP_PROP_FPS))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            step = self._sampling_step(total_frames, fps, sample_rate, target_fps, max_frames)
             
-            logger.info(f"Video info: {total_frames} frames, {fps} FPS")
+            logger.info(f"Video info: {total_frames} frames, {fps:.2f} FPS, sampling every {step} frames")
             
-            while True:
-                ret, frame = cap.read()
-                
-                if not ret:
+            frame_count = 0
+            yielded = 0
+            started = time.perf_counter()
+            while max_frames is None or yielded < max_frames:
+                # Advance without decoding
+                if not cap.grab():
                     break
                 
-                # Sample every Nth frame
-                if frame_count % sample_rate == 0:
-                    frames.append(frame)
+                # Only decode the frames we keep
+                if frame_count % step == 0:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    preview = self._preview(frame, preview_width) if preview_width else None
+                    if roi is not None:
+                        frame = roi.crop(frame, target_size)
+                    if target_size is not None:
+                        frame = cv2.resize(frame, target_size, interpolation=cv2.INTER_AREA)
+                    # Decode time of this frame and the skipped frames before it
+                    metrics.observe_stage("decode", time.perf_counter() - started)
+                    yield (frame, preview) if preview_width else frame
+                    started = time.perf_counter()
+                    yielded += 1
                 
                 frame_count += 1
-            
+        
+        except Exception as e:
+            logger.error(f"Error extracting frames: {str(e)}")
+            raise
+        finally:
             cap.release()
+    
+    def iter_adaptive_frames(self, video_path, sampler, sample_rate=10, target_size=None,
+                             target_fps=None, max_frames=None, preview_width=None, roi=None):
+        """
+        Decode a video, asking sampler how far to advance after every kept frame
+        
+        Unlike iter_frames the gap between frames can change while iterating:
+        sampler.step is read each time a frame is yielded, so a consumer that
+        updates the sampler between frames steers the sampling rate.
+        
+        Args:
+            video_path: Path to video file
+            sampler: Object with a reset(base_step) method and a step attribute
+                (see temporal.AdaptiveSampler)
+            sample_rate, target_fps, max_frames: Determine the base step, as in iter_frames
+            target_size: Optional (width, height) to downscale each frame to
+            preview_width: If set, also return an aspect-preserving preview of each frame
+            roi: Optional PersonRegion to crop frames to (see iter_frames)
+        
+        Yields:
+            (frame_index, timestamp, frame, preview) tuples; timestamp is in
+            seconds (None if the frame rate is unknown) and preview is None
+            unless preview_width is set
+        """
+        cap = cv2.VideoCapture(video_path)
+        
+        try:
+            if not cap.isOpened():
+                raise ValueError(f"Could not open video: {video_path}")
             
-            logger.info(f"Extracted {len(frames)} frames from {total_frames} total")
-            return frames
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            sampler.reset(self._sampling_step(total_frames, fps, sample_rate, target_fps, max_frames))
+            
+            logger.info(
+                f"Video info: {total_frames} frames, {fps:.2f} FPS, "
+                f"adaptive sampling from every {sampler.step} frames"
+            )
             
+            frame_index = 0
+            next_index = 0
+            yielded = 0
+            started = time.perf_counter()
+            while max_frames is None or yielded < max_frames:
+                if not cap.grab():
+                    break
+                
+                if frame_index == next_index:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    preview = self._preview(frame, preview_width) if preview_width else None
+                    if roi is not None:
+                        frame = roi.crop(frame, target_size)
+                    if target_size is not None:
+                        frame = cv2.resize(frame, target_size, interpolation=cv2.INTER_AREA)
+                    timestamp = round(frame_index / fps, 3) if fps > 0 else None
+                    metrics.observe_stage("decode", time.perf_counter() - started)
+                    yield frame_index, timestamp, frame, preview
+                    started = time.perf_counter()
+                    yielded += 1
+                    # Read after the consumer has seen the frame, so its feedback applies
+                    next_index = frame_index + sampler.step
+                
+                frame_index += 1
+        
         except Exception as e:
             logger.error(f"Error extracting frames: {str(e)}")
             raise
+        finally:
+            cap.release()
+    
+    def _preview(self, frame, width):
+        """Downscale a frame to the given width, keeping its aspect ratio (never upscales)"""
+        height, frame_width = frame.shape[:2]
+        if width >= frame_width:
+            return frame.copy()
+        preview_height = max(1, round(height * width / frame_width))
+        return cv2.resize(frame, (width, preview_height), interpolation=cv2.INTER_AREA)
     
-    def extract_key_frames(self, video_path, num_frames=5):
+    def _sampling_step(self, total_frames, fps, sample_rate, target_fps=None, max_frames=None):
         """
-        Extract evenly spaced key frames from video
+        Work out how many decoded frames to advance between samples
+        
+        Args:
+            total_frames: Frame count reported by the container (0 if unknown)
+            fps: Frame rate reported by the container (0 if unknown)
+            sample_rate: Fallback fixed step
+            target_fps: Desired samples per second of video
+            max_frames: Desired upper bound on samples for the whole video
+        
+        Returns:
+            Step size in frames (at least 1)
+        """
+        if sample_rate < 1:
+            raise ValueError(f"sample_rate must be at least 1, got {sample_rate}")
+        if target_fps is not None and target_fps <= 0:
+            raise ValueError(f"target_fps must be positive, got {target_fps}")
+        if max_frames is not None and max_frames < 1:
+            raise ValueError(f"max_frames must be at least 1, got {max_frames}")
+        
+        step = sample_rate
+        
+        # Time-based sampling: same cost per second of video whatever the frame rate
+        if target_fps and fps > 0:
+            step = max(1, round(fps / target_fps))
+        
+        # Spread max_frames evenly over the video when the frame count is known
+        if max_frames and total_frames > 0:
+            step = max(step, math.ceil(total_frames / max_frames))
+        
+        return step
+    
+    def iter_frame_batches(self, video_path, batch_size=16, sample_rate=10,
+                           target_size=None, target_fps=None, max_frames=None,
+                           preview_width=None, roi=None, max_queued_batches=2):
+        """
+        Decode frames on a background thread and yield them in batches
+        
+        Decoding runs ahead of the consumer by at most max_queued_batches
+        batches, so memory stays flat regardless of video length while
+        inference on one batch overlaps with decoding of the next.
         
         Args:
             video_path: Path to video file
-            num_frames: Number of frames to extract
-            
+            batch_size: Number of frames per yielded batch
+            sample_rate: Decode every Nth frame (default: 10)
+            target_size: Optional (width, height) to downscale each frame to
+            target_fps: Sample this many frames per second of video instead of every Nth
+            max_frames: Upper bound on the number of frames decoded
+            preview_width: If set, frames come with an aspect-preserving preview (see iter_frames)
+            roi: Optional PersonRegion to crop frames to (see iter_frames)
+            max_queued_batches: Bound on decoded batches waiting for the consumer
+        
+        Yields:
+            Lists of up to batch_size frames (numpy arrays, BGR format), or of
+            (frame, preview) tuples when preview_width is set
+        """
+        batches = queue.Queue(maxsize=max_queued_batches)
+        stop = threading.Event()
+        
+        def put(item):
+            # Give up if the consumer has gone away so the thread can exit
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            try:
+                batch = []
+                for frame in self.iter_frames(video_path, sample_rate=sample_rate,
+                                              target_size=target_size, target_fps=target_fps,
+                                              max_frames=max_frames, preview_width=preview_width,
+                                              roi=roi):
+                    batch.append(frame)
+                    if len(batch) == batch_size:
+                        if not put(batch):
+                            return
+                        batch = []
+                if batch and not put(batch):
+                    return
+                put(_END_OF_STREAM)
+            except Exception as e:
+                put(e)
+        
+        # Decode timings count towards the job that started the thread
+        decoder = threading.Thread(target=metrics.propagate(produce), name="frame-decoder", daemon=True)
+        decoder.start()
+        
+        try:
+            while True:
+                item = batches.get()
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            decoder.join()
+    
+    def frame_index(self, video_path, content_hash=None):
+        """
+        Lightweight index of every frame in a video, built in one pass and cached
+        
+        The pass only demuxes packets (no decoding) where the OpenCV backend
+        supports raw stream reading, which makes it far cheaper than decoding.
+        Frames are counted rather than taken from CAP_PROP_FRAME_COUNT, which is
+        often wrong for webm and variable-frame-rate files.
+        
+        Args:
+            video_path: Path to video file
+            content_hash: Hash of the file's contents to cache the index under
+                (default: path, inode, size and modification time)
+        
         Returns:
-            List of frames (numpy arrays)
+            Dictionary with "frame_count", "timestamps" (seconds, one per frame in
+            display order), "keyframes" (sorted frame numbers, None if unknown),
+            "fps" (measured), "variable_frame_rate", "width", "height",
+            "container_frame_count" and "container_fps"
         """
+        if content_hash is None:
+            # Paths such as /proc/self/fd/N are reused for other files; the inode tells them apart
+            stat = os.stat(video_path)
+            key = (os.path.abspath(video_path), stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        else:
+            key = content_hash
+        
+        with self._index_lock:
+            index = self._index_cache.get(key)
+            if index is not None:
+                self._index_cache.move_to_end(key)
+                return index
+        
+        with metrics.stage("index"):
+            index = self._build_frame_index(video_path)
+        with self._index_lock:
+            # Another request may have indexed the same video meanwhile; everyone shares the first index
+            index = self._index_cache.setdefault(key, index)
+            self._index_cache.move_to_end(key)
+            while len(self._index_cache) > self.index_cache_size:
+                self._index_cache.popitem(last=False)
+        return index
+    
+    def _build_frame_index(self, video_path):
+        """Read a video once, recording each frame's timestamp and which frames are keyframes"""
+        cap = cv2.VideoCapture(video_path)
+        
         try:
-            cap = cv2.VideoCapture(video_path)
-            
             if not cap.isOpened():
                 raise ValueError(f"Could not open video: {video_path}")
             
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            # Calculate frame indices to extract
-            frame_indices = np.linspace(0, total_frames - 1, num_frames, dtype=int)
-            
-            frames = []
-            for idx in frame_indices:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-                ret, frame = cap.read()
-                if ret:
-                    frames.append(frame)
+            container_frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            container_fps = cap.get(cv2.CAP_PROP_FPS)
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             
+            # Raw packets: grab() then demuxes without decoding and keyframes are flagged
+            demux_only = cap.set(cv2.CAP_PROP_FORMAT, -1)
+            timestamps = []
+            keyframe_times = []
+            while cap.grab():
+                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                timestamps.append(timestamp)
+                if demux_only and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframe_times.append(timestamp)
+        finally:
             cap.release()
+        
+        # Packets come in decoding order; frames are numbered in display order
+        timestamps = np.sort(np.asarray(timestamps, dtype=np.float64))
+        frame_count = len(timestamps)
+        if frame_count > 1 and timestamps[-1] == timestamps[0] and container_fps > 0:
+            timestamps = np.arange(frame_count) / container_fps  # No timestamps in the container
+        
+        fps = container_fps
+        variable_frame_rate = False
+        if frame_count > 1 and timestamps[-1] > timestamps[0]:
+            fps = (frame_count - 1) / (timestamps[-1] - timestamps[0])
+            intervals = np.diff(timestamps)
+            typical = float(np.median(intervals))
+            variable_frame_rate = bool(np.any(np.abs(intervals - typical) > typical / 2))
+        
+        keyframes = None
+        if demux_only:
+            keyframes = sorted({int(np.searchsorted(timestamps, t)) for t in keyframe_times})
+        
+        logger.info(
+            f"Indexed {frame_count} frames ({container_frame_count} reported), {fps:.2f} FPS"
+            f"{' (variable)' if variable_frame_rate else ''}, "
+            f"{len(keyframes) if keyframes is not None else 'unknown'} keyframes"
+        )
+        return {
+            "frame_count": frame_count,
+            "timestamps": timestamps,
+            "keyframes": keyframes,
+            "fps": fps,
+            "variable_frame_rate": variable_frame_rate,
+            "width": width,
+            "height": height,
+            "container_frame_count": container_frame_count,
+            "container_fps": container_fps
+        }
+    
+    def extract_key_frames(self, video_path, num_frames=5, content_hash=None):
+        """
+        Extract evenly spaced key frames from video
+        
+        Frames are reached in order with grab(), and only the returned frames
+        are converted to images. When the keyframe positions are known and the
+        frame rate is constant, long gaps are skipped by seeking to the last
+        keyframe before the next target frame.
+        
+        Args:
+            video_path: Path to video file
+            num_frames: Number of frames to extract
+            content_hash: Optional hash of the file's contents (see frame_index)
+        
+        Returns:
+            List of frames (numpy arrays)
+        """
+        try:
+            index = self.frame_index(video_path, content_hash)
+            if index["frame_count"] == 0:
+                return []
             
+            targets = np.linspace(0, index["frame_count"] - 1, num_frames, dtype=int).tolist()
+            frames = [frame for _, frame in self._read_frames(video_path, index, targets)]
             logger.info(f"Extracted {len(frames)} key frames")
             return frames
-            
+        
         except Exception as e:
             logger.error(f"Error extracting key frames: {str(e)}")
             raise
     
-    def get_video_info(self, video_path):
+    def _read_frames(self, video_path, index, targets):
+        """
+        Decode the given frames in order, seeking over long gaps (see extract_key_frames)
+        
+        Yields:
+            (frame_number, frame) tuples in frame order
+        """
+        targets = sorted(set(targets))
+        keyframes = index["keyframes"] if not index["variable_frame_rate"] else None
+        # Seeks landing further than this from the indexed timestamp are not frame-accurate
+        tolerance = 0.5 / index["fps"] if index["fps"] > 0 else 0.0
+        
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video: {video_path}")
+        
+        position = 0  # Number of the frame the next grab() reads
+        try:
+            for target in targets:
+                if keyframes:
+                    keyframe = keyframes[bisect.bisect_right(keyframes, target) - 1]
+                    if keyframe - position >= SEEK_MIN_FRAMES:
+                        if self._seek(cap, keyframe, index["timestamps"][keyframe], tolerance):
+                            position = keyframe + 1
+                        else:
+                            logger.info(f"Seeking is not frame-accurate in {video_path}, reading it in order")
+                            cap.release()
+                            cap = cv2.VideoCapture(video_path)
+                            position = 0
+                            keyframes = None
+                
+                grabbed = True
+                while grabbed and position <= target:
+                    grabbed = cap.grab()
+                    position += 1
+                if not grabbed:
+                    break
+                ret, frame = cap.retrieve()
+                if ret:
+                    yield target, frame
+        finally:
+            cap.release()
+    
+    def person_region(self, video_path, content_hash=None, samples=16, margin=0.15):
+        """
+        Locate the practitioner by background subtraction, once per video
+        
+        A few frames are sampled across the video, each at a keyframe where
+        the index knows them so it decodes on its own. Otherwise each sample
+        is one seek to roughly the right frame (the exact frame does not
+        matter here), so the video is never read through. The per-pixel median
+        of the downscaled grayscale samples is the background; in each sample,
+        the largest region differing from it (together with regions of
+        comparable size, such as a separated limb) is the person. Parts of the
+        body that stay still blend into the background, so the region is the
+        union over all samples rather than a box per sample. The result is
+        cached alongside the video's frame index.
+        
+        Args:
+            video_path: Path to video file
+            content_hash: Optional hash of the file's contents (see frame_index)
+            samples: Frames compared with the background
+            margin: Padding around the person, as a fraction of their box
+        
+        Returns:
+            PersonRegion, or None if no one stands out from the background (for
+            instance someone who never moves), in which case frames are not cropped
+        """
+        index = self.frame_index(video_path, content_hash)
+        key = (samples, margin)
+        # The index is shared with other requests for the same video
+        with self._index_lock:
+            regions = index.setdefault("person_regions", {})
+            if key in regions:
+                return regions[key]
+        
+        with metrics.stage("roi"):
+            region = self._find_person(video_path, index, samples, margin)
+        with self._index_lock:
+            # A concurrent request may have got there first; everyone uses its region
+            return regions.setdefault(key, region)
+    
+    def _find_person(self, video_path, index, samples, margin):
+        """Sample frames, subtract their median background and box the foreground"""
+        if index["frame_count"] < 2:
+            return None
+        
+        targets = np.linspace(0, index["frame_count"] - 1, samples, dtype=int).tolist()
+        keyframes = index["keyframes"] if not index["variable_frame_rate"] else None
+        # The keyframe at or before each target: each decodes on its own
+        snapped = {keyframes[bisect.bisect_right(keyframes, target) - 1] for target in targets} \
+            if keyframes else set()
+        if len(snapped) >= 3:
+            frames = (frame for _, frame in self._read_frames(video_path, index, snapped))
+        else:
+            frames = self._seek_frames(video_path, targets)
+        
+        grays = []
+        for frame in frames:
+            height, width = frame.shape[:2]
+            small_height = max(1, round(height * ROI_ANALYSIS_WIDTH / width))
+            small = cv2.resize(frame, (ROI_ANALYSIS_WIDTH, small_height), interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            grays.append(cv2.GaussianBlur(gray, (5, 5), 0))
+        if len(grays) < 3:
+            return None
+        
+        background = np.median(np.stack(grays), axis=0).astype(np.uint8)
+        boxes = [box for box in (self._foreground_box(gray, background) for gray in grays) if box is not None]
+        if not boxes:
+            logger.info(f"No person stands out from the background in {video_path}, not cropping")
+            return None
+        
+        box = (
+            min(box[0] for box in boxes),
+            min(box[1] for box in boxes),
+            max(box[2] for box in boxes),
+            max(box[3] for box in boxes)
+        )
+        logger.info(
+            f"Person found in {len(boxes)} of {len(grays)} sampled frames, "
+            f"occupying {(box[2] - box[0]) * (box[3] - box[1]):.0%} of the frame"
+        )
+        return PersonRegion(box, margin=margin)
+    
+    def _seek_frames(self, video_path, targets):
+        """
+        Yield a frame near each target, seeking to every one instead of reading through
+        
+        Stops early if the backend cannot seek, rather than decoding the whole video.
+        """
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video: {video_path}")
+        
+        try:
+            for target in sorted(set(targets)):
+                if target > 0 and not cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+                    logger.info(f"Cannot seek in {video_path}, sampling stopped at frame {target}")
+                    return
+                if not cap.grab():
+                    return
+                ret, frame = cap.retrieve()
+                if ret:
+                    yield frame
+        finally:
+            cap.release()
+    
+    def _foreground_box(self, gray, background):
+        """Relative (left, top, right, bottom) of the person in one sample, None if nobody stands out"""
+        mask = (cv2.absdiff(gray, background) > ROI_DIFF_THRESHOLD).astype(np.uint8)
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        # Drop speckle, then join the parts of the body into one region
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        mask = cv2.dilate(mask, kernel, iterations=2)
+        
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        if count < 2:
+            return None
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        total = mask.shape[0] * mask.shape[1]
+        if not ROI_MIN_AREA <= areas.max() / total <= ROI_MAX_AREA:
+            return None
+        
+        height, width = mask.shape
+        regions = stats[1:][areas >= areas.max() / 3]
+        left = regions[:, cv2.CC_STAT_LEFT].min()
+        top = regions[:, cv2.CC_STAT_TOP].min()
+        right = (regions[:, cv2.CC_STAT_LEFT] + regions[:, cv2.CC_STAT_WIDTH]).max()
+        bottom = (regions[:, cv2.CC_STAT_TOP] + regions[:, cv2.CC_STAT_HEIGHT]).max()
+        return float(left / width), float(top / height), float(right / width), float(bottom / height)
+    
+    def _seek(self, cap, frame_number, timestamp, tolerance):
+        """Seek to a frame and grab it; False if the frame reached is not the one at timestamp"""
+        if not cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number) or not cap.grab():
+            return False
+        return abs(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 - timestamp) <= tolerance
+    
+    def get_video_info(self, video_path, content_hash=None):
         """
         Get video metadata
         
+        Taken from the frame index (see frame_index), so the file is only
+        read if it has not been indexed yet.
+        
         Args:
             video_path: Path to video file
-            
+            content_hash: Optional hash of the file's contents (see frame_index)
+        
         Returns:
             Dictionary with video information
         """
         try:
-            cap = cv2.VideoCapture(video_path)
-            
-            if not cap.isOpened():
-                raise ValueError(f"Could not open video: {video_path}")
+            index = self.frame_index(video_path, content_hash)
+            timestamps = index["timestamps"]
+            duration = 0.0
+            if index["frame_count"]:
+                duration = timestamps[-1] - timestamps[0] + (1 / index["fps"] if index["fps"] > 0 else 0)
             
-            info = {
-                "total_frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
-                "fps": int(cap.get(cv2.CAP_PROP_FPS)),
-                "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
-                "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
-                "duration_seconds": int(cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS))
+            return {
+                "total_frames": index["frame_count"],
+                "fps": round(index["fps"], 3),
+                "width": index["width"],
+                "height": index["height"],
+                "duration_seconds": round(float(duration), 3),
+                "variable_frame_rate": index["variable_frame_rate"],
+                "keyframes": len(index["keyframes"]) if index["keyframes"] is not None else None
             }
-            
-            cap.release()
-            return info
-            
+        
         except Exception as e:
             logger.error(f"Error getting video info: {str(e)}")
             raise
@@ -0,0 +1,102 @@
+"""
+Live webcam streaming over WebSocket
+
+The client sends a continuous stream of binary JPEG/PNG frames and the
+server answers each analyzed frame with a JSON prediction. Frames are
+received on their own task into a single-frame slot, so if the client
+sends faster than inference keeps up, older waiting frames are replaced
+by newer ones (latest wins) and latency never grows.
+"""
+import asyncio
+import logging
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from inference_pool import PoolOverloadedError
+
+logger = logging.getLogger(__name__)
+
+
+class LatestFrameSlot:
+    """Holds only the most recent unprocessed frame"""
+    
+    def __init__(self):
+        self.frame = None
+        self.received = 0
+        self.dropped = 0
+        self._ready = asyncio.Event()
+    
+    def put(self, frame):
+        """Store a frame, replacing (and counting) any frame not yet taken"""
+        if self.frame is not None:
+            self.dropped += 1
+        self.frame = frame
+        self.received += 1
+        self._ready.set()
+    
+    async def wait(self):
+        """Wait until a frame is available"""
+        await self._ready.wait()
+    
+    def take(self):
+        """Remove and return the waiting frame"""
+        frame, self.frame = self.frame, None
+        self._ready.clear()
+        return frame
+
+
+async def _receive_frames(websocket: WebSocket, slot: LatestFrameSlot):
+    """Read frames from the client until it disconnects"""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        
+        frame = message.get("bytes")
+        if frame:
+            slot.put(frame)
+
+
+async def serve_webcam_stream(websocket: WebSocket, batcher, retry_after_seconds=2, choose_model=None):
+    """
+    Analyze frames from one WebSocket client until it disconnects
+    
+    Args:
+        websocket: Accepted WebSocket connection
+        batcher: MicroBatcher used to analyze each frame
+        retry_after_seconds: Back-off hint sent when the server is overloaded
+        choose_model: Callable returning the model spec for the next frame
+            (None = let the batcher route each frame)
+    """
+    slot = LatestFrameSlot()
+    receiver = asyncio.create_task(_receive_frames(websocket, slot))
+    
+    try:
+        while True:
+            waiter = asyncio.create_task(slot.wait())
+            done, _ = await asyncio.wait({receiver, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                waiter.cancel()
+                break
+            
+            contents = slot.take()
+            model = choose_model() if choose_model is not None else None
+            try:
+                payload = dict(await batcher.submit(contents, model=model))
+            except PoolOverloadedError:
+                payload = {"error": "Server is busy", "retry_after": retry_after_seconds}
+            except Exception as e:
+                logger.error(f"Error processing streamed frame: {str(e)}")
+                payload = {"error": f"Error processing frame: {str(e)}"}
+            
+            if model is not None:
+                payload["model_version"] = model["version"]
+            payload["frames_received"] = slot.received
+            payload["frames_dropped"] = slot.dropped
+            await websocket.send_json(payload)
+    
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        logger.info(f"Webcam stream closed: {slot.received} frames received, {slot.dropped} dropped")
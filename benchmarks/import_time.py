@@ -0,0 +1,143 @@
+"""
+Startup import report and import-time budget check for the API
+
+Imports backend/main.py in fresh interpreters and reports:
+- the wall time of `import main` (median of --runs runs)
+- the slowest modules imported by main, from `python -X importtime`
+- which heavy libraries (TensorFlow, OpenCV, NumPy) were imported
+
+Exits with status 1 when the median import time exceeds --budget-ms or a
+heavy library is imported eagerly, so it can run as a CI regression check
+for cold starts (scale-to-zero deployments start a new worker per burst).
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 800 --output import_report.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+# Must stay out of `import main`; they are imported on first use
+HEAVY_MODULES = ("tensorflow", "tflite_runtime", "cv2", "numpy")
+
+MEASURE_SNIPPET = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import main\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({'seconds': elapsed, 'modules': sorted(sys.modules)}))\n"
+)
+
+
+def run_python(args, env=None):
+    """Run a Python snippet in a fresh interpreter inside backend/"""
+    return subprocess.run(
+        [sys.executable] + args,
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+
+def measure_import(runs):
+    """
+    Time `import main` in fresh interpreters
+    
+    Returns:
+        (list of seconds, module names loaded by the last run)
+    """
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    timings = []
+    modules = []
+    for _ in range(runs):
+        measured = json.loads(run_python(["-c", MEASURE_SNIPPET], env=env).stdout.strip().splitlines()[-1])
+        timings.append(measured["seconds"])
+        modules = measured["modules"]
+    return timings, modules
+
+
+def importtime_report(top):
+    """
+    Slowest modules imported directly by main, according to `python -X importtime`
+    
+    Returns:
+        List of {"module", "cumulative_ms", "self_ms"} dictionaries
+    """
+    stderr = run_python(["-X", "importtime", "-c", "import main"]).stderr
+    # importtime prints a module after everything it imported, nested by indentation
+    children = []
+    direct_imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # Header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entry = {
+            "module": name.strip(),
+            "cumulative_ms": round(int(cumulative_us) / 1000, 1),
+            "self_ms": round(int(self_us) / 1000, 1)
+        }
+        if depth == 1:
+            children.append(entry)
+        elif depth == 0:
+            if entry["module"] == "main":
+                direct_imports = children
+            children = []
+    ranked = sorted(direct_imports, key=lambda entry: entry["cumulative_ms"], reverse=True)
+    return ranked[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time")
+    parser.add_argument("--budget-ms", type=float, default=1000, help="Largest acceptable median import time")
+    parser.add_argument("--top", type=int, default=15, help="Imports listed in the report")
+    parser.add_argument("--output", help="Also write the JSON report here")
+    args = parser.parse_args()
+    
+    timings, modules = measure_import(args.runs)
+    median_ms = statistics.median(timings) * 1000
+    eager_heavy = [name for name in HEAVY_MODULES if name in modules]
+    
+    report = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "import_ms": {
+            "median": round(median_ms, 1),
+            "min": round(min(timings) * 1000, 1),
+            "max": round(max(timings) * 1000, 1)
+        },
+        "budget_ms": args.budget_ms,
+        "heavy_modules_imported": eager_heavy,
+        "modules_loaded": len(modules),
+        "slowest_imports": importtime_report(args.top)
+    }
+    
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"import main took {median_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    if eager_heavy:
+        failures.append(f"import main loaded {', '.join(eager_heavy)}; import them on first use instead")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Benchmark the video analysis pipeline stage by stage
+
+Times each stage of /analyze-pose separately on synthetic videos, then the
+whole endpoint through FastAPI's TestClient:
+
+- decode:      VideoProcessor.extract_frames (every 10th frame)
+- preprocess:  YogaModelHandler.preprocess_image, one frame at a time
+- predict:     YogaModelHandler.predict, one frame at a time
+- predict_batch: YogaModelHandler.predict_batch, INFERENCE_BATCH_SIZE frames per pass
+- encode:      JPEG thumbnail + base64, as sent back in "image"
+- endpoint:    POST /analyze-pose (result cache disabled)
+
+Each stage reports frames/sec, p50/p95 latency (per frame for the frame
+stages, per call for decode and endpoint) and the process's peak RSS so far.
+Results are written as JSON so runs can be compared.
+
+When the SavedModel weights are not available (they are not checked in) a
+stub model is used; inference numbers are then meaningless, the other stages
+are not.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --resolutions 720p --durations 10 --repeat 5
+"""
+import argparse
+import base64
+import contextlib
+import glob
+import importlib
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, "..", "backend")
+sys.path.append(BACKEND_DIR)
+sys.path.append(BENCH_DIR)
+
+import cv2
+import numpy as np
+
+import config
+import stub_model
+from model_handler import YogaModelHandler
+from synthetic_videos import RESOLUTIONS, ensure_videos
+from video_processor import VideoProcessor
+
+SAVED_MODEL_DIR = os.path.join(BACKEND_DIR, "..", "model_prep", "yoga_savedmodel")
+
+
+def percentile(values, q):
+    """q-th percentile (0-100) of a list of numbers"""
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def stage_result(stage, video, latencies, frames, total_seconds):
+    """
+    Summarize one stage's timings
+    
+    Args:
+        stage: Stage name
+        video: Video dictionary from ensure_videos
+        latencies: Seconds per timed unit (frame or call)
+        frames: Frames processed in total
+        total_seconds: Wall time for all of them
+    """
+    return {
+        "stage": stage,
+        "video": video["name"],
+        "frames": frames,
+        "fps": round(frames / total_seconds, 2) if total_seconds > 0 else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """Run fn and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_decode(video_processor, video, repeat):
+    """Time VideoProcessor.extract_frames on the whole video"""
+    latencies = []
+    frames = []
+    for _ in range(repeat):
+        frames, elapsed = timed(video_processor.extract_frames, video["path"], sample_rate=10)
+        latencies.append(elapsed)
+    return stage_result("decode", video, latencies, len(frames) * repeat, sum(latencies)), frames
+
+
+def bench_per_frame(stage, fn, frames, video, repeat):
+    """Time fn on every frame, one call per frame"""
+    latencies = []
+    for _ in range(repeat):
+        for frame in frames:
+            latencies.append(timed(fn, frame)[1])
+    return stage_result(stage, video, latencies, len(latencies), sum(latencies))
+
+
+def bench_predict_batch(model_handler, frames, video, repeat, batch_size):
+    """Time YogaModelHandler.predict_batch, reporting latency per frame"""
+    latencies = []
+    total = 0.0
+    for _ in range(repeat):
+        _, elapsed = timed(model_handler.predict_batch, frames, batch_size=batch_size)
+        total += elapsed
+        latencies.extend([elapsed / len(frames)] * len(frames))
+    return stage_result("predict_batch", video, latencies, len(frames) * repeat, total)
+
+
+def encode_thumbnail(frame, width=320, quality=75):
+    """JPEG thumbnail + base64 data URI, as returned by /analyze-pose"""
+    height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+    thumbnail = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode(".jpg", thumbnail, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.tobytes()).decode("utf-8")
+
+
+def bench_endpoint(client, video, repeat):
+    """Time POST /analyze-pose end to end"""
+    latencies = []
+    frames = 0
+    for _ in range(repeat):
+        with open(video["path"], "rb") as f:
+            response, elapsed = timed(
+                client.post,
+                "/analyze-pose",
+                files={"video": (os.path.basename(video["path"]), f, "video/mp4")}
+            )
+        if response.status_code != 200:
+            raise RuntimeError(f"/analyze-pose returned {response.status_code}: {response.text[:200]}")
+        latencies.append(elapsed)
+        frames += response.json()["total_frames_analyzed"]
+    return stage_result("endpoint", video, latencies, frames, sum(latencies))
+
+
+def choose_model(requested, saved_model_dir):
+    """
+    Pick the model backend to benchmark
+    
+    Returns:
+        (backend name, model path)
+    """
+    if requested == "auto":
+        has_weights = bool(glob.glob(os.path.join(saved_model_dir, "variables", "variables.data-*")))
+        requested = "savedmodel" if has_weights else "stub"
+        if not has_weights:
+            print(f"SavedModel weights not found in {saved_model_dir}, using the stub model", file=sys.stderr)
+    if requested == "tflite":
+        return requested, config.TFLITE_MODEL_PATH
+    return requested, saved_model_dir
+
+
+def environment_info(backend):
+    """Machine and library versions, to tell runs apart"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "model_backend": backend,
+        "inference_batch_size": config.INFERENCE_BATCH_SIZE
+    }
+
+
+def endpoint_client(backend, model_path):
+    """
+    Build a TestClient for the app with the chosen model, a thread pool and no result cache
+    
+    Returns:
+        (TestClient, main module); enter the client to run the app's startup
+    """
+    os.environ["MODEL_BACKEND"] = backend
+    os.environ["RESULT_CACHE_ENTRIES"] = "0"
+    os.environ["RESULT_CACHE_DB"] = ""
+    os.environ["WORKER_POOL_KIND"] = "thread"
+    if backend == "tflite":
+        os.environ["TFLITE_MODEL_PATH"] = model_path
+    
+    # config reads the environment at import time
+    importlib.reload(config)
+    import main as app_module
+    from fastapi.testclient import TestClient
+    
+    app_module.SAVED_MODEL_PATH = model_path
+    return TestClient(app_module.app), app_module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", default="360p,720p", help=f"Comma-separated, from {sorted(RESOLUTIONS)}")
+    parser.add_argument("--durations", default="5,20", help="Comma-separated video lengths in seconds")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage")
+    parser.add_argument("--model", choices=["auto", "savedmodel", "tflite", "stub"], default="auto")
+    parser.add_argument("--saved-model", default=SAVED_MODEL_DIR)
+    parser.add_argument("--video-dir", default=os.path.join(BENCH_DIR, "videos"))
+    parser.add_argument("--skip-endpoint", action="store_true", help="Do not benchmark /analyze-pose")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+    
+    stub_model.register()
+    backend, model_path = choose_model(args.model, args.saved_model)
+    
+    videos = ensure_videos(
+        args.video_dir,
+        args.resolutions.split(","),
+        [float(d) if "." in d else int(d) for d in args.durations.split(",")],
+        fps=args.fps
+    )
+    
+    video_processor = VideoProcessor()
+    model_handler = YogaModelHandler(model_path, backend=backend)
+    _, load_seconds = timed(model_handler.load_model)
+    # First call pays for graph tracing and allocation
+    model_handler.warm_up(config.MODEL_WARMUP_BATCH_SIZES)
+    
+    results = []
+    with contextlib.ExitStack() as stack:
+        client = None
+        if not args.skip_endpoint:
+            client, app_module = endpoint_client(backend, model_path)
+            stack.enter_context(client)
+            # Keep model loading out of the first timed request
+            app_module.model_registry.handler().warm_up(config.MODEL_WARMUP_BATCH_SIZES)
+        
+        for video in videos:
+            print(f"Benchmarking {video['name']} ({video['frames']} frames)", file=sys.stderr)
+            decode, frames = bench_decode(video_processor, video, args.repeat)
+            results.append(decode)
+            results.append(bench_per_frame("preprocess", model_handler.preprocess_image, frames, video, args.repeat))
+            results.append(bench_per_frame("predict", model_handler.predict, frames, video, args.repeat))
+            results.append(bench_predict_batch(model_handler, frames, video, args.repeat, config.INFERENCE_BATCH_SIZE))
+            results.append(bench_per_frame("encode", encode_thumbnail, frames, video, args.repeat))
+            if client is not None:
+                results.append(bench_endpoint(client, video, args.repeat))
+    
+    report = {
+        "environment": environment_info(backend),
+        "model_load_seconds": round(load_seconds, 3),
+        "videos": [{k: v for k, v in video.items() if k != "path"} for video in videos],
+        "results": results,
+        "peak_rss_mb": peak_rss_mb()
+    }
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
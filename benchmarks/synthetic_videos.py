@@ -0,0 +1,98 @@
+"""
+Synthetic test videos for the benchmarks
+
+Generates MP4 files with OpenCV: a textured background with a figure-like
+shape that moves during the first half of the video and holds still for the
+second half, roughly like a yoga clip (get into the pose, hold it). Videos
+are cached by their parameters so repeated runs do not regenerate them.
+"""
+import os
+
+import cv2
+import numpy as np
+
+RESOLUTIONS = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+}
+
+
+def generate_video(path, width, height, seconds, fps=30):
+    """
+    Write a synthetic video
+    
+    Args:
+        path: Output .mp4 path
+        width, height: Frame size in pixels
+        seconds: Video length
+        fps: Frame rate
+    
+    Returns:
+        Number of frames written
+    """
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 5)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+    
+    total = int(seconds * fps)
+    hold_from = total // 2
+    try:
+        for i in range(total):
+            frame = background.copy()
+            t = min(i, hold_from) / fps
+            
+            # Torso and limbs that sway until the pose is held
+            cx = int(width * (0.5 + 0.2 * np.sin(t)))
+            cy = height // 2
+            size = height // 4
+            arm = int(size * (0.5 + 0.5 * np.cos(t * 2)))
+            cv2.circle(frame, (cx, cy - size), size // 4, (200, 170, 150), -1)
+            cv2.rectangle(frame, (cx - size // 6, cy - size * 3 // 4), (cx + size // 6, cy + size // 2),
+                          (60, 90, 200), -1)
+            cv2.line(frame, (cx, cy - size // 2), (cx - size, cy - arm), (200, 170, 150), max(2, size // 12))
+            cv2.line(frame, (cx, cy - size // 2), (cx + size, cy - arm), (200, 170, 150), max(2, size // 12))
+            cv2.line(frame, (cx, cy + size // 2), (cx - size // 2, cy + size * 3 // 2), (40, 40, 40), max(2, size // 10))
+            cv2.line(frame, (cx, cy + size // 2), (cx + size // 2, cy + size * 3 // 2), (40, 40, 40), max(2, size // 10))
+            writer.write(frame)
+    finally:
+        writer.release()
+    return total
+
+
+def ensure_videos(directory, resolutions, durations, fps=30):
+    """
+    Generate (or reuse) one video per resolution and duration
+    
+    Args:
+        directory: Where the videos are stored
+        resolutions: Names from RESOLUTIONS
+        durations: Lengths in seconds
+        fps: Frame rate
+    
+    Returns:
+        List of dictionaries with name, path, resolution, seconds and frames
+    """
+    os.makedirs(directory, exist_ok=True)
+    videos = []
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        for seconds in durations:
+            name = f"{resolution}_{seconds}s"
+            path = os.path.join(directory, f"{name}_{fps}fps.mp4")
+            if os.path.exists(path):
+                cap = cv2.VideoCapture(path)
+                frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                cap.release()
+            else:
+                frames = generate_video(path, width, height, seconds, fps)
+            videos.append({
+                "name": name,
+                "path": path,
+                "resolution": resolution,
+                "seconds": seconds,
+                "frames": frames
+            })
+    return videos
@@ -0,0 +1,132 @@
+"""
+Throughput of the shared-memory inference processes (WORKER_POOL_KIND=shm)
+as the number of processes grows
+
+For each process count, front threads (as the InferencePool's threads would)
+preprocess batches of frames into ring slots and run them through
+SharedMemoryModelHandler.predict_batch for --seconds. Reports frames/sec and
+the speedup over one process, which should grow roughly linearly until the
+cores run out.
+
+The stub model (see stub_model.py) is used unless --saved-model points to a
+model, so on CI the numbers measure the transfer and dispatch overhead
+rather than the real network.
+
+Usage:
+    python benchmarks/worker_scaling.py
+    python benchmarks/worker_scaling.py --processes 1,2,4,8 --saved-model model_prep/yoga_savedmodel
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, "..", "backend")
+sys.path.append(BACKEND_DIR)
+sys.path.append(BENCH_DIR)
+
+import numpy as np
+
+import model_handler
+import stub_model
+from inference_workers import InferenceWorkers, SharedMemoryModelHandler
+
+
+def run_front_threads(handler, frames, batch_size, threads, seconds):
+    """
+    Keep threads busy with predict_batch calls for a fixed time
+    
+    Returns:
+        Frames classified in total
+    """
+    deadline = time.perf_counter() + seconds
+    counts = [0] * threads
+    
+    def loop(index):
+        while time.perf_counter() < deadline:
+            handler.predict_batch(frames[:batch_size])
+            counts[index] += batch_size
+    
+    workers = [threading.Thread(target=loop, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts)
+
+
+def bench_processes(processes, args, frames):
+    """Frames/sec with a given number of inference processes"""
+    workers = InferenceWorkers(
+        processes=processes,
+        batch_size=args.batch_size,
+        num_threads=args.num_threads,
+        initializer=stub_model.register
+    )
+    handler = SharedMemoryModelHandler(
+        args.saved_model or "stub",
+        backend="savedmodel" if args.saved_model else "stub",
+        pose_classes=model_handler.load_labels(model_handler.DEFAULT_LABELS_PATH),
+        workers=workers
+    )
+    try:
+        handler.warm_up([args.batch_size])
+        # Two front threads per process keep every process fed while the next batch is prepared
+        threads = args.threads or 2 * processes
+        start = time.perf_counter()
+        classified = run_front_threads(handler, frames, args.batch_size, threads, args.seconds)
+        elapsed = time.perf_counter() - start
+    finally:
+        handler.unload()
+        workers.shutdown()
+    return {
+        "processes": processes,
+        "front_threads": threads,
+        "threads_per_process": workers.num_threads,
+        "frames": classified,
+        "frames_per_sec": round(classified / elapsed, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cores = os.cpu_count() or 1
+    default_counts = sorted({1, 2, max(1, cores // 4), max(1, cores // 2)})
+    parser.add_argument("--processes", default=",".join(str(n) for n in default_counts),
+                        help="Comma-separated inference process counts")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--threads", type=int, help="Front threads (default: two per process)")
+    parser.add_argument("--num-threads", type=int, default=1, help="CPU threads per forward pass")
+    parser.add_argument("--seconds", type=float, default=5, help="Timed run per process count")
+    parser.add_argument("--saved-model", help="Benchmark this SavedModel instead of the stub")
+    parser.add_argument("--output", help="Also write the JSON report here")
+    args = parser.parse_args()
+    
+    stub_model.register()
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (480, 640, 3), dtype=np.uint8) for _ in range(args.batch_size)]
+    
+    results = []
+    for processes in (int(n) for n in args.processes.split(",")):
+        result = bench_processes(processes, args, frames)
+        result["speedup"] = round(result["frames_per_sec"] / results[0]["frames_per_sec"], 2) if results else 1.0
+        results.append(result)
+        print(
+            f"{processes:>3} processes: {result['frames_per_sec']:>8.1f} frames/sec "
+            f"(x{result['speedup']:.2f})",
+            file=sys.stderr
+        )
+    
+    report = {"cpu_count": cores, "batch_size": args.batch_size, "results": results}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
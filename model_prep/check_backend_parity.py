@@ -0,0 +1,73 @@
+"""
+Compare a TFLite model's predictions against the SavedModel
+
+Runs the same frames through the "savedmodel" and "tflite" backends and
+reports how often the top-1 pose agrees and how far the probabilities
+drift. Exits with status 1 when agreement is below --min-agreement, so it
+can gate shipping a converted or quantized model.
+
+Usage:
+    python check_backend_parity.py yoga_model_int8.tflite <videos/images dir>
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import numpy as np
+
+from convert_to_tflite_int8 import SAVED_MODEL_DIR, iter_calibration_frames
+from model_handler import YogaModelHandler
+
+
+def class_probabilities(handler, frames, batch_size=16):
+    """Run frames through a handler and return an (N, num_classes) array"""
+    outputs = []
+    for start in range(0, len(frames), batch_size):
+        batch = handler.preprocess_batch(frames[start:start + batch_size])
+        outputs.append(handler._run_inference(batch))
+    return np.concatenate(outputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tflite_model", help="Converted .tflite model to check")
+    parser.add_argument("frames_dir", help="Directory of sample videos and/or images")
+    parser.add_argument("--saved-model", default=SAVED_MODEL_DIR)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--min-agreement", type=float, default=0.95, help="Required top-1 agreement (0-1)")
+    args = parser.parse_args()
+    
+    frames = list(iter_calibration_frames(args.frames_dir, args.samples))
+    if not frames:
+        sys.exit(f"❌ No frames found in {args.frames_dir}")
+    
+    reference = YogaModelHandler(args.saved_model, backend="savedmodel")
+    candidate = YogaModelHandler(args.tflite_model, backend="tflite")
+    reference.load_model()
+    candidate.load_model()
+    
+    expected = class_probabilities(reference, frames)
+    actual = class_probabilities(candidate, frames)
+    
+    diff = np.abs(expected - actual)
+    agreement = float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1)))
+    report = {
+        "frames": len(frames),
+        "top1_agreement": round(agreement, 4),
+        "mean_abs_diff": round(float(diff.mean()), 6),
+        "max_abs_diff": round(float(diff.max()), 6),
+        "passed": agreement >= args.min_agreement
+    }
+    print(json.dumps(report, indent=2))
+    
+    if not report["passed"]:
+        print(f"❌ Top-1 agreement {agreement:.2%} is below {args.min_agreement:.2%}")
+        sys.exit(1)
+    print("✅ TFLite model matches the SavedModel")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Create an INT8 post-training-quantized TFLite model
+
+Weights and activations are quantized to INT8, calibrated on real frames
+sampled from practice videos (or images) so activation ranges match what
+the backend sees in production. Input and output stay float32, so the
+backend's "tflite" mode runs the result without any changes.
+
+Usage:
+    python convert_to_tflite_int8.py <calibration videos/images dir> [--samples 200]
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import cv2
+import numpy as np
+import tensorflow as tf
+
+from model_handler import YogaModelHandler
+from video_processor import VideoProcessor
+
+SAVED_MODEL_DIR = "yoga_savedmodel"
+TFLITE_OUT = "yoga_model_int8.tflite"
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def iter_calibration_frames(source_dir, max_samples):
+    """Yield up to max_samples BGR frames from the videos and images in source_dir"""
+    processor = VideoProcessor()
+    count = 0
+    for name in sorted(os.listdir(source_dir)):
+        path = os.path.join(source_dir, name)
+        lower = name.lower()
+        if lower.endswith(VIDEO_EXTENSIONS):
+            frames = processor.iter_frames(path, target_fps=1, max_frames=max_samples - count)
+        elif lower.endswith(IMAGE_EXTENSIONS):
+            image = cv2.imread(path)
+            frames = [image] if image is not None else []
+        else:
+            continue
+        
+        for frame in frames:
+            yield frame
+            count += 1
+            if count >= max_samples:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("calibration_dir", help="Directory of sample videos and/or images")
+    parser.add_argument("--saved-model", default=SAVED_MODEL_DIR)
+    parser.add_argument("--output", default=TFLITE_OUT)
+    parser.add_argument("--samples", type=int, default=200, help="Number of calibration frames")
+    args = parser.parse_args()
+    
+    # Same preprocessing as the backend so calibration matches inference
+    preprocessor = YogaModelHandler(args.saved_model)
+    
+    print(f"🔄 Collecting up to {args.samples} calibration frames from {args.calibration_dir}...")
+    calibration = [
+        preprocessor.preprocess_image(frame).astype(np.float32)
+        for frame in iter_calibration_frames(args.calibration_dir, args.samples)
+    ]
+    if not calibration:
+        sys.exit(f"❌ No calibration frames found in {args.calibration_dir}")
+    print(f"✅ Collected {len(calibration)} frames")
+    
+    def representative_dataset():
+        for sample in calibration:
+            yield [sample]
+    
+    print("🔄 Loading SavedModel...")
+    converter = tf.lite.TFLiteConverter.from_saved_model(args.saved_model)
+    
+    # 🔹 Full integer quantization, calibrated on real frames
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    
+    # 🔹 Keep TensorFlow ops fallback for anything without an INT8 kernel
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+        tf.lite.OpsSet.TFLITE_BUILTINS,
+        tf.lite.OpsSet.SELECT_TF_OPS
+    ]
+    
+    # 🔹 Required for EfficientNet
+    converter.experimental_enable_resource_variables = True
+    
+    tflite_model = converter.convert()
+    
+    with open(args.output, "wb") as f:
+        f.write(tflite_model)
+    
+    print("✅ INT8 TFLite model created:", args.output)
+    print("   Check accuracy with: python check_backend_parity.py", args.output, args.calibration_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Shared fixtures
+
+The backend modules import each other by bare name (the server runs from
+inside backend/), so backend/ goes on sys.path, along with benchmarks/ for
+the stub model backend that stands in for the untracked trained weights.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+
+def write_video(path, frames=30, size=(160, 120), fps=30):
+    """Write a small mp4 of a bar sweeping across a gray background"""
+    import cv2
+    import numpy as np
+    
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(frames):
+        frame = np.full((height, width, 3), 96, dtype=np.uint8)
+        x = i * (width - 20) // max(1, frames - 1)
+        frame[:, x:x + 20] = (0, 0, 255)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def stub_backend():
+    """Register the stub model backend (see benchmarks/stub_model.py)"""
+    import stub_model
+    stub_model.register()
+    return "stub"
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+
+import batch
+from conftest import write_video
+
+
+def grade(inputs, output, *extra):
+    args = batch.parse_args([*inputs, "--output", output, "--pool", "thread", "--workers", "1",
+                             "--backend", "stub", "--max-frames", "3", *extra])
+    return asyncio.run(batch.run(args))
+
+
+def read_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rerun_skips_graded_videos(tmp_path, stub_backend):
+    videos = [write_video(str(tmp_path / name)) for name in ("a.mp4", "b.mp4")]
+    output = str(tmp_path / "grades.jsonl")
+    
+    first = grade(videos, output, "--expected-pose", "Tadasana")
+    second = grade(videos, output, "--expected-pose", "Tadasana")
+    
+    assert first["graded"] == 2 and first["skipped"] == 0
+    assert second["graded"] == 0 and second["skipped"] == 2
+    assert len(read_rows(output)) == 2
+
+
+def test_rerun_with_changed_expected_pose_regrades(tmp_path, stub_backend):
+    videos = [write_video(str(tmp_path / name)) for name in ("a.mp4", "b.mp4")]
+    output = str(tmp_path / "grades.jsonl")
+    
+    grade(videos, output, "--expected-pose", "Tadasana")
+    summary = grade(videos, output, "--expected-pose", "Vajrasana")
+    
+    assert summary["graded"] == 2 and summary["skipped"] == 0
+    assert [row["expected_pose"] for row in read_rows(output)[2:]] == ["Vajrasana", "Vajrasana"]
+
+
+def test_rerun_regrades_changed_files(tmp_path, stub_backend):
+    video = write_video(str(tmp_path / "a.mp4"))
+    output = str(tmp_path / "grades.jsonl")
+    
+    grade([video], output)
+    write_video(video, frames=40)
+    os.utime(video, (0, 12345))
+    
+    assert grade([video], output)["graded"] == 1
+
+
+def test_manifest_survives_videos_that_disappear(tmp_path):
+    video = write_video(str(tmp_path / "a.mp4"))
+    manifest = batch.ProgressManifest(str(tmp_path / "grades.manifest.jsonl"))
+    manifest.record(video, "done", "settings")
+    os.remove(video)
+    
+    assert not manifest.is_done(video, "settings")
+    manifest.record(video, "failed", "settings", error="Could not open video")
+    manifest.close()
+    
+    entries = read_rows(str(tmp_path / "grades.manifest.jsonl"))
+    assert entries[-1] == {"path": video, "status": "failed", "settings": "settings",
+                           "error": "Could not open video"}
@@ -0,0 +1,79 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+import analysis
+import frame_cache
+import main
+from conftest import write_video
+from frame_cache import FrameCache
+from model_handler import YogaModelHandler
+from video_processor import VideoProcessor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(frame_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_frames_expire_after_ttl(clock):
+    cache = FrameCache(ttl_seconds=10)
+    job_id = cache.put([b"a", b"b"])
+    
+    assert cache.get(job_id, 1) == b"b"
+    assert cache.get(job_id, 2) is None
+    clock.now += 11
+    assert cache.get(job_id, 0) is None
+
+
+def test_oldest_jobs_are_evicted_over_the_byte_bound(clock):
+    cache = FrameCache(max_bytes=10)
+    first = cache.put([b"x" * 6])
+    second = cache.put([b"y" * 6])
+    
+    assert cache.get(first, 0) is None
+    assert cache.get(second, 0) == b"y" * 6
+
+
+def test_a_single_oversized_job_is_kept(clock):
+    cache = FrameCache(max_bytes=4)
+    job_id = cache.put([b"z" * 8])
+    
+    assert cache.get(job_id, 0) == b"z" * 8
+
+
+def video_options(image_mode):
+    return {
+        "target_fps": None, "max_frames": 2, "image_mode": image_mode,
+        "thumbnail_width": 64, "thumbnail_quality": 75, "smoothing": "none",
+        "adaptive_sampling": False, "motion_threshold": 0.0, "person_roi": False
+    }
+
+
+@pytest.mark.parametrize("image_mode, width", [("full", 160), ("thumbnail", 64), ("none", None)])
+def test_image_modes(tmp_path, stub_backend, image_mode, width):
+    video = write_video(str(tmp_path / "a.mp4"), size=(160, 120))
+    handler = YogaModelHandler("stub", backend=stub_backend)
+    
+    options = video_options(image_mode)
+    results = analysis.analyze_video_file(handler, VideoProcessor(), video, **main._analysis_kwargs(options))
+    main._attach_frame_images(results, image_mode)
+    
+    if width is None:
+        assert all("image" not in r and "jpeg" not in r for r in results)
+        return
+    jpeg = base64.b64decode(results[0]["image"].split(",", 1)[1])
+    image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert image.shape[1] == width
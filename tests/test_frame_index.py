@@ -0,0 +1,75 @@
+import os
+
+import cv2
+import pytest
+
+from conftest import write_video
+from video_processor import VideoProcessor
+
+
+def test_index_counts_frames_and_keyframes(tmp_path):
+    video = write_video(str(tmp_path / "a.mp4"), frames=45)
+    
+    index = VideoProcessor().frame_index(video)
+    
+    assert index["frame_count"] == 45
+    assert index["fps"] == pytest.approx(30)
+    assert index["keyframes"] is None or index["keyframes"][0] == 0
+
+
+def test_index_is_cached_by_content_hash(tmp_path):
+    processor = VideoProcessor()
+    first = write_video(str(tmp_path / "a.mp4"), frames=30)
+    second = write_video(str(tmp_path / "b.mp4"), frames=60)
+    
+    assert processor.frame_index(first, "hash-a") is processor.frame_index(second, "hash-a")
+    assert processor.get_video_info(second, "hash-b")["total_frames"] == 60
+
+
+def test_reused_path_is_not_mistaken_for_the_cached_file(tmp_path):
+    processor = VideoProcessor()
+    path = str(tmp_path / "upload.mp4")
+    write_video(path, frames=30)
+    stat = os.stat(path)
+    processor.frame_index(path)
+    
+    # Another file at the same path, with the same size and modification time
+    replacement = str(tmp_path / "other.mp4")
+    write_video(replacement, frames=30)
+    with open(replacement, "r+b") as f:
+        f.truncate(stat.st_size)
+    os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(replacement, path)
+    
+    assert len(processor._index_cache) == 1
+    processor.frame_index(path)
+    assert len(processor._index_cache) == 2
+
+
+def test_key_frames_match_a_sequential_read(tmp_path):
+    video = write_video(str(tmp_path / "a.mp4"), frames=90)
+    cap = cv2.VideoCapture(video)
+    sequential = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        sequential.append(frame)
+    cap.release()
+    
+    frames = VideoProcessor().extract_key_frames(video, num_frames=4)
+    
+    assert len(frames) == 4
+    for frame, number in zip(frames, (0, 29, 59, 89)):
+        assert (frame == sequential[number]).all()
+
+
+def test_concurrent_requests_share_one_index(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    
+    processor = VideoProcessor()
+    video = write_video(str(tmp_path / "a.mp4"), frames=60)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        indexes = list(executor.map(lambda _: processor.frame_index(video, "hash"), range(8)))
+    
+    assert all(index is indexes[0] for index in indexes)
@@ -0,0 +1,14 @@
+import statistics
+
+from import_time import HEAVY_MODULES, measure_import
+
+# Same default as benchmarks/import_time.py --budget-ms
+BUDGET_MS = 1000
+
+
+def test_importing_main_defers_heavy_libraries():
+    timings, modules = measure_import(runs=3)
+    
+    eager = [name for name in HEAVY_MODULES if name in modules]
+    assert eager == [], f"imported eagerly by main: {eager}"
+    assert statistics.median(timings) * 1000 < BUDGET_MS
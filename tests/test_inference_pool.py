@@ -0,0 +1,190 @@
+import asyncio
+import threading
+
+import pytest
+
+from inference_pool import InferencePool, PoolOverloadedError
+from micro_batcher import MicroBatcher
+from model_handler import DEFAULT_LABELS_PATH
+from model_registry import ModelRegistry, single_model_manifest
+
+
+def blocking_job(model_handler, video_processor, release):
+    release.wait(5)
+    return "video"
+
+
+def quick_job(model_handler, video_processor, value):
+    return value
+
+
+@pytest.fixture
+def registry(stub_backend):
+    return ModelRegistry(single_model_manifest("stub", stub_backend, DEFAULT_LABELS_PATH, None))
+
+
+def test_priority_jobs_do_not_wait_for_busy_workers(registry):
+    async def scenario():
+        pool = InferencePool(registry, None, workers=1, queue_size=1, priority_workers=1)
+        release = threading.Event()
+        try:
+            video = asyncio.create_task(pool.run(blocking_job, release))
+            await asyncio.sleep(0.05)
+            
+            assert await asyncio.wait_for(pool.run(quick_job, "webcam", priority=True), 1) == "webcam"
+            assert not video.done()
+            release.set()
+            assert await video == "video"
+        finally:
+            release.set()
+            pool.shutdown()
+    
+    asyncio.run(scenario())
+
+
+def test_full_admission_queue_rejects_regular_jobs_only(registry):
+    async def scenario():
+        pool = InferencePool(registry, None, workers=1, queue_size=0, priority_workers=1)
+        release = threading.Event()
+        try:
+            video = asyncio.create_task(pool.run(blocking_job, release))
+            await asyncio.sleep(0.05)
+            
+            with pytest.raises(PoolOverloadedError):
+                await pool.run(quick_job, "second video")
+            assert await pool.run(quick_job, "webcam", priority=True) == "webcam"
+            release.set()
+            await video
+        finally:
+            release.set()
+            pool.shutdown()
+    
+    asyncio.run(scenario())
+
+
+class RecordingPool:
+    """Stands in for InferencePool, recording the batches it is given"""
+    
+    def __init__(self, workers=1, priority_workers=0, delay=0.0):
+        self.workers = workers
+        self.priority_workers = priority_workers
+        self.delay = delay
+        self.calls = []
+    
+    async def run(self, fn, items, model=None, priority=False):
+        self.calls.append((list(items), priority))
+        await asyncio.sleep(self.delay)
+        return fn(items)
+
+
+def double(items):
+    return [item * 2 if item >= 0 else ValueError("negative") for item in items]
+
+
+def test_concurrent_frames_share_one_batch():
+    async def scenario():
+        pool = RecordingPool()
+        batcher = MicroBatcher(pool, double, max_batch_size=8, max_wait_ms=50)
+        batcher.start()
+        try:
+            results = await asyncio.gather(*[batcher.submit(i) for i in range(5)])
+        finally:
+            await batcher.stop()
+        return pool, results
+    
+    pool, results = asyncio.run(scenario())
+    
+    assert results == [0, 2, 4, 6, 8]
+    assert pool.calls == [([0, 1, 2, 3, 4], False)]
+
+
+def test_batches_are_capped_and_errors_go_to_their_caller():
+    async def scenario():
+        pool = RecordingPool(priority_workers=1)
+        batcher = MicroBatcher(pool, double, max_batch_size=2, max_wait_ms=50, priority=True)
+        batcher.start()
+        try:
+            return pool, await asyncio.gather(*[batcher.submit(i) for i in (1, -1, 3)],
+                                              return_exceptions=True)
+        finally:
+            await batcher.stop()
+    
+    pool, results = asyncio.run(scenario())
+    
+    assert results[0] == 2 and results[2] == 6
+    assert isinstance(results[1], ValueError)
+    assert [len(items) for items, _ in pool.calls] == [2, 1]
+    assert all(priority for _, priority in pool.calls)
+
+
+def test_full_queue_rejects_new_frames():
+    async def scenario():
+        pool = RecordingPool(delay=0.2)
+        batcher = MicroBatcher(pool, double, max_batch_size=1, max_wait_ms=0, max_queue_size=1)
+        batcher.start()
+        try:
+            first = asyncio.create_task(batcher.submit(1))
+            await asyncio.sleep(0.05)  # Dispatched: the only batch slot is busy
+            second = asyncio.create_task(batcher.submit(2))
+            await asyncio.sleep(0)
+            with pytest.raises(PoolOverloadedError):
+                await batcher.submit(3)
+            return await first, await second
+        finally:
+            await batcher.stop()
+    
+    assert asyncio.run(scenario()) == (2, 4)
+
+
+def test_frames_held_for_another_model_count_against_the_queue_bound():
+    async def scenario():
+        pool = RecordingPool()
+        batcher = MicroBatcher(pool, double, max_batch_size=8, max_wait_ms=300, max_queue_size=2)
+        batcher.start()
+        a, b = {"version": "a"}, {"version": "b"}
+        try:
+            submitted = [asyncio.create_task(batcher.submit(1, model=a))]
+            await asyncio.sleep(0.02)  # Collecting a batch for model "a"
+            for value in (2, 3):
+                submitted.append(asyncio.create_task(batcher.submit(value, model=b)))
+                await asyncio.sleep(0.02)  # Moved from the queue to the held items
+            
+            assert batcher.stats()["queued"] == 2
+            with pytest.raises(PoolOverloadedError):
+                await batcher.submit(4, model=b)
+            return pool, await asyncio.gather(*submitted)
+        finally:
+            await batcher.stop()
+    
+    pool, results = asyncio.run(scenario())
+    
+    assert results == [2, 4, 6]
+    assert [items for items, _ in pool.calls] == [[1], [2, 3]]
+
+
+def report_progress(model_handler, video_processor, progress, values, release):
+    for value in values:
+        progress.put(value)
+    release.wait(5)
+    return len(values)
+
+
+def test_jobs_stream_progress_and_count_against_capacity(registry):
+    async def scenario():
+        pool = InferencePool(registry, None, workers=1, queue_size=0)
+        progress = pool.progress_queue()
+        release = threading.Event()
+        try:
+            job = asyncio.create_task(pool.run(report_progress, progress, [1, 2], release))
+            received = [await asyncio.to_thread(progress.get, True, 1) for _ in range(2)]
+            
+            assert pool.in_flight == 1
+            with pytest.raises(PoolOverloadedError):
+                await pool.run(quick_job, "video")
+            release.set()
+            return received, await job
+        finally:
+            release.set()
+            pool.shutdown()
+    
+    assert asyncio.run(scenario()) == ([1, 2], 2)
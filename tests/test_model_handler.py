@@ -0,0 +1,20 @@
+from model_handler import YogaModelHandler, load_labels
+
+
+def test_label_files_skip_comments_and_blank_lines(tmp_path):
+    path = tmp_path / "labels.txt"
+    path.write_text("# output order\nTadasana\n\nVajrasana\n")
+    
+    assert load_labels(str(path)) == ["Tadasana", "Vajrasana"]
+
+
+def test_unnamed_outputs_are_named_when_the_model_loads(stub_backend):
+    handler = YogaModelHandler("stub", backend=stub_backend, pose_classes=["A", "B", "C"])
+    handler.load_model()
+    
+    assert handler.num_classes == 10
+    assert handler.pose_classes == ["A", "B", "C"] + [f"Pose {i}" for i in range(3, 10)]
+    
+    prediction = handler._build_prediction([0.0] * 9 + [1.0])
+    assert prediction["pose_class"] == "Pose 9"
+    assert len(prediction["all_probabilities"]) == 10
@@ -0,0 +1,53 @@
+import os
+import time
+
+import pytest
+
+from model_handler import DEFAULT_LABELS_PATH
+from model_registry import ModelRegistry, _normalize_manifest
+
+
+@pytest.fixture
+def registry(stub_backend):
+    raw = {
+        "active": "a",
+        "candidate": "b",
+        "candidate_percent": 50,
+        "models": {
+            "a": {"backend": stub_backend, "path": "stub-a", "labels": DEFAULT_LABELS_PATH},
+            "b": {"backend": stub_backend, "path": "stub-b", "labels": DEFAULT_LABELS_PATH}
+        }
+    }
+    registry = ModelRegistry(_normalize_manifest(raw, os.getcwd(), None, None), idle_unload_seconds=60)
+    yield registry
+    registry.close()
+
+
+def test_idle_candidate_is_unloaded_and_replaced(registry, monkeypatch):
+    candidate = registry.manifest["models"]["b"]
+    with registry.lease(candidate) as handler:
+        handler.load_model()
+    
+    now = time.monotonic() + 120
+    monkeypatch.setattr("model_registry.time.monotonic", lambda: now)
+    assert registry.unload_idle() == [handler.model_version]
+    assert handler.model is None
+    
+    # A request after the unload gets a handler of its own, never the one being unloaded
+    with registry.lease(candidate) as fresh:
+        assert fresh is not handler
+        fresh.load_model()
+        assert fresh.model is not None
+
+
+def test_requests_in_flight_keep_their_model(registry, monkeypatch):
+    candidate = registry.manifest["models"]["b"]
+    registry.acquire(candidate)
+    handler = registry.handler(candidate)
+    handler.load_model()
+    
+    now = time.monotonic() + 120
+    monkeypatch.setattr("model_registry.time.monotonic", lambda: now)
+    assert registry.unload_idle() == []
+    assert handler.model is not None
+    registry.release(candidate)
@@ -0,0 +1,29 @@
+import numpy as np
+
+from video_processor import VideoProcessor
+
+
+def frame(value):
+    return np.full((120, 160, 3), value, dtype=np.uint8)
+
+
+def test_first_frame_is_never_a_duplicate():
+    gate = VideoProcessor().motion_gate(0.02)
+    
+    assert not gate.is_duplicate(frame(100))
+
+
+def test_near_identical_frames_are_duplicates():
+    gate = VideoProcessor().motion_gate(0.02)
+    gate.is_duplicate(frame(100))
+    
+    assert gate.is_duplicate(frame(102))
+    assert not gate.is_duplicate(frame(140))
+
+
+def test_slow_drift_is_measured_from_the_last_inferred_frame():
+    gate = VideoProcessor().motion_gate(0.02)
+    gate.is_duplicate(frame(100))
+    
+    # Each step is below the threshold, but the drift from frame 100 is not
+    assert [gate.is_duplicate(frame(100 + 2 * i)) for i in range(1, 4)] == [True, True, False]
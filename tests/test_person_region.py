@@ -0,0 +1,117 @@
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+
+from video_processor import VideoProcessor
+
+
+def write_practitioner(path, frames=240, size=(640, 360)):
+    """A figure swinging an arm in the right third of a textured, static scene"""
+    width, height = size
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (21, 21), 0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, size)
+    for i in range(frames):
+        frame = background.copy()
+        x = 480 + int(15 * np.sin(i / 20))
+        cv2.rectangle(frame, (x - 20, 170), (x + 20, 320), (0, 0, 255), -1)
+        cv2.circle(frame, (x, 150), 18, (0, 200, 255), -1)
+        cv2.line(frame, (x, 200), (x + 50, 200 - int(60 * np.sin(i / 12))), (255, 0, 0), 9)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def practitioner(tmp_path):
+    return write_practitioner(str(tmp_path / "practitioner.mp4"))
+
+
+def test_region_covers_the_moving_person(practitioner):
+    region = VideoProcessor().person_region(practitioner)
+    
+    x, y, width, height = region.crop_box((640, 360), aspect=1.0)
+    assert width == height < 360
+    assert x <= 460 and x + width >= 530
+    assert y <= 130 and y + height >= 320
+
+
+def test_crops_are_fitted_to_the_model_input(practitioner):
+    processor = VideoProcessor()
+    region = processor.person_region(practitioner)
+    
+    frames = list(processor.iter_frames(practitioner, target_size=(224, 224), roi=region))
+    
+    assert frames and all(frame.shape == (224, 224, 3) for frame in frames)
+
+
+def test_static_scene_is_not_cropped(tmp_path):
+    path = str(tmp_path / "static.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (160, 120))
+    for _ in range(60):
+        writer.write(np.full((120, 160, 3), 90, dtype=np.uint8))
+    writer.release()
+    
+    assert VideoProcessor().person_region(path) is None
+
+
+def test_region_is_cached_by_content_hash(practitioner, tmp_path):
+    processor = VideoProcessor()
+    copy = shutil.copy(practitioner, str(tmp_path / "copy.mp4"))
+    
+    region = processor.person_region(practitioner, content_hash="abc")
+    
+    assert processor.person_region(copy, content_hash="abc") is region
+    assert processor.person_region(copy) is not region
+
+
+def test_analysis_keys_the_region_by_the_upload_hash(practitioner, stub_backend):
+    import analysis
+    from model_handler import YogaModelHandler
+    
+    processor = VideoProcessor()
+    handler = YogaModelHandler("stub", backend=stub_backend)
+    
+    analysis.analyze_video_file(handler, processor, practitioner, max_frames=2,
+                                person_roi=True, content_hash="upload-hash")
+    
+    assert "upload-hash" in processor._index_cache
+
+
+def test_concurrent_requests_share_one_region(practitioner):
+    from concurrent.futures import ThreadPoolExecutor
+    
+    processor = VideoProcessor()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        regions = list(executor.map(lambda _: processor.person_region(practitioner, "abc"), range(8)))
+    
+    assert all(region is regions[0] for region in regions)
+
+
+def test_unknown_keyframes_do_not_read_the_video_through(practitioner, monkeypatch):
+    import video_processor
+    
+    grabs = []
+    
+    class CountingCapture:
+        def __init__(self, *args):
+            self._cap = cv2.VideoCapture(*args)
+        
+        def grab(self):
+            grabs.append(1)
+            return self._cap.grab()
+        
+        def __getattr__(self, name):
+            return getattr(self._cap, name)
+    
+    processor = VideoProcessor()
+    index = processor.frame_index(practitioner)
+    index["keyframes"] = None
+    monkeypatch.setattr(video_processor.cv2, "VideoCapture", CountingCapture)
+    
+    region = processor.person_region(practitioner, samples=8)
+    
+    assert region is not None
+    assert len(grabs) <= 8
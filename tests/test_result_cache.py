@@ -0,0 +1,151 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import result_cache
+from conftest import write_video
+from model_handler import YogaModelHandler
+from result_cache import ResultCache, make_key
+from video_processor import VideoProcessor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "time", clock)
+    return clock
+
+
+def test_results_expire_after_ttl(clock):
+    cache = ResultCache(ttl_seconds=10)
+    cache.put("k", {"pose": "tree"})
+    
+    assert cache.get("k") == {"pose": "tree"}
+    clock.now += 11
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_bound_evicts_and_skips_oversized_results(clock):
+    value = "x" * 10
+    size = len(json.dumps(value))
+    cache = ResultCache(max_bytes=size * 2)
+    cache.put("a", value)
+    cache.put("b", value)
+    cache.put("c", value)
+    
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == size * 2
+    
+    cache.put("big", "y" * (size * 3))
+    assert cache.get("big") is None
+    assert cache.get("c") == value
+
+
+def test_sqlite_tier_survives_restart_and_promotes(clock, tmp_path):
+    db_path = str(tmp_path / "results.sqlite")
+    first = ResultCache(db_path=db_path)
+    first.put("k", {"pose": "warrior"})
+    first.close()
+    
+    second = ResultCache(db_path=db_path)
+    assert second.get("k") == {"pose": "warrior"}
+    assert second.get("k") == {"pose": "warrior"}
+    stats = second.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+    second.close()
+
+
+def test_sqlite_tier_honours_ttl_and_row_bound(clock, tmp_path):
+    cache = ResultCache(max_entries=1, ttl_seconds=10, db_path=str(tmp_path / "results.sqlite"),
+                        max_db_entries=2)
+    cache.put("a", 1)
+    clock.now += 1
+    cache.put("b", 2)
+    clock.now += 1
+    cache.put("c", 3)
+    
+    # "a" fell out of memory and was trimmed from disk as the oldest row
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    
+    clock.now += 20
+    assert cache.get("c") is None
+    cache.close()
+
+
+def test_key_covers_content_and_parameters():
+    key = make_key("abc", pose="tree", fps=5)
+    
+    assert key == make_key("abc", fps=5, pose="tree")
+    assert key != make_key("abd", pose="tree", fps=5)
+    assert key != make_key("abc", pose="tree", fps=10)
+
+
+class Registry:
+    def route(self, key=None):
+        return {"version": "stub", "labels": ["A", "B"]}
+
+
+class Pool:
+    """Runs analysis functions inline with a stub model, counting the calls"""
+    
+    kind = "thread"
+    
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = 0
+    
+    async def run(self, fn, *args, model=None, **kwargs):
+        self.calls += 1
+        return fn(self.handler, VideoProcessor(), *args, **kwargs)
+
+
+@pytest.fixture
+def client(monkeypatch, stub_backend):
+    pool = Pool(YogaModelHandler("stub", backend=stub_backend))
+    monkeypatch.setattr(main, "model_registry", Registry())
+    monkeypatch.setattr(main, "inference_pool", pool)
+    monkeypatch.setattr(main, "result_cache", ResultCache())
+    return TestClient(main.app), pool
+
+
+@pytest.mark.parametrize("image_mode, runs", [("full", 2), ("thumbnail", 1), ("none", 1)])
+def test_only_results_without_full_size_images_are_cached(tmp_path, client, image_mode, runs):
+    test_client, pool = client
+    video = write_video(str(tmp_path / "a.mp4"))
+    
+    for _ in range(2):
+        with open(video, "rb") as f:
+            response = test_client.post(
+                "/analyze-pose",
+                files={"video": ("a.mp4", f, "video/mp4")},
+                data={"image_mode": image_mode, "max_frames": "2"}
+            )
+        assert response.status_code == 200
+    
+    assert pool.calls == runs
+    assert main.result_cache.stats()["entries"] == 2 - runs
@@ -0,0 +1,100 @@
+import pytest
+
+from analysis import build_overall_result
+from temporal import AdaptiveSampler, TemporalSmoother, build_segments
+
+
+def test_ema_rides_out_a_single_outlier():
+    smoother = TemporalSmoother("ema", alpha=0.3)
+    held = {"Tadasana": 0.8, "Vajrasana": 0.2}
+    for _ in range(5):
+        smoother.update(held)
+    
+    pose, confidence = smoother.update({"Tadasana": 0.1, "Vajrasana": 0.9})
+    
+    assert pose == "Tadasana"
+    assert confidence < 0.8
+
+
+def test_ema_weighs_history_less_for_larger_steps():
+    near, far = TemporalSmoother("ema", alpha=0.5), TemporalSmoother("ema", alpha=0.5)
+    for smoother in (near, far):
+        smoother.update({"Tadasana": 1.0, "Vajrasana": 0.0})
+    
+    assert near.update({"Tadasana": 0.0, "Vajrasana": 1.0}, steps=1)[1] == pytest.approx(0.5)
+    assert far.update({"Tadasana": 0.0, "Vajrasana": 1.0}, steps=3) == ("Vajrasana", pytest.approx(0.875))
+
+
+def test_majority_keeps_current_pose_on_ties():
+    smoother = TemporalSmoother("majority", window=4)
+    a, b = {"A": 0.9, "B": 0.1}, {"A": 0.1, "B": 0.9}
+    
+    assert [smoother.update(p)[0] for p in (a, a, b, b)] == ["A", "A", "A", "A"]
+    assert smoother.update(b)[0] == "B"
+
+
+def test_none_passes_predictions_through():
+    assert TemporalSmoother("none").update({"A": 0.3, "B": 0.7}) == ("B", 0.7)
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        TemporalSmoother("median")
+
+
+def test_sampler_widens_while_stable_and_narrows_on_change():
+    sampler = AdaptiveSampler(max_stride=4, stable_frames=2)
+    sampler.reset(10)
+    
+    for _ in range(10):
+        sampler.update("Tadasana", 0.9)
+    assert sampler.step == 40
+    
+    sampler.update("Vajrasana", 0.9)
+    assert sampler.step == 5
+
+
+def test_sampler_reset_starts_from_base_step():
+    sampler = AdaptiveSampler()
+    sampler.reset(10)
+    for _ in range(10):
+        sampler.update("Tadasana", 0.9)
+    
+    sampler.reset(6)
+    
+    assert sampler.step == 6
+
+
+def test_segments_merge_runs_and_mark_holds():
+    poses = ["A", "A", "A", "B", "A"]
+    results = [
+        {"frame_number": i, "pose_detected": pose, "confidence": 0.5}
+        for i, pose in enumerate(poses)
+    ]
+    
+    segments = build_segments(results, min_hold_frames=3)
+    
+    assert [(s["pose"], s["start_frame"], s["end_frame"], s["is_hold"]) for s in segments] == [
+        ("A", 0, 2, True), ("B", 3, 3, False), ("A", 4, 4, False)
+    ]
+
+
+def held_results(frames=5):
+    return [
+        {"frame_number": i, "pose_detected": "Tadasana", "confidence": 0.95, "is_correct": True}
+        for i in range(frames)
+    ]
+
+
+def test_default_summary_has_no_segments_or_hold_sentence():
+    overall = build_overall_result(held_results(), "clip.mp4")
+    
+    assert "segments" not in overall
+    assert overall["overall_feedback"] == "Excellent! Your form is nearly perfect. Keep it up!"
+
+
+def test_requested_segments_name_the_longest_hold():
+    overall = build_overall_result(held_results(), "clip.mp4", with_segments=True)
+    
+    assert [segment["frames"] for segment in overall["segments"]] == [5]
+    assert overall["overall_feedback"].endswith(" Longest hold: Tadasana over 5 frames.")
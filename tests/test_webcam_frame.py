@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import analysis
+import main
+from model_handler import YogaModelHandler
+
+
+@pytest.fixture
+def handler(stub_backend):
+    return YogaModelHandler("stub", backend=stub_backend)
+
+
+def jpeg():
+    _, buffer = cv2.imencode(".jpg", np.full((120, 160, 3), 128, dtype=np.uint8))
+    return buffer.tobytes()
+
+
+def test_undecodable_images_get_an_error_each(handler):
+    results = analysis.analyze_image_batch(handler, None, [jpeg(), b"not an image"])
+    
+    assert "pose_class" in results[0]
+    assert isinstance(results[1], analysis.ImageDecodeError)
+
+
+class Registry:
+    def route(self, key=None):
+        return {"version": "stub", "labels": ["A", "B"]}
+
+
+class Batcher:
+    async def submit(self, contents, model=None):
+        raise analysis.ImageDecodeError("Could not decode image")
+
+
+def test_undecodable_webcam_frame_is_a_client_error(monkeypatch):
+    monkeypatch.setattr(main, "model_registry", Registry())
+    monkeypatch.setattr(main, "webcam_batcher", Batcher())
+    
+    response = TestClient(main.app).post(
+        "/analyze-webcam-frame", files={"frame": ("frame.jpg", b"not an image", "image/jpeg")}
+    )
+    
+    assert response.status_code == 400